@@ -1,3 +1,5 @@
+import asyncio
+import json
 import os
 import sys
 import time
@@ -5,7 +7,7 @@ import uuid
 import shutil
 import tempfile
 from io import StringIO
-from typing import Dict, List, Optional, Union, Tuple
+from typing import Callable, Dict, List, Optional, Union, Tuple
 
 # 强制使用CPU模式
 os.environ["CUDA_VISIBLE_DEVICES"] = ""
@@ -13,9 +15,10 @@ os.environ["OMP_NUM_THREADS"] = "1"
 
 # 添加项目根目录到Python路径，以便能够导入本地模块
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from magic_pdf.data.data_reader_writer import FileBasedDataWriter, FileBasedDataReader, DataWriter
 from magic_pdf.data.dataset import PymuDocDataset
 from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
@@ -28,10 +31,21 @@ import aiofiles
 from pydantic import BaseModel
 from loguru import logger
 
+from job_queue import JobQueue, JobStore, QueueFullError
+
 app = FastAPI(title="MinerU API", description="PDF解析和文档挖掘服务")
 
-# 存储任务状态和结果的字典
-tasks = {}
+# 任务状态持久化到SQLite，服务重启后未完成的任务会重新排队
+JOB_DB_PATH = os.environ.get("MINERU_API_JOB_DB", "output/jobs.db")
+# 同时执行解析的worker数量
+API_WORKERS = int(os.environ.get("MINERU_API_WORKERS", 1))
+# 多个worker并发解析时共享layout/mfd/mfr模型，推理必须交给InferenceBroker统一执行
+if API_WORKERS > 1:
+    os.environ.setdefault("MINERU_INFERENCE_BROKER", "1")
+    if os.environ["MINERU_INFERENCE_BROKER"] != "1":
+        raise RuntimeError("MINERU_API_WORKERS>1 requires MINERU_INFERENCE_BROKER=1")
+# 排队任务数上限，超过后新任务返回503
+API_MAX_QUEUE_DEPTH = int(os.environ.get("MINERU_API_MAX_QUEUE_DEPTH", 32))
 
 # 支持的文件扩展名
 pdf_extensions = [".pdf"]
@@ -48,6 +62,23 @@ class TaskStatus(BaseModel):
     result_path: Optional[str] = None
     result_content: Optional[str] = None
 
+    @classmethod
+    def from_job(cls, job: dict, with_content: bool = False) -> "TaskStatus":
+        result_content = None
+        if with_content and job["status"] == "completed" and job["result_path"] and os.path.exists(job["result_path"]):
+            with open(job["result_path"], 'r', encoding='utf-8') as f:
+                result_content = f.read()
+        return cls(
+            id=job["id"],
+            status=job["status"],
+            filename=job["filename"],
+            created_at=job["created_at"],
+            completed_at=job["completed_at"],
+            error_message=job["error_message"],
+            result_path=job["result_path"],
+            result_content=result_content,
+        )
+
 class MemoryDataWriter(DataWriter):
     """内存数据写入器，用于将结果保存到内存而非文件"""
     def __init__(self):
@@ -68,6 +99,100 @@ class MemoryDataWriter(DataWriter):
     def close(self):
         self.buffer.close()
 
+# 流式任务的逐页回调，key为任务id；服务重启后恢复的任务没有回调，按普通任务处理
+page_listeners: Dict[str, Callable] = {}
+
+def process_job(job: dict) -> str:
+    """
+    在worker线程中解析单个任务，返回生成的Markdown文件路径
+    """
+    output_dir = f"output/{job['id']}"
+
+    # 检查文件是否存在
+    if not os.path.exists(job["file_path"]):
+        raise FileNotFoundError("找不到上传的文件")
+
+    # 读取文件
+    with open(job["file_path"], 'rb') as f:
+        file_content = f.read()
+
+    if not file_content:
+        raise ValueError("文件内容为空")
+
+    # 创建目录及准备环境
+    local_image_dir, local_md_dir = prepare_env(output_dir, "result", job["parse_method"])
+
+    # 调用do_parse函数处理PDF文件
+    do_parse(
+        output_dir=output_dir,
+        pdf_file_name="result",
+        pdf_bytes_or_dataset=file_content,
+        model_list=[],  # 使用内置模型
+        parse_method=job["parse_method"],
+        f_dump_md=True,
+        f_dump_middle_json=True,
+        f_dump_model_json=True,
+        f_dump_orig_pdf=True,
+        page_callback=page_listeners.get(job["id"]),
+        # 调试用的layout/span pdf在后台进程中生成，不占用解析时间
+        f_draw_deferred=True,
+    )
+
+    # 检查生成的Markdown文件
+    md_file_path = f"{local_md_dir}/result.md"
+    if not os.path.exists(md_file_path):
+        raise RuntimeError("生成Markdown文件失败")
+    return md_file_path
+
+
+job_store = JobStore(JOB_DB_PATH)
+job_queue = JobQueue(job_store, process_job, num_workers=API_WORKERS, max_queue_depth=API_MAX_QUEUE_DEPTH)
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    job_queue.stop()
+    job_store.close()
+
+
+async def save_upload(file: UploadFile, task_id: str) -> Tuple[str, str]:
+    """
+    校验并保存上传的文件，返回(文件名, 保存路径)
+    """
+    filename = file.filename if file.filename else f"document_{task_id}.pdf"
+    file_extension = os.path.splitext(filename)[1]
+
+    # 检查文件类型
+    if file_extension.lower() not in pdf_extensions:
+        raise HTTPException(status_code=400, detail=f"暂时只支持PDF文件，不支持的文件类型: {file_extension}")
+
+    content = await file.read()
+    if not content:
+        raise HTTPException(status_code=400, detail="上传文件为空")
+
+    output_dir = f"output/{task_id}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 保存上传的文件
+    file_path = f"{output_dir}/{filename}"
+    async with aiofiles.open(file_path, 'wb') as f:
+        await f.write(content)
+    return filename, file_path
+
+
+def submit_job(task_id: str, filename: str, file_path: str, parse_method: str):
+    try:
+        return job_queue.submit(filename, file_path, parse_method, task_id)
+    except QueueFullError as e:
+        shutil.rmtree(f"output/{task_id}", ignore_errors=True)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+
 @app.post("/upload/sync")
 async def upload_sync(file: UploadFile = File(...), parse_method: str = "auto"):
     """
@@ -77,172 +202,100 @@ async def upload_sync(file: UploadFile = File(...), parse_method: str = "auto"):
         file: 要上传的文件
         parse_method: 解析方法，可以是auto, ocr, txt。默认为auto。
     """
-    # 准备环境
     task_id = str(uuid.uuid4())
-    filename = file.filename
-    file_extension = os.path.splitext(filename)[1]
-    
-    # 检查文件类型
-    if file_extension.lower() not in pdf_extensions:
-        raise HTTPException(status_code=400, detail=f"暂时只支持PDF文件，不支持的文件类型: {file_extension}")
-    
-    output_dir = f"output/{task_id}"
-    
+    filename, file_path = await save_upload(file, task_id)
+    future = submit_job(task_id, filename, file_path, parse_method)
+
     try:
-        # 读取文件内容
-        file_content = await file.read()
-        if not file_content:
-            raise HTTPException(status_code=400, detail="上传文件为空")
-        
-        # 创建临时目录保存文件
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 保存原始文件
-        temp_file_path = f"{output_dir}/{filename}"
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            await f.write(file_content)
-        
-        # 使用do_parse处理文件
-        local_image_dir, local_md_dir = prepare_env(output_dir, "result", parse_method)
-        
-        # 调用do_parse函数处理PDF文件
-        do_parse(
-            output_dir=output_dir,
-            pdf_file_name="result",
-            pdf_bytes_or_dataset=file_content,
-            model_list=[],  # 使用内置模型
-            parse_method=parse_method,
-            f_dump_md=True,
-            f_dump_middle_json=True,
-            f_dump_model_json=True,
-            f_dump_orig_pdf=True
-        )
-        
-        # 读取生成的Markdown内容
-        md_file_path = f"{local_md_dir}/result.md"
-        
-        if not os.path.exists(md_file_path):
-            raise HTTPException(status_code=500, detail="生成Markdown文件失败")
-            
-        # 读取Markdown内容
-        with open(md_file_path, 'r', encoding='utf-8') as f:
-            md_content = f.read()
-        
-        # 记录任务
-        tasks[task_id] = TaskStatus(
-            id=task_id,
-            status="completed",
-            filename=filename,
-            created_at=time.time(),
-            completed_at=time.time(),
-            result_path=md_file_path,
-            result_content=md_content
-        )
-        
-        return {
-            "task_id": task_id,
-            "status": "completed",
-            "message": "文件处理成功",
-            "md_content": md_content
-        }
-    
-    except HTTPException as he:
-        # 记录失败状态
-        if 'task_id' in locals():
-            tasks[task_id] = TaskStatus(
-                id=task_id,
-                status="failed",
-                filename=filename,
-                created_at=time.time(),
-                error_message=str(he.detail)
-            )
-        # 直接重新抛出HTTP异常
-        raise he
+        # 解析在worker线程中执行，这里只等待结果，不阻塞事件循环
+        md_file_path = await asyncio.wrap_future(future)
     except Exception as e:
-        # 记录失败状态
-        if 'task_id' in locals():
-            tasks[task_id] = TaskStatus(
-                id=task_id,
-                status="failed",
-                filename=filename,
-                created_at=time.time(),
-                error_message=str(e)
-            )
         logger.error(f"处理文件时出错: {str(e)}")
         raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
 
-async def process_file_async(task_id: str, filename: str, file_path: str, parse_method: str = "auto"):
+    # 读取Markdown内容
+    with open(md_file_path, 'r', encoding='utf-8') as f:
+        md_content = f.read()
+
+    return {
+        "task_id": task_id,
+        "status": "completed",
+        "message": "文件处理成功",
+        "md_content": md_content
+    }
+
+def sse_event(event: str, data: dict) -> str:
     """
-    异步处理文件的后台任务
+    格式化一条Server-Sent Event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/upload/stream")
+async def upload_stream(file: UploadFile = File(...), parse_method: str = "auto"):
+    """
+    上传并解析文件，以Server-Sent Events逐页返回结果
+
+    事件依次为：
+    - task: {"task_id"}
+    - page: 每解析完一页推送一次 {"page_idx", "md_content", "content_list"}，只做了页内的段落合并
+    - done: 全文结果 {"task_id", "md_content", "content_list"}，包含跨页的段落合并，应替换之前的逐页内容
+    - error: {"error"}
+
+    Args:
+        file: 要上传的文件
+        parse_method: 解析方法，可以是auto, ocr, txt。默认为auto。
     """
+    task_id = str(uuid.uuid4())
+    filename, file_path = await save_upload(file, task_id)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_page(page_id: int, md_content: str, content_list: list):
+        # 在worker线程中回调，转交给事件循环
+        event = sse_event("page", {"page_idx": page_id, "md_content": md_content, "content_list": content_list})
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    page_listeners[task_id] = on_page
     try:
-        if task_id not in tasks:
-            return
-            
-        output_dir = f"output/{task_id}"
-        file_extension = os.path.splitext(filename)[1]
-        
-        # 更新任务状态
-        tasks[task_id].status = "processing"
-        
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            tasks[task_id].status = "failed"
-            tasks[task_id].error_message = "找不到上传的文件"
-            return
-            
-        # 读取文件
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
-            
-        if not file_content:
-            tasks[task_id].status = "failed"
-            tasks[task_id].error_message = "文件内容为空"
-            return
-        
-        # 创建目录及准备环境
-        local_image_dir, local_md_dir = prepare_env(output_dir, "result", parse_method)
-        
-        # 调用do_parse函数处理PDF文件
-        do_parse(
-            output_dir=output_dir,
-            pdf_file_name="result",
-            pdf_bytes_or_dataset=file_content,
-            model_list=[],  # 使用内置模型
-            parse_method=parse_method,
-            f_dump_md=True,
-            f_dump_middle_json=True,
-            f_dump_model_json=True,
-            f_dump_orig_pdf=True
-        )
-        
-        # 读取生成的Markdown内容
-        md_file_path = f"{local_md_dir}/result.md"
-        
-        if not os.path.exists(md_file_path):
-            tasks[task_id].status = "failed"
-            tasks[task_id].error_message = "生成Markdown文件失败"
-            return
-            
-        # 读取Markdown内容
-        with open(md_file_path, 'r', encoding='utf-8') as f:
-            md_content = f.read()
-        
-        # 更新任务状态为已完成
-        tasks[task_id].status = "completed"
-        tasks[task_id].completed_at = time.time()
-        tasks[task_id].result_path = md_file_path
-        tasks[task_id].result_content = md_content
-        
-    except Exception as e:
-        logger.error(f"异步处理文件时出错: {str(e)}")
-        # 更新任务状态为失败
-        if task_id in tasks:
-            tasks[task_id].status = "failed"
-            tasks[task_id].error_message = str(e)
+        future = submit_job(task_id, filename, file_path, parse_method)
+    except HTTPException:
+        page_listeners.pop(task_id, None)
+        raise
+    # 回调和任务完成都发生在同一个worker线程中，done之前的page事件已经全部入队
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+
+    async def event_stream():
+        try:
+            yield sse_event("task", {"task_id": task_id})
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            try:
+                md_file_path = future.result()
+            except Exception as e:
+                logger.error(f"处理文件时出错: {str(e)}")
+                yield sse_event("error", {"error": f"处理失败: {str(e)}"})
+                return
+            with open(md_file_path, 'r', encoding='utf-8') as f:
+                md_content = f.read()
+            content_list_path = os.path.join(os.path.dirname(md_file_path), "result_content_list.json")
+            with open(content_list_path, 'r', encoding='utf-8') as f:
+                content_list = json.load(f)
+            yield sse_event("done", {"task_id": task_id, "md_content": md_content, "content_list": content_list})
+        finally:
+            page_listeners.pop(task_id, None)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/upload/async")
-async def upload_async(background_tasks: BackgroundTasks, file: UploadFile = File(...), parse_method: str = "auto"):
+async def upload_async(file: UploadFile = File(...), parse_method: str = "auto"):
     """
     异步上传文件，立即返回任务ID，后台处理文件
     
@@ -250,53 +303,16 @@ async def upload_async(background_tasks: BackgroundTasks, file: UploadFile = Fil
         file: 要上传的文件
         parse_method: 解析方法，可以是auto, ocr, txt。默认为auto。
     """
+    task_id = str(uuid.uuid4())
     try:
-        task_id = str(uuid.uuid4())
-        filename = file.filename if file.filename else f"document_{task_id}.pdf"
-        file_extension = os.path.splitext(filename)[1]
-        
-        # 检查文件类型
-        if file_extension.lower() not in pdf_extensions:
-            return JSONResponse(
-                status_code=400,
-                content={"error": f"暂时只支持PDF文件，不支持的文件类型: {file_extension}"}
-            )
-            
-        output_dir = f"output/{task_id}"
-        
-        # 确保目录存在
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 保存上传的文件
-        temp_file_path = f"{output_dir}/{filename}"
-        content = await file.read()
-        
-        if not content:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "上传文件为空"}
-            )
-        
-        async with aiofiles.open(temp_file_path, 'wb') as f:
-            await f.write(content)
-        
-        # 创建任务记录
-        tasks[task_id] = TaskStatus(
-            id=task_id,
-            status="pending",
-            filename=filename,
-            created_at=time.time(),
-            result_path=None
+        filename, file_path = await save_upload(file, task_id)
+        submit_job(task_id, filename, file_path, parse_method)
+    except HTTPException as he:
+        return JSONResponse(
+            status_code=he.status_code,
+            content={"error": he.detail},
+            headers=he.headers
         )
-        
-        # 添加异步处理任务
-        background_tasks.add_task(process_file_async, task_id, filename, temp_file_path, parse_method)
-        
-        return {
-            "task_id": task_id,
-            "status": "pending",
-            "message": "文件已接收，正在后台处理"
-        }
     except Exception as e:
         logger.error(f"异步上传文件时出错: {str(e)}")
         return JSONResponse(
@@ -304,32 +320,47 @@ async def upload_async(background_tasks: BackgroundTasks, file: UploadFile = Fil
             content={"error": f"上传文件失败: {str(e)}"}
         )
 
+    return {
+        "task_id": task_id,
+        "status": "pending",
+        "message": "文件已接收，正在后台处理"
+    }
+
+@app.get("/queue")
+async def queue_stats():
+    """
+    获取任务队列的状态
+    """
+    return job_queue.stats()
+
 @app.get("/tasks")
 async def list_tasks():
     """
     获取所有任务列表
     """
-    return {"tasks": list(tasks.values())}
+    return {"tasks": [TaskStatus.from_job(job) for job in job_store.list()]}
 
 @app.get("/tasks/{task_id}")
 async def get_task(task_id: str):
     """
     获取指定任务的状态
     """
-    if task_id not in tasks:
+    job = job_store.get(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    return tasks[task_id]
+    return TaskStatus.from_job(job, with_content=True)
 
 @app.get("/download/{task_id}")
 async def download_result(task_id: str):
     """
     下载指定任务的处理结果
     """
-    if task_id not in tasks:
+    job = job_store.get(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    task = tasks[task_id]
+    task = TaskStatus.from_job(job)
     
     if task.status != "completed":
         raise HTTPException(status_code=400, detail=f"任务尚未完成，当前状态: {task.status}")
@@ -348,10 +379,11 @@ async def download_result_zip(task_id: str):
     """
     下载指定任务的完整处理结果（包括图片）的ZIP压缩包
     """
-    if task_id not in tasks:
+    job = job_store.get(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    task = tasks[task_id]
+    task = TaskStatus.from_job(job)
     
     if task.status != "completed":
         raise HTTPException(status_code=400, detail=f"任务尚未完成，当前状态: {task.status}")
@@ -375,8 +407,12 @@ async def delete_task(task_id: str):
     """
     删除指定任务及其资源
     """
-    if task_id not in tasks:
+    job = job_store.get(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="任务不存在")
+
+    if job["status"] == "processing":
+        raise HTTPException(status_code=409, detail="任务正在处理中，无法删除")
     
     # 删除任务目录
     output_dir = f"output/{task_id}"
@@ -388,8 +424,8 @@ async def delete_task(task_id: str):
     if os.path.exists(zip_path):
         os.remove(zip_path)
     
-    # 从字典中移除任务
-    del tasks[task_id]
+    # 移除任务记录，排队中的任务会被worker跳过
+    job_store.delete(task_id)
     
     return {"message": "任务已删除"}
     
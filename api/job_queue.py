@@ -0,0 +1,195 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+JOB_COLUMNS = [
+    "id", "status", "filename", "file_path", "parse_method",
+    "created_at", "started_at", "completed_at", "error_message", "result_path",
+]
+
+
+class QueueFullError(Exception):
+    """排队任务数达到上限，拒绝新任务"""
+    pass
+
+
+class JobStore:
+    """基于SQLite的任务存储，服务重启后任务状态不会丢失"""
+
+    def __init__(self, db_path: str):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    parse_method TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    completed_at REAL,
+                    error_message TEXT,
+                    result_path TEXT
+                )
+                """
+            )
+
+    def add(self, job_id: str, filename: str, file_path: str, parse_method: str) -> Dict:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, filename, file_path, parse_method, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, "pending", filename, file_path, parse_method, time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def update(self, job_id: str, **fields):
+        for name in fields:
+            if name not in JOB_COLUMNS or name == "id":
+                raise ValueError(f"unknown job field: {name}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def delete(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def recover_unfinished(self) -> List[str]:
+        """把上次退出时未完成的任务重置为pending，按创建时间返回它们的id"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending', started_at = NULL WHERE status = 'processing'"
+            )
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'pending' ORDER BY created_at"
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """固定大小的解析worker池.
+
+    解析在worker线程中执行，不阻塞事件循环；worker数量限制了同时占用GPU的解析数，
+    排队数量超过max_queue_depth时直接拒绝新任务，避免突发流量把延迟无限拉长。
+    """
+
+    def __init__(self, store: JobStore, process_fn: Callable[[Dict], str], num_workers: int = 1, max_queue_depth: int = 32):
+        """
+        Args:
+            store: 任务存储
+            process_fn: 处理单个任务，参数为任务记录，返回结果文件路径
+            num_workers: worker线程数
+            max_queue_depth: 最多排队(未开始处理)的任务数
+        """
+        self.store = store
+        self.process_fn = process_fn
+        self.num_workers = num_workers
+        self.max_queue_depth = max_queue_depth
+        self._queue = queue.Queue()
+        self._futures: Dict[str, Future] = {}
+        self._futures_lock = threading.Lock()
+        # 检查排队数和入队在同一把锁内完成，并发提交不会超过max_queue_depth
+        self._submit_lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._processing = 0
+
+    def start(self):
+        recovered = self.store.recover_unfinished()
+        if recovered:
+            logger.info(f"恢复{len(recovered)}个未完成的任务")
+        for job_id in recovered:
+            self._enqueue(job_id)
+        for index in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def submit(self, filename: str, file_path: str, parse_method: str, job_id: str) -> Future:
+        """创建任务并排队，队列已满时抛出QueueFullError"""
+        with self._submit_lock:
+            if self._queue.qsize() >= self.max_queue_depth:
+                raise QueueFullError(f"排队任务数已达上限{self.max_queue_depth}")
+            self.store.add(job_id, filename, file_path, parse_method)
+            return self._enqueue(job_id)
+
+    def _enqueue(self, job_id: str) -> Future:
+        future = Future()
+        with self._futures_lock:
+            self._futures[job_id] = future
+        self._queue.put(job_id)
+        return future
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.num_workers,
+            "queued": self._queue.qsize(),
+            "processing": self._processing,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+            with self._futures_lock:
+                future = self._futures.pop(job_id, None)
+            job = self.store.get(job_id)
+            if job is None or job["status"] != "pending":
+                # 任务在排队期间被删除
+                if future is not None:
+                    future.cancel()
+                continue
+            with self._futures_lock:
+                self._processing += 1
+            self.store.update(job_id, status="processing", started_at=time.time())
+            try:
+                result_path = self.process_fn(job)
+                self.store.update(job_id, status="completed", completed_at=time.time(), result_path=result_path)
+                if future is not None:
+                    future.set_result(result_path)
+            except Exception as e:
+                logger.exception(e)
+                self.store.update(job_id, status="failed", completed_at=time.time(), error_message=str(e))
+                if future is not None:
+                    future.set_exception(e)
+            finally:
+                with self._futures_lock:
+                    self._processing -= 1
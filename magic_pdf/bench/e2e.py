@@ -0,0 +1,144 @@
+import os
+import tempfile
+import time
+
+from loguru import logger
+
+from magic_pdf.bench.report import make_report, summarize_latencies
+from magic_pdf.bench.synthetic import (DOC_KINDS, make_synthetic_pdf,
+                                       synthetic_model_json)
+from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+from magic_pdf.data.dataset import PymuDocDataset
+
+STAGES = ('load', 'classify', 'render', 'analyze', 'pipe', 'export')
+BENCH_MODELS = ('synthetic', 'full')
+
+
+def _run_document(pdf_bytes: bytes, ground_truth: list, model: str, parse_method: str, output_dir: str) -> dict:
+    """对一个文档完整执行一次解析，返回各阶段耗时(秒)."""
+    from magic_pdf.operators.models import InferenceResult
+
+    timings = {}
+
+    start = time.perf_counter()
+    ds = PymuDocDataset(pdf_bytes)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if parse_method == 'auto':
+        ocr = ds.classify() == SupportedPdfParseMethod.OCR
+    else:
+        ocr = parse_method == 'ocr'
+    timings['classify'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for index in range(len(ds)):
+        ds.get_page(index).get_image()
+    timings['render'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if model == 'synthetic':
+        infer_result = InferenceResult(synthetic_model_json(ds, ground_truth, ocr), ds)
+    else:
+        from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
+        infer_result = ds.apply(doc_analyze, ocr=ocr)
+    timings['analyze'] = time.perf_counter() - start
+
+    image_dir = os.path.join(output_dir, 'images')
+    image_writer, md_writer = FileBasedDataWriter(image_dir), FileBasedDataWriter(output_dir)
+
+    start = time.perf_counter()
+    if ocr:
+        pipe_result = infer_result.pipe_ocr_mode(image_writer)
+    else:
+        pipe_result = infer_result.pipe_txt_mode(image_writer)
+    timings['pipe'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipe_result.dump_all(
+        md_writer,
+        'images',
+        md_file_path='bench.md',
+        content_list_file_path='bench_content_list.json',
+        middle_json_file_path='bench_middle.json',
+    )
+    timings['export'] = time.perf_counter() - start
+    return timings
+
+
+def run_e2e_benchmark(
+    kinds=DOC_KINDS,
+    page_count: int = 8,
+    repeat: int = 3,
+    warmup: int = 1,
+    seed: int = 0,
+    model: str = 'synthetic',
+    parse_method: str = 'auto',
+    output_dir: str = None,
+) -> dict:
+    """在合成文档上端到端地运行解析流程，统计吞吐、各阶段耗时分位数和峰值内存.
+
+    Args:
+        kinds (Iterable[str], optional): the synthetic document kinds, see DOC_KINDS. Defaults to DOC_KINDS.
+        page_count (int, optional): the number of pages of each document. Defaults to 8.
+        repeat (int, optional): the measured runs of each document. Defaults to 3.
+        warmup (int, optional): the unmeasured runs of each document before measuring, the first run also
+            includes the model loading. Defaults to 1.
+        seed (int, optional): the random seed of synthetic documents. Defaults to 0.
+        model (str, optional): synthetic: build the model result from the ground truth of synthetic documents,
+            no model weights are needed; full: run doc_analyze with the configured models. Defaults to 'synthetic'.
+        parse_method (str, optional): auto, txt or ocr. Defaults to 'auto'.
+        output_dir (str, optional): the directory of parse outputs, a temporary directory is used if None.
+            Defaults to None.
+
+    Returns:
+        dict: the report, which is json serializable and comparable across commits
+    """
+    if model not in BENCH_MODELS:
+        raise ValueError(f'unknown bench model: {model}, must be one of {BENCH_MODELS}')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dir = output_dir or tmp_dir
+        results = {}
+        total_pages, total_seconds = 0, 0.0
+        for kind in kinds:
+            pdf_bytes, ground_truth = make_synthetic_pdf(kind, page_count, seed)
+            stage_seconds = {stage: [] for stage in STAGES}
+            run_seconds = []
+            for run in range(warmup + repeat):
+                timings = _run_document(pdf_bytes, ground_truth, model, parse_method, os.path.join(output_dir, kind))
+                if run < warmup:
+                    continue
+                for stage in STAGES:
+                    stage_seconds[stage].append(timings[stage])
+                run_seconds.append(sum(timings.values()))
+            seconds = sum(run_seconds)
+            results[kind] = {
+                'pages': page_count,
+                'runs': repeat,
+                'pages_per_sec': round(page_count * repeat / seconds, 3),
+                'document': summarize_latencies(run_seconds),
+                'stages': {stage: summarize_latencies(stage_seconds[stage]) for stage in STAGES},
+            }
+            total_pages += page_count * repeat
+            total_seconds += seconds
+            logger.info(f"bench {kind}: {results[kind]['pages_per_sec']} pages/sec")
+
+    return make_report(
+        {
+            'kinds': list(kinds),
+            'page_count': page_count,
+            'repeat': repeat,
+            'warmup': warmup,
+            'seed': seed,
+            'model': model,
+            'parse_method': parse_method,
+        },
+        results,
+        total={
+            'pages': total_pages,
+            'seconds': round(total_seconds, 3),
+            'pages_per_sec': round(total_pages / total_seconds, 3) if total_seconds else 0.0,
+        },
+    )
@@ -0,0 +1,240 @@
+import copy
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from loguru import logger
+
+from magic_pdf.bench.report import make_report, summarize_latencies
+from magic_pdf.bench.synthetic import make_synthetic_pdf, synthetic_model_json
+from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.config.make_content_config import DropMode, MakeMode
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.libs.convert_utils import dict_to_list
+
+# 模型结果文件名后缀，去掉后缀即为对应pdf的文件名
+MODEL_JSON_SUFFIXES = ('.model.json', '_model.json')
+
+
+def load_fixtures(paths: list[str]) -> list[dict]:
+    """加载保存的模型结果及其对应的pdf.
+
+    目录中的每个 {name}.model.json 或 {name}_model.json 与同目录下的
+    {name}.pdf 或 {name}_origin.pdf 组成一个fixture，没有对应pdf的模型结果会被忽略。
+
+    Args:
+        paths (list[str]): model json files or directories containing them
+
+    Returns:
+        list[dict]: {'name', 'pdf_bytes', 'model_list'}
+    """
+    model_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            model_files.extend(sorted(str(p) for p in Path(path).iterdir() if p.name.endswith(MODEL_JSON_SUFFIXES)))
+        else:
+            model_files.append(path)
+
+    fixtures = []
+    for model_file in model_files:
+        suffix = next((s for s in MODEL_JSON_SUFFIXES if model_file.endswith(s)), None)
+        if suffix is None:
+            raise ValueError(f'not a model json file: {model_file}')
+        stem = model_file[:-len(suffix)]
+        pdf_file = next((f for f in (f'{stem}.pdf', f'{stem}_origin.pdf') if os.path.exists(f)), None)
+        if pdf_file is None:
+            logger.warning(f'no pdf found for {model_file}, ignored')
+            continue
+        with open(model_file, 'r', encoding='utf-8') as f:
+            model_list = json.load(f)
+        with open(pdf_file, 'rb') as f:
+            pdf_bytes = f.read()
+        fixtures.append({'name': os.path.basename(stem), 'pdf_bytes': pdf_bytes, 'model_list': model_list})
+    return fixtures
+
+
+def synthetic_fixtures(kinds, page_count: int = 8, seed: int = 0, ocr: bool = False) -> list[dict]:
+    """用合成文档及其真实版面生成fixture，不需要保存的文件."""
+    fixtures = []
+    for kind in kinds:
+        pdf_bytes, ground_truth = make_synthetic_pdf(kind, page_count, seed)
+        model_list = synthetic_model_json(PymuDocDataset(pdf_bytes), ground_truth, ocr or kind == 'scan')
+        fixtures.append({'name': f'synthetic_{kind}', 'pdf_bytes': pdf_bytes, 'model_list': model_list})
+    return fixtures
+
+
+def _drop_key(obj, key: str):
+    if isinstance(obj, dict):
+        obj.pop(key, None)
+        for value in obj.values():
+            _drop_key(value, key)
+    elif isinstance(obj, list):
+        for value in obj:
+            _drop_key(value, key)
+
+
+class _FixtureStages:
+    """一个fixture上各后处理阶段的输入准备和执行.
+
+    每个阶段由setup和run组成，setup准备一份新的输入(不计时)，run只执行被测的函数。
+    后一阶段的输入由前一阶段的结果预先计算得到。
+    """
+
+    def __init__(self, fixture: dict, parse_method: str, image_dir: str):
+        from magic_pdf.model.magic_model import MagicModel
+        from magic_pdf.pdf_parse_union_core_v2 import parse_page_core
+        from magic_pdf.post_proc.para_split_v3 import para_split
+
+        self._magic_model_cls = MagicModel
+        self._parse_page_core = parse_page_core
+        self._para_split = para_split
+
+        self.model_list = fixture['model_list']
+        self.dataset = PymuDocDataset(fixture['pdf_bytes'])
+        if parse_method == 'auto':
+            ocr = self.dataset.classify() == SupportedPdfParseMethod.OCR
+        else:
+            ocr = parse_method == 'ocr'
+        self.parse_mode = SupportedPdfParseMethod.OCR if ocr else SupportedPdfParseMethod.TXT
+        self.pdf_bytes_md5 = self.dataset.data_md5()
+        self.image_writer = FileBasedDataWriter(image_dir)
+
+        self.parsed = self.parse_pages(self.new_magic_model())
+        # 需要ocr的span带有截图，ocr识别依赖模型，不在测试范围内
+        _drop_key(self.parsed, 'np_img')
+        split = copy.deepcopy(self.parsed)
+        self.split_pages(split)
+        self.pdf_info = dict_to_list(split)
+
+    def new_model_list(self):
+        return copy.deepcopy(self.model_list)
+
+    def new_magic_model(self):
+        return self._magic_model_cls(self.new_model_list(), self.dataset)
+
+    def build_magic_model(self, model_list):
+        return self._magic_model_cls(model_list, self.dataset)
+
+    def parse_pages(self, magic_model) -> dict:
+        return {
+            f'page_{page_id}': self._parse_page_core(
+                self.dataset.get_page(page_id), magic_model, page_id, self.pdf_bytes_md5,
+                self.image_writer, self.parse_mode, None,
+            )
+            for page_id in range(len(self.dataset))
+        }
+
+    def split_pages(self, pdf_info_dict: dict):
+        self._para_split(pdf_info_dict)
+
+    def run_all(self, model_list):
+        pdf_info_dict = self.parse_pages(self.build_magic_model(model_list))
+        _drop_key(pdf_info_dict, 'np_img')
+        self.split_pages(pdf_info_dict)
+        pdf_info = dict_to_list(pdf_info_dict)
+        self.make_md(pdf_info)
+        self.make_content_list(pdf_info)
+
+    def make_md(self, pdf_info):
+        from magic_pdf.dict2md.ocr_mkcontent import union_make
+        return union_make(pdf_info, MakeMode.MM_MD, DropMode.NONE, 'images')
+
+    def make_content_list(self, pdf_info):
+        from magic_pdf.dict2md.ocr_mkcontent import union_make
+        return union_make(pdf_info, MakeMode.STANDARD_FORMAT, DropMode.NONE, 'images')
+
+    def stages(self) -> dict:
+        """阶段名 -> (setup, run)，aggregate按顺序执行全部阶段."""
+        return {
+            'magic_model': (self.new_model_list, self.build_magic_model),
+            'parse_page_core': (self.new_magic_model, self.parse_pages),
+            'para_split': (lambda: copy.deepcopy(self.parsed), self.split_pages),
+            'union_make_md': (lambda: self.pdf_info, self.make_md),
+            'union_make_content_list': (lambda: self.pdf_info, self.make_content_list),
+            'aggregate': (self.new_model_list, self.run_all),
+        }
+
+
+def _measure_time(setup, run, repeat: int, warmup: int) -> list[float]:
+    seconds = []
+    for index in range(warmup + repeat):
+        data = setup()
+        start = time.perf_counter()
+        run(data)
+        elapsed = time.perf_counter() - start
+        if index >= warmup:
+            seconds.append(elapsed)
+    return seconds
+
+
+def _measure_allocations(setup, run) -> dict:
+    """单独运行一次统计内存分配，tracemalloc的开销很大，不和计时混在一起."""
+    data = setup()
+    tracemalloc.start()
+    try:
+        # 保留run的返回值，统计结果中包含它占用的内存
+        result = run(data)  # noqa: F841
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    finally:
+        tracemalloc.stop()
+    return {
+        'alloc_peak_kb': round(peak / 1024, 1),
+        'alloc_retained_kb': round(current / 1024, 1),
+        'alloc_retained_blocks': blocks,
+    }
+
+
+def run_microbenchmark(
+    fixtures: list[dict],
+    repeat: int = 5,
+    warmup: int = 1,
+    parse_method: str = 'auto',
+    track_allocations: bool = True,
+) -> dict:
+    """不运行任何模型，用保存的模型结果逐个测试后处理阶段的耗时和内存分配.
+
+    阶段: magic_model(MagicModel初始化)、parse_page_core(逐页解析)、para_split(分段)、
+    union_make_md和union_make_content_list(生成markdown和content list)，aggregate为依次执行全部阶段。
+
+    Args:
+        fixtures (list[dict]): the fixtures returned by load_fixtures or synthetic_fixtures
+        repeat (int, optional): the measured runs of each stage. Defaults to 5.
+        warmup (int, optional): the unmeasured runs of each stage before measuring. Defaults to 1.
+        parse_method (str, optional): auto, txt or ocr. Defaults to 'auto'.
+        track_allocations (bool, optional): run each stage once more under tracemalloc and report the peak
+            and retained allocations. Defaults to True.
+
+    Returns:
+        dict: the report, can be compared with the report of other commits by compare_reports
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as image_dir:
+        for fixture in fixtures:
+            fixture_stages = _FixtureStages(fixture, parse_method, image_dir)
+            stage_results = {}
+            for stage, (setup, run) in fixture_stages.stages().items():
+                stage_results[stage] = summarize_latencies(_measure_time(setup, run, repeat, warmup))
+                if track_allocations:
+                    stage_results[stage].update(_measure_allocations(setup, run))
+            results[fixture['name']] = {
+                'pages': len(fixture_stages.dataset),
+                'parse_mode': fixture_stages.parse_mode.value,
+                'stages': stage_results,
+            }
+            logger.info(f"microbench {fixture['name']}: aggregate {stage_results['aggregate']['p50_ms']} ms")
+
+    return make_report(
+        {
+            'fixtures': [fixture['name'] for fixture in fixtures],
+            'repeat': repeat,
+            'warmup': warmup,
+            'parse_method': parse_method,
+            'track_allocations': track_allocations,
+        },
+        results,
+    )
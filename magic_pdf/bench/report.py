@@ -0,0 +1,107 @@
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+# 报告格式变化时加1，不同schema的报告之间不可比较
+REPORT_SCHEMA = 1
+
+
+def get_peak_rss_mb() -> float | None:
+    """当前进程的峰值RSS(MB)，平台不支持时返回None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux上单位是KB，macOS上是字节
+    if platform.system() == 'Darwin':
+        return round(peak / 1024 / 1024, 1)
+    return round(peak / 1024, 1)
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def summarize_latencies(seconds: list[float]) -> dict:
+    """把一组耗时(秒)汇总成毫秒为单位的分位数."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        'count': len(seconds),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p90_ms': round(float(np.percentile(ms, 90)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def make_report(config: dict, results: dict, **extra) -> dict:
+    """生成带有版本、commit和平台信息的报告，results的格式为 {名称: {'stages': {阶段: summarize_latencies的结果}}}"""
+    from magic_pdf.libs.version import __version__
+
+    return {
+        'schema': REPORT_SCHEMA,
+        'version': __version__,
+        'commit': get_git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'platform': {
+            'python': platform.python_version(),
+            'system': platform.system(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': config,
+        'results': results,
+        **extra,
+        'peak_rss_mb': get_peak_rss_mb(),
+    }
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.1, metric: str = 'p50_ms') -> list[dict]:
+    """按阶段比较两份报告的耗时.
+
+    只比较两份报告中都存在的名称和阶段。
+
+    Args:
+        baseline (dict): the baseline report
+        current (dict): the current report
+        threshold (float, optional): the relative slowdown treated as a regression. Defaults to 0.1.
+        metric (str, optional): the latency metric to compare. Defaults to 'p50_ms'.
+
+    Returns:
+        list[dict]: one item for each compared stage, sorted by the ratio in descending order,
+            {'name', 'stage', 'baseline', 'current', 'ratio', 'regression'}
+    """
+    if baseline.get('schema') != current.get('schema'):
+        raise ValueError(f"can not compare reports of schema {baseline.get('schema')} and {current.get('schema')}")
+    rows = []
+    for name, result in current['results'].items():
+        baseline_result = baseline['results'].get(name)
+        if baseline_result is None:
+            continue
+        for stage, latency in result['stages'].items():
+            baseline_latency = baseline_result['stages'].get(stage)
+            if baseline_latency is None:
+                continue
+            base, cur = baseline_latency[metric], latency[metric]
+            ratio = cur / base if base > 0 else 1.0
+            rows.append({
+                'name': name,
+                'stage': stage,
+                'baseline': base,
+                'current': cur,
+                'ratio': round(ratio, 3),
+                'regression': ratio > 1 + threshold,
+            })
+    return sorted(rows, key=lambda row: row['ratio'], reverse=True)
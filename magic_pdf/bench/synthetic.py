@@ -0,0 +1,284 @@
+import random
+
+import fitz
+
+from magic_pdf.config.ocr_content_type import CategoryId
+from magic_pdf.data.dataset import Dataset
+
+DOC_KINDS = ('text', 'scan', 'table', 'formula', 'mixed')
+# mixed不包含扫描页: txt模式下没有文本层的行会回退到ocr识别模型
+MIXED_PAGE_KINDS = ('text', 'table', 'formula')
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4
+MARGIN = 60
+FONT = fitz.Font('helv')
+SCAN_DPI = 150
+
+WORDS = (
+    'model layout document page text table formula image caption detection recognition '
+    'pipeline benchmark latency throughput memory batch parse extract result region block '
+    'line span paragraph reading order column header footer figure equation matrix vector '
+    'sample dataset training inference accuracy precision recall score threshold value '
+    'process system method analysis structure content output input format stage'
+).split()
+
+FORMULAS = [
+    ('f(x) = a x^2 + b x + c', 'f(x)=ax^{2}+bx+c'),
+    ('E = m c^2', 'E=mc^{2}'),
+    ('a^2 + b^2 = c^2', 'a^{2}+b^{2}=c^{2}'),
+    ('sum_{i=1}^{n} i = n(n+1)/2', '\\sum_{i=1}^{n}i=\\frac{n(n+1)}{2}'),
+    ('p(y|x) = p(x|y) p(y) / p(x)', 'p(y|x)=\\frac{p(x|y)p(y)}{p(x)}'),
+]
+
+
+_char_widths = {}
+
+
+def _text_length(text: str, fontsize: float) -> float:
+    # Font.text_length逐字符调用mupdf，排版时按字符缓存宽度
+    width = 0
+    for char in text:
+        if char not in _char_widths:
+            _char_widths[char] = FONT.glyph_advance(ord(char))
+        width += _char_widths[char]
+    return width * fontsize
+
+
+class _PageWriter:
+    """在一页上从上到下排版合成内容，同时记录每个块的真实类别、bbox和文本行."""
+
+    def __init__(self, page: fitz.Page, rng: random.Random):
+        self.page = page
+        self.rng = rng
+        # 文本和图形都先收集起来，finish时一次性写入页面
+        self.text_writer = fitz.TextWriter(page.rect)
+        self.shape = page.new_shape()
+        self.y = MARGIN
+        self.blocks = []
+        self.content_width = PAGE_WIDTH - 2 * MARGIN
+
+    def finish(self):
+        self.shape.commit()
+        self.text_writer.write_text(self.page)
+
+    def room(self, height: float) -> bool:
+        return self.y + height <= PAGE_HEIGHT - MARGIN
+
+    def _write_line(self, x: float, y_top: float, text: str, fontsize: float) -> tuple:
+        baseline = y_top + FONT.ascender * fontsize
+        self.text_writer.append((x, baseline), text, font=FONT, fontsize=fontsize)
+        width = _text_length(text, fontsize)
+        return [x, y_top, x + width, baseline - FONT.descender * fontsize], text
+
+    def _wrap(self, text: str, fontsize: float, width: float) -> list[str]:
+        lines, current = [], ''
+        for word in text.split():
+            candidate = f'{current} {word}' if current else word
+            if current and _text_length(candidate, fontsize) > width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        if current:
+            lines.append(current)
+        return lines
+
+    def text_block(self, category_id: int, text: str, fontsize: float, x: float = MARGIN, width: float = None, gap: float = 8) -> bool:
+        width = width or self.content_width
+        wrapped = self._wrap(text, fontsize, width)
+        leading = fontsize * 1.4
+        if not self.room(leading * len(wrapped)):
+            return False
+        lines = [self._write_line(x, self.y + i * leading, line, fontsize) for i, line in enumerate(wrapped)]
+        self.blocks.append({
+            'category_id': category_id,
+            'bbox': _union([bbox for bbox, _ in lines]),
+            'lines': lines,
+        })
+        self.y += leading * len(wrapped) + gap
+        return True
+
+    def paragraph(self) -> bool:
+        sentences = [self._sentence() for _ in range(self.rng.randint(3, 6))]
+        return self.text_block(CategoryId.Text, ' '.join(sentences), 10)
+
+    def title(self) -> bool:
+        words = self.rng.sample(WORDS, self.rng.randint(3, 6))
+        return self.text_block(CategoryId.Title, ' '.join(words).title(), 15, gap=10)
+
+    def table(self, index: int) -> bool:
+        rows, cols = self.rng.randint(3, 6), self.rng.randint(3, 5)
+        row_height = 18
+        if not self.room(row_height * (rows + 2)):
+            return False
+        self.text_block(CategoryId.TableCaption, f'Table {index}: {self._sentence()}', 9, gap=4)
+        col_width = self.content_width / cols
+        top = self.y
+        html_rows = []
+        for r in range(rows):
+            cells = []
+            for c in range(cols):
+                cell = fitz.Rect(MARGIN + c * col_width, top + r * row_height,
+                                 MARGIN + (c + 1) * col_width, top + (r + 1) * row_height)
+                self.shape.draw_rect(cell)
+                text = self.rng.choice(WORDS) if r == 0 else f'{self.rng.uniform(0, 1000):.2f}'
+                self._write_line(cell.x0 + 4, cell.y0 + 4, text, 8)
+                cells.append(f'<td>{text}</td>')
+            html_rows.append(f"<tr>{''.join(cells)}</tr>")
+        self.shape.finish(color=(0, 0, 0), width=0.5)
+        self.blocks.append({
+            'category_id': CategoryId.TableBody,
+            'bbox': [MARGIN, top, MARGIN + self.content_width, top + rows * row_height],
+            'lines': [],
+            'html': f"<html><body><table>{''.join(html_rows)}</table></body></html>",
+        })
+        self.y = top + rows * row_height + 10
+        return True
+
+    def formula(self) -> bool:
+        text, latex = self.rng.choice(FORMULAS)
+        fontsize = 12
+        height = fontsize * 1.4
+        if not self.room(height):
+            return False
+        width = _text_length(text, fontsize)
+        bbox, _ = self._write_line((PAGE_WIDTH - width) / 2, self.y, text, fontsize)
+        # 与真实模型一致: layout给出公式区域(8)，公式检测识别给出带latex的公式(14)
+        self.blocks.append({'category_id': CategoryId.InterlineEquation_Layout, 'bbox': bbox, 'lines': []})
+        self.blocks.append({'category_id': CategoryId.InterlineEquation_YOLO, 'bbox': bbox, 'lines': [], 'latex': latex})
+        self.y += height + 8
+        return True
+
+    def figure(self, index: int) -> bool:
+        height = self.rng.randint(120, 200)
+        if not self.room(height + 20):
+            return False
+        width = self.rng.randint(200, int(self.content_width))
+        x0 = (PAGE_WIDTH - width) / 2
+        rect = fitz.Rect(x0, self.y, x0 + width, self.y + height)
+        self.shape.draw_rect(rect)
+        self.shape.finish(color=(0.2, 0.2, 0.2), width=1)
+        for _ in range(12):
+            x, y = self.rng.uniform(rect.x0 + 10, rect.x1 - 30), self.rng.uniform(rect.y0 + 10, rect.y1 - 30)
+            color = (self.rng.random(), self.rng.random(), self.rng.random())
+            self.shape.draw_rect(fitz.Rect(x, y, x + 20, y + 20))
+            self.shape.finish(color=color, fill=color)
+        self.blocks.append({'category_id': CategoryId.ImageBody, 'bbox': list(rect), 'lines': []})
+        self.y += height + 4
+        return self.text_block(CategoryId.ImageCaption, f'Figure {index}: {self._sentence()}', 9, x=x0, width=width)
+
+    def header_footer(self, page_no: int):
+        for y, text in [(25, 'Synthetic benchmark document'), (PAGE_HEIGHT - 40, f'{page_no + 1}')]:
+            x = (PAGE_WIDTH - _text_length(text, 8)) / 2
+            bbox, _ = self._write_line(x, y, text, 8)
+            self.blocks.append({'category_id': CategoryId.Abandon, 'bbox': bbox, 'lines': [(bbox, text)]})
+
+    def _sentence(self) -> str:
+        words = [self.rng.choice(WORDS) for _ in range(self.rng.randint(8, 16))]
+        return ' '.join(words).capitalize() + '.'
+
+
+def _union(bboxes: list) -> list:
+    return [
+        min(b[0] for b in bboxes), min(b[1] for b in bboxes),
+        max(b[2] for b in bboxes), max(b[3] for b in bboxes),
+    ]
+
+
+def _fill_page(writer: _PageWriter, page_kind: str, page_no: int):
+    writer.header_footer(page_no)
+    if page_no == 0 or page_kind == 'text':
+        writer.title()
+    extras = {
+        'table': lambda: writer.table(page_no + 1),
+        'formula': writer.formula,
+        'text': lambda: writer.figure(page_no + 1) if writer.rng.random() < 0.3 else writer.paragraph(),
+        'scan': writer.paragraph,
+    }[page_kind]
+    while writer.paragraph() and extras():
+        pass
+    writer.finish()
+
+
+def make_synthetic_pdf(kind: str, page_count: int, seed: int = 0) -> tuple[bytes, list[list[dict]]]:
+    """生成确定性的合成pdf，相同的参数生成相同的内容.
+
+    Args:
+        kind (str): one of DOC_KINDS. text: text pages with figures; scan: text pages rasterized to images without
+            text layer; table: text with ruled tables; formula: text with interline formulas; mixed: text, table and
+            formula pages in turn
+        page_count (int): the number of pages
+        seed (int, optional): the random seed. Defaults to 0.
+
+    Returns:
+        tuple[bytes, list[list[dict]]]: the pdf bytes and the ground truth blocks of each page,
+            each block is {'category_id', 'bbox' (in pdf points), 'lines': [(bbox, text)], optional 'latex'/'html'}
+    """
+    if kind not in DOC_KINDS:
+        raise ValueError(f'unknown synthetic document kind: {kind}, must be one of {DOC_KINDS}')
+    rng = random.Random(seed * len(DOC_KINDS) + DOC_KINDS.index(kind))
+    doc = fitz.open()
+    ground_truth = []
+    for page_no in range(page_count):
+        page_kind = MIXED_PAGE_KINDS[page_no % len(MIXED_PAGE_KINDS)] if kind == 'mixed' else kind
+        if page_kind == 'scan':
+            # 先在临时文档中排版，再栅格化成图片放入页面，页面上没有文本层
+            tmp_doc = fitz.open()
+            writer = _PageWriter(tmp_doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT), rng)
+            _fill_page(writer, page_kind, page_no)
+            pix = writer.page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+            doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT).insert_image(
+                fitz.Rect(0, 0, PAGE_WIDTH, PAGE_HEIGHT), pixmap=pix
+            )
+            tmp_doc.close()
+        else:
+            writer = _PageWriter(doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT), rng)
+            _fill_page(writer, page_kind, page_no)
+        ground_truth.append(writer.blocks)
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+    return pdf_bytes, ground_truth
+
+
+def _poly(bbox: list, scale_x: float, scale_y: float) -> list:
+    x0, y0, x1, y1 = bbox[0] * scale_x, bbox[1] * scale_y, bbox[2] * scale_x, bbox[3] * scale_y
+    return [x0, y0, x1, y0, x1, y1, x0, y1]
+
+
+def synthetic_model_json(dataset: Dataset, ground_truth: list[list[dict]], ocr: bool) -> list[dict]:
+    """根据合成pdf的真实版面生成与doc_analyze格式一致的模型结果，用于在没有模型权重时测试后处理性能.
+
+    与真实模型一样，每个文本行都给出一个ocr检测框(15)，只有ocr为True时才带有识别出的文本。
+    页面图片通过dataset渲染，图片已缓存时不会重复渲染。
+
+    Args:
+        dataset (Dataset): the dataset of the synthetic pdf
+        ground_truth (list[list[dict]]): the ground truth returned by make_synthetic_pdf
+        ocr (bool): the ocr flag of doc_analyze
+
+    Returns:
+        list[dict]: the model json, one {'layout_dets', 'page_info'} for each page
+    """
+    model_json = []
+    for page_no, blocks in enumerate(ground_truth):
+        page = dataset.get_page(page_no)
+        img_dict = page.get_image()
+        page_w, page_h = page.get_page_info().w, page.get_page_info().h
+        scale_x, scale_y = img_dict['width'] / page_w, img_dict['height'] / page_h
+        layout_dets = []
+        for block in blocks:
+            det = {'category_id': block['category_id'], 'poly': _poly(block['bbox'], scale_x, scale_y), 'score': 0.99}
+            for key in ('latex', 'html'):
+                if key in block:
+                    det[key] = block[key]
+            layout_dets.append(det)
+            for line_bbox, text in block['lines']:
+                layout_dets.append({
+                    'category_id': CategoryId.OcrText,
+                    'poly': _poly(line_bbox, scale_x, scale_y),
+                    'score': 0.99,
+                    'text': text if ocr else '',
+                })
+        page_info = {'page_no': page_no, 'width': img_dict['width'], 'height': img_dict['height']}
+        model_json.append({'layout_dets': layout_dets, 'page_info': page_info})
+    return model_json
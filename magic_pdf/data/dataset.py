@@ -1,14 +1,19 @@
+import copy
+import io
 import os
 from abc import ABC, abstractmethod
 from typing import Callable, Iterator
 
 import fitz
+import numpy as np
 from loguru import logger
 
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.data.schemas import PageInfo
-from magic_pdf.data.utils import fitz_doc_to_image
+from magic_pdf.data.utils import (fitz_doc_to_image, image_to_dpi,
+                                   pixmap_to_rgb_array, resize_image)
 from magic_pdf.filter import classify
+from magic_pdf.libs.hash_utils import compute_file_md5, compute_md5
 
 
 class PageableData(ABC):
@@ -83,6 +88,10 @@ class Dataset(ABC):
         """The bits used to create this dataset."""
         pass
 
+    def data_md5(self) -> str:
+        """The md5 of the bits used to create this dataset, which is used to name the images cut from the pages."""
+        return compute_md5(self.data_bits())
+
     @abstractmethod
     def get_page(self, page_id: int) -> PageableData:
         """Get the page indexed by page_id.
@@ -133,36 +142,85 @@ class Dataset(ABC):
 
 
 class PymuDocDataset(Dataset):
-    def __init__(self, bits: bytes, lang=None):
+    def __init__(self, bits: bytes | str | os.PathLike, lang=None, start_page_id=0, end_page_id=None):
         """Initialize the dataset, which wraps the pymudoc documents.
 
         Args:
-            bits (bytes): the bytes of the pdf
+            bits (bytes | str | os.PathLike): the bytes or the file path of the pdf. the file is read by pymupdf
+                page by page on demand instead of being loaded into memory
+            lang (str, optional): the language of the pdf. Defaults to None.
+            start_page_id (int, optional): the first page of this dataset. Defaults to 0.
+            end_page_id (int, optional): the last page (inclusive) of this dataset, None means the last page of
+                the pdf. Defaults to None.
         """
-        self._raw_fitz = fitz.open('pdf', bits)
-        self._records = [Doc(v) for v in self._raw_fitz]
-        self._data_bits = bits
-        self._raw_data = bits
-        self._classify_result = None
+        if isinstance(bits, (bytes, bytearray)):
+            self._source = bytes(bits)
+            self._raw_fitz = fitz.open('pdf', self._source)
+        else:
+            self._source = os.fspath(bits)
+            self._raw_fitz = fitz.open(self._source, filetype='pdf')
+        self._source_md5 = None
+        self._set_page_range(start_page_id, end_page_id)
 
         if lang == '':
             self._lang = None
         elif lang == 'auto':
             from magic_pdf.model.sub_modules.language_detection.utils import \
                 auto_detect_lang
-            self._lang = auto_detect_lang(self._data_bits)
+            self._lang = auto_detect_lang(self._raw_fitz, self._page_ids)
             logger.info(f'lang: {lang}, detect_lang: {self._lang}')
         else:
             self._lang = lang
             logger.info(f'lang: {lang}')
 
+    def _set_page_range(self, start_page_id, end_page_id):
+        page_count = len(self._raw_fitz)
+        end_page_id = (
+            end_page_id
+            if end_page_id is not None and end_page_id >= 0
+            else page_count - 1
+        )
+        if end_page_id > page_count - 1:
+            logger.warning('end_page_id is out of range, use pdf_docs length')
+            end_page_id = page_count - 1
+        # 页码是在原文档中的页码，Doc对象在第一次访问时才创建
+        self._page_ids = range(start_page_id, end_page_id + 1)
+        self._records = [None] * len(self._page_ids)
+        self._data_bits = self._source if self._is_whole_bytes() else None
+        self._classify_result = None
+
+    def _is_whole_bytes(self) -> bool:
+        return isinstance(self._source, bytes) and self._page_ids == range(len(self._raw_fitz))
+
+    def page_range(self, start_page_id=0, end_page_id=None) -> 'PymuDocDataset':
+        """A view of the pages in [start_page_id, end_page_id], which shares the opened document with this
+        dataset and does not copy the pdf.
+
+        Args:
+            start_page_id (int, optional): the first page, relative to this dataset. Defaults to 0.
+            end_page_id (int, optional): the last page (inclusive), relative to this dataset, None means the last
+                page. Defaults to None.
+
+        Returns:
+            PymuDocDataset: the view
+        """
+        view = copy.copy(self)
+        if end_page_id is None or end_page_id < 0 or end_page_id > len(self) - 1:
+            end_page_id = len(self) - 1
+        view._set_page_range(
+            self._page_ids.start + start_page_id,
+            self._page_ids.start + end_page_id,
+        )
+        return view
+
     def __len__(self) -> int:
         """The page number of the pdf."""
-        return len(self._records)
+        return len(self._page_ids)
 
     def __iter__(self) -> Iterator[PageableData]:
         """Yield the page doc object."""
-        return iter(self._records)
+        for page_id in range(len(self)):
+            yield self.get_page(page_id)
 
     def supported_methods(self) -> list[SupportedPdfParseMethod]:
         """The method supported by this dataset.
@@ -173,9 +231,43 @@ class PymuDocDataset(Dataset):
         return [SupportedPdfParseMethod.OCR, SupportedPdfParseMethod.TXT]
 
     def data_bits(self) -> bytes:
-        """The pdf bits used to create this dataset."""
+        """The pdf bits used to create this dataset.
+
+        for a file path or a page range, the bits are generated on the first call: the whole file is read, or
+        the pages in the range are saved as a new pdf.
+        """
+        if self._data_bits is None:
+            if isinstance(self._source, str) and self._page_ids == range(len(self._raw_fitz)):
+                with open(self._source, 'rb') as f:
+                    self._data_bits = f.read()
+            else:
+                output_document = fitz.open()
+                if len(self._page_ids) > 0:
+                    output_document.insert_pdf(
+                        self._raw_fitz, from_page=self._page_ids.start, to_page=self._page_ids.stop - 1
+                    )
+                self._data_bits = output_document.tobytes()
         return self._data_bits
 
+    def data_md5(self) -> str:
+        """The md5 of the pdf used to create this dataset, which is used to name the images cut from the pages.
+
+        a file path is hashed in chunks instead of being read into memory, and a page range is named by the md5
+        of the whole pdf and the range instead of the bits of the pages in the range.
+        """
+        if self._source_md5 is None:
+            if isinstance(self._source, bytes):
+                self._source_md5 = compute_md5(self._source)
+            else:
+                self._source_md5 = compute_file_md5(self._source)
+        if self._page_ids == range(len(self._raw_fitz)):
+            return self._source_md5
+        return compute_md5(f'{self._source_md5}:{self._page_ids.start}-{self._page_ids.stop - 1}'.encode())
+
+    @property
+    def _raw_data(self) -> bytes:
+        return self.data_bits()
+
     def get_page(self, page_id: int) -> PageableData:
         """The page doc object.
 
@@ -185,7 +277,11 @@ class PymuDocDataset(Dataset):
         Returns:
             PageableData: the page doc object
         """
-        return self._records[page_id]
+        record = self._records[page_id]
+        if record is None:
+            record = Doc(self._raw_fitz[self._page_ids[page_id]])
+            self._records[page_id] = record
+        return record
 
     def dump_to_file(self, file_path: str):
         """Dump the file.
@@ -197,7 +293,11 @@ class PymuDocDataset(Dataset):
         dir_name = os.path.dirname(file_path)
         if dir_name not in ('', '.', '..'):
             os.makedirs(dir_name, exist_ok=True)
-        self._raw_fitz.save(file_path)
+        if self._page_ids == range(len(self._raw_fitz)):
+            self._raw_fitz.save(file_path)
+        else:
+            with open(file_path, 'wb') as f:
+                f.write(self.data_bits())
 
     def apply(self, proc: Callable, *args, **kwargs):
         """Apply callable method which.
@@ -220,41 +320,71 @@ class PymuDocDataset(Dataset):
             SupportedPdfParseMethod: _description_
         """
         if self._classify_result is None:
-            self._classify_result = classify(self._data_bits)
+            self._classify_result = classify(self._raw_fitz, self._page_ids)
         return self._classify_result
 
     def clone(self):
         """clone this dataset."""
-        return PymuDocDataset(self._raw_data)
+        return PymuDocDataset(self._source, start_page_id=self._page_ids.start, end_page_id=self._page_ids.stop - 1)
 
     def set_images(self, images):
-        for i in range(len(self._records)):
-            self._records[i].set_image(images[i])
+        for i in range(len(self)):
+            self.get_page(i).set_image(images[i])
+
+def _decode_frame(bits: bytes, frame: int) -> np.ndarray:
+    from PIL import Image
+
+    with Image.open(io.BytesIO(bits)) as image:
+        image.seek(frame)
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        return np.asarray(Image.alpha_composite(background, image).convert('RGB'))
+
 
 class ImageDataset(Dataset):
-    def __init__(self, bits: bytes, lang=None):
-        """Initialize the dataset, which wraps the pymudoc documents.
+    def __init__(self, bits: bytes, lang=None, dpi=200):
+        """Initialize the dataset, which wraps the decoded images.
+
+        the image is decoded once and resampled to the size a pdf page of the same geometry would be rendered at,
+        the page geometry is taken from the image resolution as converting the image to pdf does, the pdf is only
+        generated when it is needed, e.g. data_bits or drawing on the pages.
 
         Args:
-            bits (bytes): the bytes of the photo which will be converted to pdf first. then converted to pymudoc.
+            bits (bytes): the bytes of the image, multi-frame images such as tiff become multiple pages
+            lang (str, optional): the language of the image. Defaults to None.
+            dpi (int, optional): the dpi of the images for inference. Defaults to 200.
         """
-        pdf_bytes = fitz.open(stream=bits).convert_to_pdf()
-        self._raw_fitz = fitz.open('pdf', pdf_bytes)
-        self._records = [Doc(v) for v in self._raw_fitz]
         self._raw_data = bits
-        self._data_bits = pdf_bytes
+        self._dpi = dpi
+        self._pdf_bits = None
+        self._pdf_doc = None
+        image_doc = fitz.open(stream=bits)
+        if image_doc.page_count == 1:
+            decoders = [lambda: pixmap_to_rgb_array(fitz.Pixmap(bits))]
+        else:
+            # 多帧图片(如tiff)由PIL逐帧解码
+            decoders = [lambda frame=frame: _decode_frame(bits, frame) for frame in range(image_doc.page_count)]
+        self._records = [
+            ImagePage(decoder, page.rect, dpi, lambda page_id=page_id: self._pdf()[page_id])
+            for page_id, (page, decoder) in enumerate(zip(image_doc, decoders))
+        ]
 
         if lang == '':
             self._lang = None
         elif lang == 'auto':
             from magic_pdf.model.sub_modules.language_detection.utils import \
                 auto_detect_lang
-            self._lang = auto_detect_lang(self._data_bits)
+            self._lang = auto_detect_lang(self.data_bits())
             logger.info(f'lang: {lang}, detect_lang: {self._lang}')
         else:
             self._lang = lang
             logger.info(f'lang: {lang}')
 
+    def _pdf(self) -> fitz.Document:
+        if self._pdf_doc is None:
+            self._pdf_doc = fitz.open('pdf', self.data_bits())
+        return self._pdf_doc
+
     def __len__(self) -> int:
         """The length of the dataset."""
         return len(self._records)
@@ -272,8 +402,14 @@ class ImageDataset(Dataset):
         return [SupportedPdfParseMethod.OCR]
 
     def data_bits(self) -> bytes:
-        """The pdf bits used to create this dataset."""
-        return self._data_bits
+        """The pdf bits converted from the image, generated on the first call."""
+        if self._pdf_bits is None:
+            self._pdf_bits = fitz.open(stream=self._raw_data).convert_to_pdf()
+        return self._pdf_bits
+
+    def data_md5(self) -> str:
+        """The md5 of the image bits, the pdf is not needed."""
+        return compute_md5(self._raw_data)
 
     def get_page(self, page_id: int) -> PageableData:
         """The page doc object.
@@ -295,7 +431,7 @@ class ImageDataset(Dataset):
         dir_name = os.path.dirname(file_path)
         if dir_name not in ('', '.', '..'):
             os.makedirs(dir_name, exist_ok=True)
-        self._raw_fitz.save(file_path)
+        self._pdf().save(file_path)
 
     def apply(self, proc: Callable, *args, **kwargs):
         """Apply callable method which.
@@ -319,7 +455,7 @@ class ImageDataset(Dataset):
 
     def clone(self):
         """clone this dataset."""
-        return ImageDataset(self._raw_data)
+        return ImageDataset(self._raw_data, dpi=self._dpi)
 
     def set_images(self, images):
         for i in range(len(self._records)):
@@ -405,4 +541,129 @@ class Doc(PageableData):
             fontsize (int): font size of the text
             color (list[float] | None):  three element tuple which describe the RGB of the board line, None will use the default font color!
         """
-        self._doc.insert_text(coord, content, fontsize=fontsize, color=color)
\ No newline at end of file
+        self._doc.insert_text(coord, content, fontsize=fontsize, color=color)
+
+
+class ImagePage(PageableData):
+    """Initialized with a image decoder, the page geometry is synthesized from the image resolution.
+
+    get_pixmap crops the decoded image like fitz.Page.get_pixmap, so the images and tables of the page can be cut
+    without a pdf. the other fitz.Page methods are served by the page of the pdf converted from the image.
+    """
+
+    def __init__(self, decoder: Callable, rect: fitz.Rect, dpi: int, pdf_page: Callable):
+        self._decoder = decoder
+        self._src = None
+        self._rect = rect
+        self._dpi = dpi
+        self._pdf_page = pdf_page
+        self._img = None
+
+    def _source(self) -> np.ndarray:
+        if self._src is None:
+            self._src = self._decoder()
+        return self._src
+
+    def get_image(self):
+        """Return the image info.
+
+        Returns:
+            dict: {
+                img: np.ndarray,
+                width: int,
+                height: int
+            }
+        """
+        if self._img is None:
+            self._img = image_to_dpi(self._source(), self._rect, self._dpi)
+        return self._img
+
+    def set_image(self, img):
+        """
+        Args:
+            img (np.ndarray): the image
+        """
+        if self._img is None:
+            self._img = img
+
+    def get_doc(self) -> fitz.Page:
+        """Get the pymudoc object of the pdf converted from the image.
+
+        Returns:
+            fitz.Page: the pymudoc object
+        """
+        return self._pdf_page()
+
+    def get_page_info(self) -> PageInfo:
+        """Get the page info of the page.
+
+        Returns:
+            PageInfo: the page info of this page
+        """
+        return PageInfo(w=self._rect.width, h=self._rect.height)
+
+    def get_pixmap(self, matrix=None, clip=None, alpha=False, **kwargs) -> fitz.Pixmap:
+        """Crop and resample the decoded image, the same as fitz.Page.get_pixmap.
+
+        Args:
+            matrix (fitz.Matrix, optional): the scale of the output. Defaults to None.
+            clip (fitz.Rect, optional): the area of the page in points. Defaults to None.
+            alpha (bool, optional): not supported, the output has no alpha channel. Defaults to False.
+
+        Returns:
+            fitz.Pixmap: the RGB pixmap
+        """
+        matrix = matrix if matrix is not None else fitz.Identity
+        clip = fitz.Rect(clip) & self._rect if clip is not None else fitz.Rect(self._rect)
+        src = self._source()
+        scale_x = src.shape[1] / self._rect.width
+        scale_y = src.shape[0] / self._rect.height
+        x0, x1 = int(clip.x0 * scale_x), max(int(clip.x0 * scale_x) + 1, round(clip.x1 * scale_x))
+        y0, y1 = int(clip.y0 * scale_y), max(int(clip.y0 * scale_y) + 1, round(clip.y1 * scale_y))
+        irect = (clip * matrix).irect
+        img = resize_image(src[y0:y1, x0:x1], max(irect.width, 1), max(irect.height, 1))
+        img = np.ascontiguousarray(img)
+        return fitz.Pixmap(fitz.csRGB, img.shape[1], img.shape[0], img.tobytes(), False)
+
+    # 只有这些fitz.Page的属性由转换后的pdf页面提供，其余属性不存在，避免拼写错误被静默地当作None
+    _PDF_PAGE_ATTRS = frozenset([
+        'rect', 'bound', 'number', 'parent', 'rotation', 'mediabox', 'cropbox',
+        'get_text', 'get_textpage', 'get_images', 'get_image_info', 'get_drawings', 'get_cdrawings',
+        'get_fonts', 'search_for', 'insert_textbox', 'new_shape',
+    ])
+
+    def __getattr__(self, name):
+        if name not in ImagePage._PDF_PAGE_ATTRS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        return getattr(self._pdf_page(), name)
+
+    def draw_rect(self, rect_coords, color, fill, fill_opacity, width, overlay):
+        """draw rectangle on the page of the pdf converted from the image.
+
+        Args:
+            rect_coords (list[float]): four elements array contain the top-left and bottom-right coordinates, [x0, y0, x1, y1]
+            color (list[float] | None): three element tuple which describe the RGB of the board line, None means no board line
+            fill (list[float] | None): fill the board with RGB, None means will not fill with color
+            fill_opacity (float): opacity of the fill, range from [0, 1]
+            width (float): the width of board
+            overlay (bool): fill the color in foreground or background. True means fill in background.
+        """
+        self._pdf_page().draw_rect(
+            rect_coords,
+            color=color,
+            fill=fill,
+            fill_opacity=fill_opacity,
+            width=width,
+            overlay=overlay,
+        )
+
+    def insert_text(self, coord, content, fontsize, color):
+        """insert text on the page of the pdf converted from the image.
+
+        Args:
+            coord (list[float]): four elements array contain the top-left and bottom-right coordinates, [x0, y0, x1, y1]
+            content (str): the text content
+            fontsize (int): font size of the text
+            color (list[float] | None):  three element tuple which describe the RGB of the board line, None will use the default font color!
+        """
+        self._pdf_page().insert_text(coord, content, fontsize=fontsize, color=color)
@@ -8,7 +8,7 @@ from magic_pdf.config.exceptions import EmptyData, InvalidParams
 from magic_pdf.data.data_reader_writer import (FileBasedDataReader,
                                                MultiBucketS3DataReader)
 from magic_pdf.data.dataset import ImageDataset, PymuDocDataset
-from magic_pdf.utils.office_to_pdf import convert_file_to_pdf, ConvertToPdfError
+from magic_pdf.utils.office_to_pdf import convert_files_to_pdf
 
 def read_jsonl(
     s3_path_or_local: str, s3_client: MultiBucketS3DataReader | None = None
@@ -101,17 +101,8 @@ def read_local_office(path: str) -> list[PymuDocDataset]:
         
     reader = FileBasedDataReader()
     temp_dir = tempfile.mkdtemp()
-    for fn in fns:
-        try:
-            convert_file_to_pdf(fn, temp_dir)
-        except ConvertToPdfError as e:
-            raise e
-        except FileNotFoundError as e:
-            raise e
-        except Exception as e:
-            raise e
-        fn_path = Path(fn)
-        pdf_fn = f"{temp_dir}/{fn_path.stem}.pdf"
+    # 由转换进程池并发转换
+    for pdf_fn in convert_files_to_pdf(fns, temp_dir):
         ret.append(PymuDocDataset(reader.read(pdf_fn)))
     shutil.rmtree(temp_dir)
     return ret
@@ -34,6 +34,53 @@ def fitz_doc_to_image(doc, dpi=200) -> dict:
 
     return img_dict
 
+def pixmap_to_rgb_array(pm: fitz.Pixmap) -> np.ndarray:
+    """Convert the pixmap to a RGB numpy array, the transparent pixels are composited over white like
+    rendering with alpha=False.
+
+    Args:
+        pm (fitz.Pixmap): the pixmap
+
+    Returns:
+        np.ndarray: the RGB array, shape (height, width, 3)
+    """
+    if pm.colorspace is None or pm.colorspace.n != 3:
+        pm = fitz.Pixmap(fitz.csRGB, pm)
+    img = np.frombuffer(pm.samples, dtype=np.uint8).reshape(pm.height, pm.width, pm.n)
+    if pm.alpha:
+        alpha = img[:, :, 3:].astype(np.float32) / 255
+        img = (img[:, :, :3] * alpha + 255 * (1 - alpha) + 0.5).astype(np.uint8)
+    return img
+
+
+def resize_image(img: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Resample the image to width x height, INTER_AREA for downscaling and INTER_CUBIC for upscaling."""
+    if img.shape[1] == width and img.shape[0] == height:
+        return img
+    import cv2
+    interpolation = cv2.INTER_AREA if width < img.shape[1] else cv2.INTER_CUBIC
+    return cv2.resize(img, (width, height), interpolation=interpolation)
+
+
+def image_to_dpi(img: np.ndarray, rect: fitz.Rect, dpi=200) -> dict:
+    """Resample the decoded image of a page to the size which fitz_doc_to_image renders the page at.
+
+    Args:
+        img (np.ndarray): the decoded RGB image of the page
+        rect (fitz.Rect): the page rect in points
+        dpi (int, optional): the target dpi. Defaults to 200.
+
+    Returns:
+        dict:  {'img': numpy array, 'width': width, 'height': height }
+    """
+    irect = (rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    # If the width or height exceeds 4500 after scaling, do not scale further.
+    if irect.width > 4500 or irect.height > 4500:
+        irect = rect.irect
+    img = resize_image(img, irect.width, irect.height)
+    return {'img': img, 'width': irect.width, 'height': irect.height}
+
+
 def load_images_from_pdf(pdf_bytes: bytes, dpi=200, start_page_id=0, end_page_id=None) -> list:
     images = []
     with fitz.open('pdf', pdf_bytes) as doc:
@@ -53,18 +53,19 @@ def ocr_mk_mm_markdown_with_para_and_pagination(pdf_info_dict: list,
 def ocr_mk_markdown_with_para_core_v2(paras_of_layout,
                                       mode,
                                       img_buket_path='',
+                                      text_cache=None,
                                       ):
     page_markdown = []
     for para_block in paras_of_layout:
         para_text = ''
         para_type = para_block['type']
         if para_type in [BlockType.Text, BlockType.List, BlockType.Index]:
-            para_text = merge_para_with_text(para_block)
+            para_text = merge_para_with_text(para_block, text_cache)
         elif para_type == BlockType.Title:
             title_level = get_title_level(para_block)
-            para_text = f'{"#" * title_level} {merge_para_with_text(para_block)}'
+            para_text = f'{"#" * title_level} {merge_para_with_text(para_block, text_cache)}'
         elif para_type == BlockType.InterlineEquation:
-            para_text = merge_para_with_text(para_block)
+            para_text = merge_para_with_text(para_block, text_cache)
         elif para_type == BlockType.Image:
             if mode == 'nlp':
                 continue
@@ -78,17 +79,17 @@ def ocr_mk_markdown_with_para_core_v2(paras_of_layout,
                                         para_text += f"\n![]({join_path(img_buket_path, span['image_path'])})  \n"
                 for block in para_block['blocks']:  # 2nd.拼image_caption
                     if block['type'] == BlockType.ImageCaption:
-                        para_text += merge_para_with_text(block) + '  \n'
+                        para_text += merge_para_with_text(block, text_cache) + '  \n'
                 for block in para_block['blocks']:  # 3rd.拼image_footnote
                     if block['type'] == BlockType.ImageFootnote:
-                        para_text += merge_para_with_text(block) + '  \n'
+                        para_text += merge_para_with_text(block, text_cache) + '  \n'
         elif para_type == BlockType.Table:
             if mode == 'nlp':
                 continue
             elif mode == 'mm':
                 for block in para_block['blocks']:  # 1st.拼table_caption
                     if block['type'] == BlockType.TableCaption:
-                        para_text += merge_para_with_text(block) + '  \n'
+                        para_text += merge_para_with_text(block, text_cache) + '  \n'
                 for block in para_block['blocks']:  # 2nd.拼table_body
                     if block['type'] == BlockType.TableBody:
                         for line in block['lines']:
@@ -103,7 +104,7 @@ def ocr_mk_markdown_with_para_core_v2(paras_of_layout,
                                         para_text += f"\n![]({join_path(img_buket_path, span['image_path'])})  \n"
                 for block in para_block['blocks']:  # 3rd.拼table_footnote
                     if block['type'] == BlockType.TableFootnote:
-                        para_text += merge_para_with_text(block) + '  \n'
+                        para_text += merge_para_with_text(block, text_cache) + '  \n'
 
         if para_text.strip() == '':
             continue
@@ -146,7 +147,11 @@ def full_to_half(text: str) -> str:
     return ''.join(result)
 
 
-def merge_para_with_text(para_block):
+def merge_para_with_text(para_block, text_cache=None):
+    # 同一个block在导出多种格式时只拼接一次，text_cache以block的id为key
+    if text_cache is not None and id(para_block) in text_cache:
+        return text_cache[id(para_block)]
+
     block_text = ''
     for line in para_block['lines']:
         for span in line['spans']:
@@ -196,21 +201,23 @@ def merge_para_with_text(para_block):
     # 连写字符拆分
     # para_text = __replace_ligatures(para_text)
 
+    if text_cache is not None:
+        text_cache[id(para_block)] = para_text
     return para_text
 
 
-def para_to_standard_format_v2(para_block, img_buket_path, page_idx, drop_reason=None):
+def para_to_standard_format_v2(para_block, img_buket_path, page_idx, drop_reason=None, text_cache=None):
     para_type = para_block['type']
     para_content = {}
     if para_type in [BlockType.Text, BlockType.List, BlockType.Index]:
         para_content = {
             'type': 'text',
-            'text': merge_para_with_text(para_block),
+            'text': merge_para_with_text(para_block, text_cache),
         }
     elif para_type == BlockType.Title:
         para_content = {
             'type': 'text',
-            'text': merge_para_with_text(para_block),
+            'text': merge_para_with_text(para_block, text_cache),
         }
         title_level = get_title_level(para_block)
         if title_level != 0:
@@ -218,7 +225,7 @@ def para_to_standard_format_v2(para_block, img_buket_path, page_idx, drop_reason
     elif para_type == BlockType.InterlineEquation:
         para_content = {
             'type': 'equation',
-            'text': merge_para_with_text(para_block),
+            'text': merge_para_with_text(para_block, text_cache),
             'text_format': 'latex',
         }
     elif para_type == BlockType.Image:
@@ -231,9 +238,9 @@ def para_to_standard_format_v2(para_block, img_buket_path, page_idx, drop_reason
                             if span.get('image_path', ''):
                                 para_content['img_path'] = join_path(img_buket_path, span['image_path'])
             if block['type'] == BlockType.ImageCaption:
-                para_content['img_caption'].append(merge_para_with_text(block))
+                para_content['img_caption'].append(merge_para_with_text(block, text_cache))
             if block['type'] == BlockType.ImageFootnote:
-                para_content['img_footnote'].append(merge_para_with_text(block))
+                para_content['img_footnote'].append(merge_para_with_text(block, text_cache))
     elif para_type == BlockType.Table:
         para_content = {'type': 'table', 'img_path': '', 'table_caption': [], 'table_footnote': []}
         for block in para_block['blocks']:
@@ -251,9 +258,9 @@ def para_to_standard_format_v2(para_block, img_buket_path, page_idx, drop_reason
                                 para_content['img_path'] = join_path(img_buket_path, span['image_path'])
 
             if block['type'] == BlockType.TableCaption:
-                para_content['table_caption'].append(merge_para_with_text(block))
+                para_content['table_caption'].append(merge_para_with_text(block, text_cache))
             if block['type'] == BlockType.TableFootnote:
-                para_content['table_footnote'].append(merge_para_with_text(block))
+                para_content['table_footnote'].append(merge_para_with_text(block, text_cache))
 
     para_content['page_idx'] = page_idx
 
@@ -268,7 +275,20 @@ def union_make(pdf_info_dict: list,
                drop_mode: str,
                img_buket_path: str = '',
                ):
-    output_content = []
+    return union_make_multi(pdf_info_dict, [make_mode], drop_mode, img_buket_path)[make_mode]
+
+
+def union_make_multi(pdf_info_dict: list,
+                     make_modes: list,
+                     drop_mode: str,
+                     img_buket_path: str = '',
+                     ):
+    """一次遍历pdf_info生成多种格式的内容，同一个block的文本只拼接一次.
+
+    Returns:
+        dict: make_mode -> 与union_make相同的结果
+    """
+    output_content = {make_mode: [] for make_mode in make_modes}
     for page_info in pdf_info_dict:
         drop_reason_flag = False
         drop_reason = None
@@ -292,27 +312,32 @@ def union_make(pdf_info_dict: list,
         page_idx = page_info.get('page_idx')
         if not paras_of_layout:
             continue
-        if make_mode == MakeMode.MM_MD:
-            page_markdown = ocr_mk_markdown_with_para_core_v2(
-                paras_of_layout, 'mm', img_buket_path)
-            output_content.extend(page_markdown)
-        elif make_mode == MakeMode.NLP_MD:
-            page_markdown = ocr_mk_markdown_with_para_core_v2(
-                paras_of_layout, 'nlp')
-            output_content.extend(page_markdown)
-        elif make_mode == MakeMode.STANDARD_FORMAT:
-            for para_block in paras_of_layout:
-                if drop_reason_flag:
-                    para_content = para_to_standard_format_v2(
-                        para_block, img_buket_path, page_idx)
-                else:
-                    para_content = para_to_standard_format_v2(
-                        para_block, img_buket_path, page_idx)
-                output_content.append(para_content)
-    if make_mode in [MakeMode.MM_MD, MakeMode.NLP_MD]:
-        return '\n\n'.join(output_content)
-    elif make_mode == MakeMode.STANDARD_FORMAT:
-        return output_content
+        # 缓存只在页内有效，不让整个文档的文本常驻内存
+        text_cache = {}
+        for make_mode in make_modes:
+            if make_mode == MakeMode.MM_MD:
+                page_markdown = ocr_mk_markdown_with_para_core_v2(
+                    paras_of_layout, 'mm', img_buket_path, text_cache)
+                output_content[make_mode].extend(page_markdown)
+            elif make_mode == MakeMode.NLP_MD:
+                page_markdown = ocr_mk_markdown_with_para_core_v2(
+                    paras_of_layout, 'nlp', text_cache=text_cache)
+                output_content[make_mode].extend(page_markdown)
+            elif make_mode == MakeMode.STANDARD_FORMAT:
+                for para_block in paras_of_layout:
+                    if drop_reason_flag:
+                        para_content = para_to_standard_format_v2(
+                            para_block, img_buket_path, page_idx, text_cache=text_cache)
+                    else:
+                        para_content = para_to_standard_format_v2(
+                            para_block, img_buket_path, page_idx, text_cache=text_cache)
+                    output_content[make_mode].append(para_content)
+    for make_mode in make_modes:
+        if make_mode in [MakeMode.MM_MD, MakeMode.NLP_MD]:
+            output_content[make_mode] = '\n\n'.join(output_content[make_mode])
+        elif make_mode != MakeMode.STANDARD_FORMAT:
+            output_content[make_mode] = None
+    return output_content
 
 
 def get_title_level(block):
@@ -1,13 +1,15 @@
 
+import fitz
+
 from magic_pdf.config.drop_reason import DropReason
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.filter.pdf_classify_by_type import classify as do_classify
 from magic_pdf.filter.pdf_meta_scan import pdf_meta_scan
 
 
-def classify(pdf_bytes: bytes) -> SupportedPdfParseMethod:
-    """根据pdf的元数据，判断是文本pdf，还是ocr pdf."""
-    pdf_meta = pdf_meta_scan(pdf_bytes)
+def classify(pdf_bytes: bytes | fitz.Document, page_ids: range = None) -> SupportedPdfParseMethod:
+    """根据pdf的元数据，判断是文本pdf，还是ocr pdf；可以传入已打开的文档和页码范围."""
+    pdf_meta = pdf_meta_scan(pdf_bytes, page_ids)
     if pdf_meta.get('_need_drop', False):  # 如果返回了需要丢弃的标志，则抛出异常
         raise Exception(f"pdf meta_scan need_drop,reason is {pdf_meta['_drop_reason']}")
     else:
@@ -321,21 +321,46 @@ def get_language(doc: fitz.Document):
     return language
 
 
-def check_invalid_chars(pdf_bytes):
+class DocPages:
+    """已打开文档中一段页码的视图，支持len、下标和迭代，按页扫描的函数可以直接使用，不复制文档."""
+
+    def __init__(self, doc: fitz.Document, page_ids: range):
+        self._doc = doc
+        self._page_ids = page_ids
+
+    def __len__(self):
+        return len(self._page_ids)
+
+    def __getitem__(self, index):
+        return self._doc[self._page_ids[index]]
+
+    def __iter__(self):
+        for page_id in self._page_ids:
+            yield self._doc[page_id]
+
+
+def check_invalid_chars(pdf_bytes, page_ids=None):
     """乱码检测."""
     # return detect_invalid_chars_by_pymupdf(pdf_bytes)
-    return detect_invalid_chars(pdf_bytes)
+    return detect_invalid_chars(pdf_bytes, page_ids)
 
 
-def pdf_meta_scan(pdf_bytes: bytes):
+def pdf_meta_scan(pdf_bytes: bytes | fitz.Document, page_ids: range = None):
     """
     :param s3_pdf_path:
-    :param pdf_bytes: pdf文件的二进制数据
+    :param pdf_bytes: pdf文件的二进制数据，或已打开的文档
+    :param page_ids: 只扫描文档中的这段页码，None表示整个文档
     几个维度来评价：是否加密，是否需要密码，纸张大小，总页数，是否文字可提取
     """
-    doc = fitz.open('pdf', pdf_bytes)
+    if isinstance(pdf_bytes, fitz.Document):
+        doc = pdf_bytes
+    else:
+        doc = fitz.open('pdf', pdf_bytes)
     is_needs_password = doc.needs_pass
     is_encrypted = doc.is_encrypted
+    metadata = doc.metadata
+    if page_ids is not None:
+        doc = DocPages(doc, page_ids)
     total_page = len(doc)
     if total_page == 0:
         logger.warning(f'drop this pdf, drop_reason: {DropReason.EMPTY_PDF}')
@@ -360,7 +385,7 @@ def pdf_meta_scan(pdf_bytes: bytes):
         # logger.info(f"text_layout_per_page: {text_layout_per_page}")
         # text_language = get_language(doc)
         # logger.info(f"text_language: {text_language}")
-        invalid_chars = check_invalid_chars(pdf_bytes)
+        invalid_chars = check_invalid_chars(pdf_bytes, page_ids)
         # logger.info(f"invalid_chars: {invalid_chars}")
 
         # 最后输出一条json
@@ -378,7 +403,7 @@ def pdf_meta_scan(pdf_bytes: bytes):
             'imgs_per_page': imgs_per_page,  # 增加每页img数量list
             'junk_img_bojids': junk_img_bojids,  # 增加垃圾图片的bojid list
             'invalid_chars': invalid_chars,
-            'metadata': doc.metadata,
+            'metadata': metadata,
         }
         # logger.info(json.dumps(res, ensure_ascii=False))
         return res
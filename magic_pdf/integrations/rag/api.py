@@ -1,11 +1,18 @@
 import os
+import threading
 from pathlib import Path
+from typing import Iterator
 
 from loguru import logger
+from pydantic import TypeAdapter
 
 from magic_pdf.integrations.rag.type import (ElementRelation, LayoutElements,
                                              Node)
-from magic_pdf.integrations.rag.utils import inference
+from magic_pdf.integrations.rag.utils import (_default_output_dir,
+                                              batch_inference)
+from magic_pdf.libs.hash_utils import compute_file_md5
+
+_layout_elements_adapter = TypeAdapter(list[LayoutElements])
 
 
 class RagPageReader:
@@ -42,10 +49,24 @@ class RagDocumentReader:
 
 class DataReader:
 
-    def __init__(self, path_or_directory: str, method: str, output_dir: str):
+    def __init__(self, path_or_directory: str, method: str, output_dir: str,
+                 cache_dir: str | None = None, batch_size: int | None = None):
+        """Initialized method.
+
+        Args:
+            path_or_directory (str): a pdf file or a directory that contains pdf files
+            method (str): auto, txt or ocr
+            output_dir (str): the directory to save the images, {path_or_directory}/output is used if empty
+            cache_dir (str, optional): the directory to cache the layout elements of each document,
+                keyed by the md5 of the file and the method. Defaults to {output_dir}/rag_cache.
+            batch_size (int, optional): the number of documents parsed together in one background batch,
+                read from MINERU_RAG_BATCH_SIZE if None, which defaults to 8. Defaults to None.
+        """
         self.path_or_directory = path_or_directory
         self.method = method
-        self.output_dir = output_dir
+        self.output_dir = output_dir or _default_output_dir(path_or_directory)
+        self.cache_dir = cache_dir or os.path.join(self.output_dir, 'rag_cache')
+        self.batch_size = batch_size or int(os.getenv('MINERU_RAG_BATCH_SIZE', 8))
         self.pdfs = []
         if os.path.isdir(path_or_directory):
             for doc_path in Path(path_or_directory).glob('*.pdf'):
@@ -54,10 +75,129 @@ class DataReader:
             assert path_or_directory.endswith('.pdf')
             self.pdfs.append(Path(path_or_directory))
 
+        # 后台线程从_pending头部取文档按批处理，_running是正在处理的一批，完成的文档按完成顺序记录在_completed中。
+        # 结果只保存在缓存文件中，每次取用时再加载；_succeeded记录每个文档是否成功，
+        # _uncached只保存写缓存失败的文档的结果
+        self._pending: list[int] = list(range(len(self.pdfs)))
+        self._running: set[int] = set()
+        self._succeeded: dict[int, bool] = {}
+        self._uncached: dict[int, list[LayoutElements]] = {}
+        self._completed: list[int] = []
+        self._cache_keys: dict[int, str] = {}
+        self._cond = threading.Condition()
+        self._worker = None
+
     def get_documents_count(self) -> int:
         """Returns the number of documents in the directory."""
         return len(self.pdfs)
 
+    def _cache_path(self, idx: int) -> str:
+        if idx not in self._cache_keys:
+            self._cache_keys[idx] = compute_file_md5(self.pdfs[idx])
+        return os.path.join(self.cache_dir, f'{self._cache_keys[idx]}_{self.method}.json')
+
+    def _load_cache(self, idx: int) -> list[LayoutElements] | None:
+        try:
+            with open(self._cache_path(idx), 'rb') as f:
+                return _layout_elements_adapter.validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f'ignore the invalid cache of {self.pdfs[idx]}: {e}')
+            return None
+
+    def _save_cache(self, idx: int, res: list[LayoutElements]):
+        cache_path = self._cache_path(idx)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 先写临时文件再改名，中断时不会留下不完整的缓存
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_layout_elements_adapter.dump_json(res))
+        os.replace(tmp_path, cache_path)
+
+    def _finish(self, idx: int, succeeded: bool, uncached: list[LayoutElements] | None = None):
+        if not succeeded:
+            logger.warning(f'failed to inference pdf {self.pdfs[idx]}')
+        with self._cond:
+            self._succeeded[idx] = succeeded
+            self._running.discard(idx)
+            if uncached is not None:
+                self._uncached[idx] = uncached
+            # 重新处理的文档不重复记录
+            if idx not in self._completed:
+                self._completed.append(idx)
+            self._cond.notify_all()
+
+    def _run(self):
+        try:
+            # 已缓存的文档先完成
+            with self._cond:
+                candidates = list(self._pending)
+            for idx in candidates:
+                if os.path.exists(self._cache_path(idx)):
+                    with self._cond:
+                        if idx not in self._pending:
+                            continue
+                        self._pending.remove(idx)
+                    self._finish(idx, True)
+
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:self.batch_size]
+                    self._running = set(batch)
+                    if not batch:
+                        # 没有待处理的文档时退出，之后重新处理失败的文档会启动新的线程
+                        self._worker = None
+                        return
+                try:
+                    results = batch_inference([str(self.pdfs[idx]) for idx in batch], self.output_dir, self.method)
+                except Exception as e:
+                    logger.exception(e)
+                    results = []
+                if len(results) != len(batch):
+                    logger.warning(f'expect {len(batch)} results, got {len(results)}')
+                for j, idx in enumerate(batch):
+                    res = results[j] if j < len(results) else None
+                    # 失败的文档不缓存，下次调用时重新处理
+                    if res is None:
+                        self._finish(idx, False)
+                        continue
+                    try:
+                        self._save_cache(idx, res)
+                    except Exception as e:
+                        logger.warning(f'failed to cache {self.pdfs[idx]}: {e}')
+                        self._finish(idx, True, res)
+                    else:
+                        self._finish(idx, True)
+        except BaseException:
+            # 线程异常退出时，未完成的文档都按失败处理，等待的调用方不会一直阻塞
+            with self._cond:
+                unfinished = [idx for idx in [*self._running, *self._pending] if idx not in self._succeeded]
+                self._pending = []
+                self._worker = None
+            for idx in unfinished:
+                self._finish(idx, False)
+            raise
+
+    def _load(self, idx: int) -> RagDocumentReader | None:
+        """Load the result of a finished document from the cache."""
+        if not self._succeeded[idx]:
+            return None
+        res = self._uncached.get(idx)
+        if res is None:
+            res = self._load_cache(idx)
+        if res is None:
+            logger.warning(f'the cache of {self.pdfs[idx]} is missing')
+            return None
+        return RagDocumentReader(res)
+
+    def _start(self):
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='mineru-rag-reader', daemon=True)
+                self._worker.start()
+
     def get_document_result(self, idx: int) -> RagDocumentReader | None:
         """
         Args:
@@ -71,11 +211,33 @@ class DataReader:
         if idx >= self.get_documents_count() or idx < 0:
             logger.error(f'invalid idx: {idx}')
             return None
-        res = inference(str(self.pdfs[idx]), self.output_dir, self.method)
-        if res is None:
-            logger.warning(f'failed to inference pdf {self.pdfs[idx]}')
-            return None
-        return RagDocumentReader(res)
+        with self._cond:
+            # 失败的文档不缓存，这次调用时重新处理
+            if self._succeeded.get(idx) is False:
+                del self._succeeded[idx]
+            # 请求的文档移到待处理列表头部，不用等前面的批次
+            if idx not in self._succeeded and idx not in self._running:
+                if idx in self._pending:
+                    self._pending.remove(idx)
+                self._pending.insert(0, idx)
+        self._start()
+        with self._cond:
+            self._cond.wait_for(lambda: idx in self._succeeded)
+        return self._load(idx)
+
+    def iter_document_results(self) -> Iterator[tuple[int, RagDocumentReader | None]]:
+        """Yield the documents as they complete, the cached documents first.
+
+        Returns:
+            Iterator[tuple[int, RagDocumentReader | None]]: the index and the result of each document,
+            the result is None if the document failed
+        """
+        self._start()
+        for i in range(self.get_documents_count()):
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._completed) > i)
+                idx = self._completed[i]
+            yield idx, self._load(idx)
 
     def get_document_filename(self, idx: int) -> Path:
         """get the filename of the document."""
@@ -5,14 +5,16 @@ from pathlib import Path
 from loguru import logger
 
 import magic_pdf.model as model_config
+from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.config.ocr_content_type import BlockType, ContentType
-from magic_pdf.data.data_reader_writer import FileBasedDataReader
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+from magic_pdf.data.dataset import PymuDocDataset
 from magic_pdf.dict2md.ocr_mkcontent import merge_para_with_text
 from magic_pdf.integrations.rag.type import (CategoryType, ContentObject,
                                              ElementRelation, ElementRelType,
                                              LayoutElements,
                                              LayoutElementsExtra, PageInfo)
-from magic_pdf.tools.common import do_parse, prepare_env
+from magic_pdf.tools.common import prepare_env
 
 
 def convert_middle_json_to_layout_elements(
@@ -210,54 +212,68 @@ def convert_middle_json_to_layout_elements(
     return res
 
 
-def inference(path, output_dir, method):
-    model_config.__use_inside_model__ = True
-    model_config.__model_mode__ = 'full'
-    if output_dir == '':
-        if os.path.isdir(path):
-            output_dir = os.path.join(path, 'output')
-        else:
-            output_dir = os.path.join(os.path.dirname(path), 'output')
+def _default_output_dir(path):
+    if os.path.isdir(path):
+        return os.path.join(path, 'output')
+    return os.path.join(os.path.dirname(path), 'output')
 
-    local_image_dir, local_md_dir = prepare_env(output_dir,
-                                                str(Path(path).stem), method)
 
-    def read_fn(path):
-        disk_rw = FileBasedDataReader(os.path.dirname(path))
-        return disk_rw.read(os.path.basename(path))
+def batch_inference(paths: list[str], output_dir, method) -> list[list[LayoutElements] | None]:
+    """Parse the pdf files together, the pages of all files are inferred in
+    the same batches.
 
-    def parse_doc(doc_path: str):
+    Args:
+        paths (list[str]): the pdf files
+        output_dir (str): the images of each file are saved in {output_dir}/{file name}/{method}/images
+        method (str): auto, txt or ocr
+
+    Returns:
+        list[list[LayoutElements] | None]: the layout elements of each file, None if the file failed
+    """
+    from magic_pdf.model.doc_analyze_by_custom_model import batch_doc_analyze
+
+    model_config.__use_inside_model__ = True
+    model_config.__model_mode__ = 'full'
+
+    results = [None] * len(paths)
+    datasets = {}
+    for i, path in enumerate(paths):
         try:
-            file_name = str(Path(doc_path).stem)
-            pdf_data = read_fn(doc_path)
-            do_parse(
-                output_dir,
-                file_name,
-                pdf_data,
-                [],
-                method,
-                False,
-                f_draw_span_bbox=False,
-                f_draw_layout_bbox=False,
-                f_dump_md=False,
-                f_dump_middle_json=True,
-                f_dump_model_json=False,
-                f_dump_orig_pdf=False,
-                f_dump_content_list=False,
-                f_draw_model_bbox=False,
-            )
-
-            middle_json_fn = os.path.join(local_md_dir,
-                                          f'{file_name}_middle.json')
-            with open(middle_json_fn) as fd:
-                jso = json.load(fd)
-            os.remove(middle_json_fn)
-            return convert_middle_json_to_layout_elements(jso, local_image_dir)
+            datasets[i] = PymuDocDataset(str(path))
+        except Exception as e:
+            logger.exception(e)
 
+    try:
+        infer_results = dict(zip(datasets, batch_doc_analyze(list(datasets.values()), method)))
+    except Exception as e:
+        # 整批失败时逐个文件重试，只丢弃出错的文件
+        logger.exception(e)
+        infer_results = {}
+        for i, ds in datasets.items():
+            try:
+                infer_results[i] = batch_doc_analyze([ds], method)[0]
+            except Exception as e:
+                logger.exception(e)
+
+    for i, infer_result in infer_results.items():
+        try:
+            ds = datasets[i]
+            local_image_dir, _ = prepare_env(output_dir, str(Path(paths[i]).stem), method)
+            image_writer = FileBasedDataWriter(local_image_dir)
+            if method == 'ocr' or (method == 'auto' and ds.classify() == SupportedPdfParseMethod.OCR):
+                pipe_result = infer_result.pipe_ocr_mode(image_writer, lang=ds._lang)
+            else:
+                pipe_result = infer_result.pipe_txt_mode(image_writer, lang=ds._lang)
+            results[i] = pipe_result.apply(convert_middle_json_to_layout_elements, local_image_dir)
         except Exception as e:
             logger.exception(e)
+    return results
 
-    return parse_doc(path)
+
+def inference(path, output_dir, method):
+    if output_dir == '':
+        output_dir = _default_output_dir(path)
+    return batch_inference([path], output_dir, method)[0]
 
 
 if __name__ == '__main__':
@@ -78,6 +78,10 @@ def get_local_layoutreader_model_dir():
 
 
 def get_device():
+    # 多设备推理的worker进程通过环境变量绑定各自的设备
+    device = os.getenv('MINERU_DEVICE_MODE')
+    if device:
+        return device
     config = read_config()
     device = config.get('device-mode')
     if device is None:
@@ -87,6 +91,20 @@ def get_device():
         return device
 
 
+def get_reading_order_model():
+    """阅读顺序排序使用的方法: layoutreader或xycut.
+
+    依次读取环境变量MINERU_READING_ORDER_MODEL和配置文件中的reading-order-model，
+    都未设置时在cpu上使用xycut(不需要加载layoutreader模型)，其它设备上使用layoutreader。
+    """
+    reading_order_model = os.getenv('MINERU_READING_ORDER_MODEL')
+    if not reading_order_model:
+        reading_order_model = read_config().get('reading-order-model')
+    if not reading_order_model:
+        reading_order_model = 'xycut' if get_device() == 'cpu' else 'layoutreader'
+    return reading_order_model
+
+
 def get_table_recog_config():
     config = read_config()
     table_config = config.get('table-config')
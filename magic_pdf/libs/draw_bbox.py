@@ -1,4 +1,12 @@
+import multiprocessing as mp
+import os
+import pickle
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
 import fitz
+from loguru import logger
+
 from magic_pdf.config.constants import CROSS_PAGE
 from magic_pdf.config.ocr_content_type import (BlockType, CategoryId,
                                                ContentType)
@@ -12,27 +20,27 @@ def draw_bbox_without_number(i, bbox_list, page, rgb_config, fill_config):
         item = float(item) / 255
         new_rgb.append(item)
     page_data = bbox_list[i]
+    # 同一页同一种颜色的框画在一个shape里，只提交一次页面内容
+    shape = page.new_shape()
     for bbox in page_data:
         x0, y0, x1, y1 = bbox
         rect_coords = fitz.Rect(x0, y0, x1, y1)  # Define the rectangle
+        shape.draw_rect(rect_coords)
         if fill_config:
-            page.draw_rect(
-                rect_coords,
+            shape.finish(
                 color=None,
                 fill=new_rgb,
                 fill_opacity=0.3,
                 width=0.5,
-                overlay=True,
             )  # Draw the rectangle
         else:
-            page.draw_rect(
-                rect_coords,
+            shape.finish(
                 color=new_rgb,
                 fill=None,
                 fill_opacity=1,
                 width=0.5,
-                overlay=True,
             )  # Draw the rectangle
+    shape.commit(overlay=True)
 
 
 def draw_bbox_with_number(i, bbox_list, page, rgb_config, fill_config, draw_bbox=True):
@@ -41,34 +49,40 @@ def draw_bbox_with_number(i, bbox_list, page, rgb_config, fill_config, draw_bbox
         item = float(item) / 255
         new_rgb.append(item)
     page_data = bbox_list[i]
+    shape = page.new_shape()
     for j, bbox in enumerate(page_data):
         x0, y0, x1, y1 = bbox
         rect_coords = fitz.Rect(x0, y0, x1, y1)  # Define the rectangle
         if draw_bbox:
+            shape.draw_rect(rect_coords)
             if fill_config:
-                page.draw_rect(
-                    rect_coords,
+                shape.finish(
                     color=None,
                     fill=new_rgb,
                     fill_opacity=0.3,
                     width=0.5,
-                    overlay=True,
                 )  # Draw the rectangle
             else:
-                page.draw_rect(
-                    rect_coords,
+                shape.finish(
                     color=new_rgb,
                     fill=None,
                     fill_opacity=1,
                     width=0.5,
-                    overlay=True,
                 )  # Draw the rectangle
-        page.insert_text(
+        shape.insert_text(
             (x1 + 2, y0 + 10), str(j + 1), fontsize=10, color=new_rgb
         )  # Insert the index in the top left corner of the rectangle
+    shape.commit(overlay=True)
 
 
 def draw_layout_bbox(pdf_info, pdf_bytes, out_path, filename):
+    pdf_docs = fitz.open('pdf', pdf_bytes)
+    _draw_layout_bbox(pdf_info, pdf_docs)
+    # Save the PDF
+    pdf_docs.save(f'{out_path}/{filename}')
+
+
+def _draw_layout_bbox(pdf_info, pdf_docs):
     dropped_bbox_list = []
     tables_list, tables_body_list = [], []
     tables_caption_list, tables_footnote_list = [], []
@@ -171,8 +185,6 @@ def draw_layout_bbox(pdf_info, pdf_bytes, out_path, filename):
 
         layout_bbox_list.append(page_block_list)
 
-    pdf_docs = fitz.open('pdf', pdf_bytes)
-
     for i, page in enumerate(pdf_docs):
 
         draw_bbox_without_number(i, dropped_bbox_list, page, [158, 158, 158], True)
@@ -194,11 +206,15 @@ def draw_layout_bbox(pdf_info, pdf_bytes, out_path, filename):
             i, layout_bbox_list, page, [255, 0, 0], False, draw_bbox=False
         )
 
+
+def draw_span_bbox(pdf_info, pdf_bytes, out_path, filename):
+    pdf_docs = fitz.open('pdf', pdf_bytes)
+    _draw_span_bbox(pdf_info, pdf_docs)
     # Save the PDF
     pdf_docs.save(f'{out_path}/{filename}')
 
 
-def draw_span_bbox(pdf_info, pdf_bytes, out_path, filename):
+def _draw_span_bbox(pdf_info, pdf_docs):
     text_list = []
     inline_equation_list = []
     interline_equation_list = []
@@ -272,7 +288,6 @@ def draw_span_bbox(pdf_info, pdf_bytes, out_path, filename):
         interline_equation_list.append(page_interline_equation_list)
         image_list.append(page_image_list)
         table_list.append(page_table_list)
-    pdf_docs = fitz.open('pdf', pdf_bytes)
     for i, page in enumerate(pdf_docs):
         # 获取当前页面的数据
         draw_bbox_without_number(i, text_list, page, [255, 0, 0], False)
@@ -282,9 +297,6 @@ def draw_span_bbox(pdf_info, pdf_bytes, out_path, filename):
         draw_bbox_without_number(i, table_list, page, [204, 0, 255], False)
         draw_bbox_without_number(i, dropped_list, page, [158, 158, 158], False)
 
-    # Save the PDF
-    pdf_docs.save(f'{out_path}/{filename}')
-
 
 def draw_model_bbox(model_list, dataset: Dataset, out_path, filename):
     dropped_bbox_list = []
@@ -357,6 +369,12 @@ def draw_model_bbox(model_list, dataset: Dataset, out_path, filename):
 
 
 def draw_line_sort_bbox(pdf_info, pdf_bytes, out_path, filename):
+    pdf_docs = fitz.open('pdf', pdf_bytes)
+    _draw_line_sort_bbox(pdf_info, pdf_docs)
+    pdf_docs.save(f'{out_path}/{filename}')
+
+
+def _draw_line_sort_bbox(pdf_info, pdf_docs):
     layout_bbox_list = []
 
     for page in pdf_info:
@@ -399,11 +417,75 @@ def draw_line_sort_bbox(pdf_info, pdf_bytes, out_path, filename):
                             page_line_list.append({'index': index, 'bbox': bbox})
         sorted_bboxes = sorted(page_line_list, key=lambda x: x['index'])
         layout_bbox_list.append(sorted_bbox['bbox'] for sorted_bbox in sorted_bboxes)
-    pdf_docs = fitz.open('pdf', pdf_bytes)
     for i, page in enumerate(pdf_docs):
         draw_bbox_with_number(i, layout_bbox_list, page, [255, 0, 0], False)
 
-    pdf_docs.save(f'{out_path}/{filename}')
+
+OVERLAY_DRAWERS = {
+    'layout': _draw_layout_bbox,
+    'span': _draw_span_bbox,
+    'line_sort': _draw_line_sort_bbox,
+}
+
+
+def draw_overlays(pdf_info, pdf_bytes, overlays: dict):
+    """依次绘制多种bbox并分别保存.
+
+    Args:
+        pdf_info (list): the pdf_info of middle json
+        pdf_bytes (bytes): the pdf bytes
+        overlays (dict): overlay type -> output file path, the types are the keys of OVERLAY_DRAWERS
+    """
+    for overlay_type, file_path in overlays.items():
+        # 从bytes重新打开pdf的开销很小，每种bbox画在独立的副本上
+        pdf_docs = fitz.open('pdf', pdf_bytes)
+        OVERLAY_DRAWERS[overlay_type](pdf_info, pdf_docs)
+        pdf_docs.save(file_path)
+        pdf_docs.close()
+
+
+_overlay_executor = None
+_overlay_executor_lock = threading.Lock()
+
+
+def _draw_overlays_from_pickle(pdf_info_bytes, pdf_bytes, overlays):
+    draw_overlays(pickle.loads(pdf_info_bytes), pdf_bytes, overlays)
+
+
+def _log_overlay_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.opt(exception=future.exception()).error('draw overlays failed')
+
+
+def submit_draw_overlays(pdf_info, pdf_bytes, overlays: dict) -> Future:
+    """在后台进程中绘制bbox，不阻塞解析流程.
+
+    pdf_info在提交时序列化，之后调用方可以继续修改它；后台进程数由环境变量MINERU_DRAW_WORKERS指定，默认为1。
+    进程退出前会等待已提交的绘制完成，也可以调用wait_draw_overlays主动等待。
+
+    Returns:
+        Future: the future of draw_overlays
+    """
+    global _overlay_executor
+    pdf_info_bytes = pickle.dumps(pdf_info, protocol=pickle.HIGHEST_PROTOCOL)
+    with _overlay_executor_lock:
+        if _overlay_executor is None:
+            _overlay_executor = ProcessPoolExecutor(
+                max_workers=int(os.getenv('MINERU_DRAW_WORKERS', 1)),
+                mp_context=mp.get_context('spawn'),
+            )
+        future = _overlay_executor.submit(_draw_overlays_from_pickle, pdf_info_bytes, pdf_bytes, overlays)
+    future.add_done_callback(_log_overlay_error)
+    return future
+
+
+def wait_draw_overlays():
+    """等待所有后台绘制完成并关闭后台进程."""
+    global _overlay_executor
+    with _overlay_executor_lock:
+        executor, _overlay_executor = _overlay_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
 
 
 def draw_char_bbox(pdf_bytes, out_path, filename):
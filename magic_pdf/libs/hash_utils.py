@@ -7,6 +7,15 @@ def compute_md5(file_bytes):
     return hasher.hexdigest().upper()
 
 
+def compute_file_md5(file_path, chunk_size=1 << 20):
+    # 分块读取文件计算md5，结果与compute_md5(文件内容)一致，不把整个文件读入内存
+    hasher = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest().upper()
+
+
 def compute_sha256(input_string):
     hasher = hashlib.sha256()
     # 在Python3中，需要将字符串转化为字节对象才能被哈希函数处理
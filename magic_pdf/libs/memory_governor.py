@@ -0,0 +1,187 @@
+import gc
+import os
+import threading
+import time
+
+from loguru import logger
+
+from magic_pdf.libs.memory_tracker import get_rss_mb
+
+_MB = 1024 * 1024
+
+
+def _physical_memory_mb() -> float | None:
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / _MB
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _device_usage(device) -> tuple[float, float, float] | None:
+    """设备的(已分配, 分配器保留, 总量)，单位MB，无法获取时返回None."""
+    device = str(device)
+    try:
+        import torch
+        if device.startswith('cuda') and torch.cuda.is_available():
+            total = torch.cuda.get_device_properties(device).total_memory
+            return torch.cuda.memory_allocated(device) / _MB, torch.cuda.memory_reserved(device) / _MB, total / _MB
+        if device.startswith('npu'):
+            import torch_npu
+            if torch_npu.npu.is_available():
+                total = torch_npu.npu.get_device_properties(device).total_memory
+                return (torch_npu.npu.memory_allocated(device) / _MB, torch_npu.npu.memory_reserved(device) / _MB,
+                        total / _MB)
+        if device.startswith('mps'):
+            return (torch.mps.current_allocated_memory() / _MB, torch.mps.driver_allocated_memory() / _MB,
+                    torch.mps.recommended_max_memory() / _MB)
+    except Exception:
+        pass
+    return None
+
+
+def _empty_device_cache(device):
+    device = str(device)
+    import torch
+    if device.startswith('cuda'):
+        torch.cuda.empty_cache()
+        torch.cuda.ipc_collect()
+    elif device.startswith('npu'):
+        import torch_npu
+        torch_npu.npu.empty_cache()
+    elif device.startswith('mps'):
+        torch.mps.empty_cache()
+
+
+class MemoryGovernor:
+    """按水位线清理内存，代替每个batch之后无条件的clean_memory.
+
+    设备分配器保留的显存超过总量的device_high_water时才执行empty_cache；清理后已分配的显存仍然超过水位线时，
+    batch_ratio减半(直到1)，显存降到水位线的一半以下后再逐步恢复。
+    进程RSS超过物理内存的rss_high_water时才执行完整的gc.collect()；如果gc后RSS仍然超过水位线(存活的对象本身就很多)，
+    要等RSS比上次gc后再增长10%才会再次gc，避免每个batch都遍历数百万个对象。
+    """
+
+    def __init__(self, device_high_water: float = 0.8, rss_high_water: float = 0.75, always: bool = False):
+        """Initialized method.
+
+        Args:
+            device_high_water (float, optional): the fraction of the device memory reserved by the allocator
+                above which the cache is emptied. Defaults to 0.8.
+            rss_high_water (float, optional): the fraction of the physical memory used by this process
+                above which a full gc is run. Defaults to 0.75.
+            always (bool, optional): clean up unconditionally like clean_memory. Defaults to False.
+        """
+        self.device_high_water = device_high_water
+        self.rss_high_water = rss_high_water
+        self.always = always
+        physical = _physical_memory_mb()
+        self._rss_high_water_mb = physical * rss_high_water if physical else None
+        self._rss_gc_floor_mb = self._rss_high_water_mb
+        self._batch_divisor = 1
+        # 最近一次传入scale_batch_ratio的batch_ratio，batch_divisor不超过它
+        self._batch_ratio = 1
+        self._lock = threading.Lock()
+        self._stats = {
+            'checks': 0,
+            'device_cleanups': 0,
+            'device_cleanup_seconds': 0.0,
+            'gc_collections': 0,
+            'gc_seconds': 0.0,
+            'batch_reductions': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> 'MemoryGovernor':
+        """MINERU_VRAM_HIGH_WATER: 显存水位线，默认0.8; MINERU_RSS_HIGH_WATER: 内存水位线，默认0.75;
+        MINERU_MEMORY_CLEAN: 为always时每次都清理."""
+        return cls(
+            device_high_water=float(os.getenv('MINERU_VRAM_HIGH_WATER', 0.8)),
+            rss_high_water=float(os.getenv('MINERU_RSS_HIGH_WATER', 0.75)),
+            always=os.getenv('MINERU_MEMORY_CLEAN', 'threshold') == 'always',
+        )
+
+    def _check_device(self, device):
+        usage = _device_usage(device)
+        if usage is None:
+            # 无法获取用量的设备只在always模式下清理
+            if self.always and not str(device).startswith('cpu'):
+                self._clean_device(device, 'always')
+            return
+        allocated, reserved, total = usage
+        high_water = total * self.device_high_water
+        if self.always or reserved >= high_water:
+            self._clean_device(device, f'reserved {reserved:.0f}MB/{total:.0f}MB')
+            allocated, reserved, total = _device_usage(device) or usage
+        with self._lock:
+            if allocated >= high_water:
+                # batch_ratio已经减到1时不再继续减半
+                if self._batch_divisor < self._batch_ratio:
+                    self._batch_divisor = min(self._batch_divisor * 2, self._batch_ratio)
+                    self._stats['batch_reductions'] += 1
+                    logger.warning(f'allocated {allocated:.0f}MB is above the high water mark, reduce the batch size')
+            elif allocated < high_water / 2 and self._batch_divisor > 1:
+                self._batch_divisor //= 2
+
+    def _clean_device(self, device, reason: str):
+        start = time.perf_counter()
+        _empty_device_cache(device)
+        cost = time.perf_counter() - start
+        with self._lock:
+            self._stats['device_cleanups'] += 1
+            self._stats['device_cleanup_seconds'] += cost
+        logger.info(f'empty {device} cache ({reason}), cost: {round(cost, 2)}s')
+
+    def _check_rss(self):
+        rss = get_rss_mb()
+        if not self.always and (rss is None or self._rss_gc_floor_mb is None or rss < self._rss_gc_floor_mb):
+            return
+        start = time.perf_counter()
+        gc.collect()
+        cost = time.perf_counter() - start
+        rss_after = get_rss_mb()
+        with self._lock:
+            self._stats['gc_collections'] += 1
+            self._stats['gc_seconds'] += cost
+            if self._rss_high_water_mb is not None and rss_after is not None:
+                self._rss_gc_floor_mb = max(self._rss_high_water_mb, rss_after * 1.1)
+        logger.info(f'gc (rss {rss}MB -> {rss_after}MB), cost: {round(cost, 2)}s')
+
+    def maybe_clean(self, device='cuda'):
+        """Clean up the device cache and the python heap if their high water marks are crossed.
+
+        Args:
+            device (str, optional): the inference device. Defaults to 'cuda'.
+        """
+        with self._lock:
+            self._stats['checks'] += 1
+        self._check_device(device)
+        self._check_rss()
+
+    def scale_batch_ratio(self, batch_ratio: int) -> int:
+        """Reduce the batch ratio while the device memory is under pressure."""
+        with self._lock:
+            self._batch_ratio = max(1, batch_ratio)
+            self._batch_divisor = min(self._batch_divisor, self._batch_ratio)
+            return max(1, batch_ratio // self._batch_divisor)
+
+    def stats(self) -> dict:
+        """How often and how long the cleanups took so far."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['device_cleanup_seconds'] = round(stats['device_cleanup_seconds'], 3)
+        stats['gc_seconds'] = round(stats['gc_seconds'], 3)
+        stats['batch_divisor'] = self._batch_divisor
+        return stats
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """The process-wide memory governor, configured from the environment."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = MemoryGovernor.from_env()
+        return _governor
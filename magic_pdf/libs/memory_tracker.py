@@ -0,0 +1,224 @@
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from collections import defaultdict
+
+from loguru import logger
+
+from magic_pdf.libs.pipeline_stage import StageObserver
+
+_MB = 1024 * 1024
+
+
+def get_rss_mb() -> float | None:
+    """当前进程的RSS(MB)，只支持linux，其他平台返回None."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / _MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _device_memory_api():
+    """已经初始化的cuda或npu的内存统计接口，没有时返回None，不会为此初始化设备."""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return None
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda
+    torch_npu = sys.modules.get('torch_npu')
+    if torch_npu is not None and torch_npu.npu.is_available():
+        return torch_npu.npu
+    return None
+
+
+class _Frame:
+    """一次阶段执行的内存统计，各项峰值都是绝对值，退出时再减去进入时的值."""
+
+    __slots__ = ('name', 'page_ids', 'rss_start', 'rss_peak', 'py_start', 'py_peak', 'device_start', 'device_peak')
+
+    def __init__(self, name, page_ids):
+        self.name = name
+        self.page_ids = page_ids
+        self.rss_start = self.rss_peak = None
+        self.py_start = self.py_peak = None
+        self.device_start = self.device_peak = None
+
+
+def _max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class MemoryTracker(StageObserver):
+    """按流水线阶段统计内存.
+
+    在每个阶段的边界记录进程RSS、Python分配的内存(tracemalloc，可选)和cuda/npu显存，
+    统计每个阶段相对进入时的增量(delta)和阶段内的峰值(peak，相对进入时)。
+    RSS的峰值由后台线程每隔interval秒采样得到，Python内存和显存的峰值来自tracemalloc和torch的峰值统计。
+    RSS和显存是整个进程共享的，多个线程同时执行阶段时峰值会互相包含。
+
+    线程最外层的阶段(一次doc_analyze或pdf_parse_union)结束时，汇总其中各阶段的结果作为一个文档的报告，
+    写入日志，并以json line的形式追加到report_path。
+    """
+
+    def __init__(self, report_path: str | None = None, interval: float = 0.01, trace_python: bool = False):
+        """Initialized method.
+
+        Args:
+            report_path (str | None, optional): append one json line per document to this file,
+                only log the report if None. Defaults to None.
+            interval (float, optional): the RSS sampling interval in seconds. Defaults to 0.01.
+            trace_python (bool, optional): track the python allocations with tracemalloc, which slows down
+                the python code considerably. Defaults to False.
+        """
+        self.report_path = report_path
+        self.interval = interval
+        self.trace_python = trace_python
+        self._lock = threading.Lock()
+        # 线程id -> [_Frame]
+        self._stacks: dict[int, list[_Frame]] = {}
+        # 线程id -> {'pages': 处理过的页面, 'stages': {阶段名: 统计}}，最外层阶段结束时输出
+        self._documents: dict[int, dict] = {}
+        self._document_count = 0
+        self._stop_event = None
+        # 由本对象开启的tracemalloc在所有阶段结束后关闭
+        self._started_tracing = False
+
+    @classmethod
+    def from_env(cls) -> 'MemoryTracker':
+        """MINERU_MEMORY_REPORT: 报告文件(json lines)，为1时只写日志; MINERU_MEMORY_INTERVAL_MS: RSS采样间隔，默认10毫秒;
+        MINERU_MEMORY_TRACEMALLOC: 为1时统计Python分配的内存."""
+        report_path = os.environ['MINERU_MEMORY_REPORT']
+        return cls(
+            None if report_path == '1' else report_path,
+            interval=float(os.getenv('MINERU_MEMORY_INTERVAL_MS', 10)) / 1000,
+            trace_python=os.getenv('MINERU_MEMORY_TRACEMALLOC', '0') == '1',
+        )
+
+    def enter_stage(self, name: str, page_ids):
+        thread_id = threading.get_ident()
+        frame = _Frame(name, page_ids)
+        with self._lock:
+            stack = self._stacks.setdefault(thread_id, [])
+            parent = stack[-1] if stack else None
+            if frame.page_ids is None and parent is not None:
+                frame.page_ids = parent.page_ids
+
+            frame.rss_start = frame.rss_peak = get_rss_mb()
+
+            if self.trace_python:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._started_tracing = True
+                current, peak = tracemalloc.get_traced_memory()
+                # reset_peak会清掉外层阶段的峰值，先把它记到外层阶段上
+                for outer in stack:
+                    outer.py_peak = _max(outer.py_peak, peak / _MB)
+                tracemalloc.reset_peak()
+                frame.py_start = frame.py_peak = current / _MB
+
+            device_api = _device_memory_api()
+            if device_api is not None:
+                peak = device_api.max_memory_allocated() / _MB
+                for outer in stack:
+                    outer.device_peak = _max(outer.device_peak, peak)
+                device_api.reset_peak_memory_stats()
+                frame.device_start = frame.device_peak = device_api.memory_allocated() / _MB
+
+            stack.append(frame)
+            if frame.rss_start is not None and self._stop_event is None:
+                self._stop_event = threading.Event()
+                threading.Thread(
+                    target=self._sample_loop, args=(self._stop_event,), name='mineru-memory', daemon=True
+                ).start()
+
+    def exit_stage(self, name: str, page_ids):
+        thread_id = threading.get_ident()
+        report = None
+        with self._lock:
+            stack = self._stacks.get(thread_id)
+            if not stack:
+                return
+            frame = stack.pop()
+
+            rss = get_rss_mb()
+            frame.rss_peak = _max(frame.rss_peak, rss)
+            if frame.py_start is not None and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                frame.py_peak = _max(frame.py_peak, peak / _MB)
+                py = current / _MB
+            else:
+                py = None
+            device_api = _device_memory_api() if frame.device_start is not None else None
+            if device_api is not None:
+                frame.device_peak = _max(frame.device_peak, device_api.max_memory_allocated() / _MB)
+                device = device_api.memory_allocated() / _MB
+            else:
+                device = None
+            for outer in stack:
+                outer.rss_peak = _max(outer.rss_peak, frame.rss_peak)
+                outer.py_peak = _max(outer.py_peak, frame.py_peak)
+                outer.device_peak = _max(outer.device_peak, frame.device_peak)
+
+            document = self._documents.setdefault(thread_id, {'pages': set(), 'stages': {}})
+            if frame.page_ids is not None:
+                document['pages'].update(frame.page_ids)
+            stats = document['stages'].setdefault(frame.name, defaultdict(float))
+            stats['calls'] += 1
+            for key, start, end, peak in (
+                ('rss', frame.rss_start, rss, frame.rss_peak),
+                ('python', frame.py_start, py, frame.py_peak),
+                ('device', frame.device_start, device, frame.device_peak),
+            ):
+                if start is None or end is None:
+                    continue
+                stats[f'{key}_delta_mb'] += end - start
+                stats[f'{key}_peak_mb'] = max(stats[f'{key}_peak_mb'], peak - start)
+                stats[f'{key}_max_mb'] = max(stats[f'{key}_max_mb'], peak)
+
+            if not stack:
+                del self._stacks[thread_id]
+                document = self._documents.pop(thread_id)
+                self._document_count += 1
+                report = {
+                    'document': self._document_count,
+                    'stage': frame.name,
+                    'pages': len(document['pages']),
+                    'stages': {
+                        stage: {key: round(value, 1) if key != 'calls' else int(value) for key, value in stats.items()}
+                        for stage, stats in document['stages'].items()
+                    },
+                }
+            if not self._stacks:
+                if self._stop_event is not None:
+                    self._stop_event.set()
+                    self._stop_event = None
+                if self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+        if report is not None:
+            self._write(report)
+
+    def _sample_loop(self, stop_event: threading.Event):
+        while not stop_event.wait(self.interval):
+            rss = get_rss_mb()
+            with self._lock:
+                for stack in self._stacks.values():
+                    # 外层阶段的峰值在内层阶段退出时更新
+                    stack[-1].rss_peak = _max(stack[-1].rss_peak, rss)
+
+    def _write(self, report: dict):
+        for stage, stats in report['stages'].items():
+            logger.info(
+                f"memory {report['stage']}#{report['document']} {stage}: "
+                + ', '.join(f'{key}: {value}' for key, value in stats.items())
+            )
+        if self.report_path:
+            with self._lock, open(self.report_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report, ensure_ascii=False) + '\n')
@@ -15,9 +15,15 @@ def calculate_sample_count(total_page: int):
     return select_page_cnt
 
 
-def extract_pages(src_pdf_bytes: bytes) -> fitz.Document:
-    pdf_docs = fitz.open("pdf", src_pdf_bytes)
-    total_page = len(pdf_docs)
+def extract_pages(src_pdf_bytes: bytes | fitz.Document, page_ids: range = None) -> fitz.Document:
+    # 可以直接传入已打开的文档和页码范围，只从范围内抽样，不需要先把范围内的页面另存为pdf
+    if isinstance(src_pdf_bytes, fitz.Document):
+        pdf_docs = src_pdf_bytes
+    else:
+        pdf_docs = fitz.open("pdf", src_pdf_bytes)
+    if page_ids is None:
+        page_ids = range(len(pdf_docs))
+    total_page = len(page_ids)
     if total_page == 0:
         # 如果PDF没有页面，直接返回空文档
         logger.warning("PDF is empty, return empty document")
@@ -28,18 +34,18 @@ def extract_pages(src_pdf_bytes: bytes) -> fitz.Document:
     sample_docs = fitz.Document()
     try:
         for index in page_num:
-            sample_docs.insert_pdf(pdf_docs, from_page=int(index), to_page=int(index))
+            sample_docs.insert_pdf(pdf_docs, from_page=page_ids[int(index)], to_page=page_ids[int(index)])
     except Exception as e:
         logger.exception(e)
     return sample_docs
 
 
-def detect_invalid_chars(src_pdf_bytes: bytes) -> bool:
+def detect_invalid_chars(src_pdf_bytes: bytes | fitz.Document, page_ids: range = None) -> bool:
     """"
     检测PDF中是否包含非法字符
     """
     '''pdfminer比较慢,需要先随机抽取10页左右的sample'''
-    sample_docs = extract_pages(src_pdf_bytes)
+    sample_docs = extract_pages(src_pdf_bytes, page_ids)
     sample_pdf_bytes = sample_docs.tobytes()
     sample_pdf_file_like_object = BytesIO(sample_pdf_bytes)
     laparams = LAParams(
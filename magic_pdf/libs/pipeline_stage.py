@@ -0,0 +1,73 @@
+"""流水线阶段的边界.
+
+doc_analyze、BatchAnalyze和pdf_parse_union在各阶段的开始和结束处进入/退出pipeline_stage，
+性能分析(stage_profiler)、内存统计(memory_tracker)等工具注册为观察者后即可按阶段统计；没有观察者时pipeline_stage几乎没有开销。
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+_observers = []
+_observers_lock = threading.Lock()
+_env_checked = False
+
+
+class StageObserver:
+    """阶段观察者，enter_stage和exit_stage在执行该阶段的线程中调用，阶段可以嵌套."""
+
+    def enter_stage(self, name: str, page_ids):
+        pass
+
+    def exit_stage(self, name: str, page_ids):
+        pass
+
+
+def add_stage_observer(observer: StageObserver):
+    global _observers
+    with _observers_lock:
+        # 复制后替换，正在遍历旧列表的线程不受影响
+        _observers = _observers + [observer]
+
+
+def remove_stage_observer(observer: StageObserver):
+    global _observers
+    with _observers_lock:
+        _observers = [o for o in _observers if o is not observer]
+
+
+def _init_from_env():
+    global _env_checked
+    with _observers_lock:
+        if _env_checked:
+            return
+        _env_checked = True
+    if os.getenv('MINERU_PROFILE_DIR'):
+        from magic_pdf.libs.stage_profiler import SamplingProfiler
+        add_stage_observer(SamplingProfiler.from_env())
+    if os.getenv('MINERU_MEMORY_REPORT'):
+        from magic_pdf.libs.memory_tracker import MemoryTracker
+        add_stage_observer(MemoryTracker.from_env())
+
+
+@contextmanager
+def pipeline_stage(name: str, page_ids=None):
+    """标记一个流水线阶段.
+
+    Args:
+        name (str): the stage name
+        page_ids (Iterable[int], optional): the page indexes processed in this stage, None means the same
+            pages as the enclosing stage. Defaults to None.
+    """
+    if not _env_checked:
+        _init_from_env()
+    observers = _observers
+    if not observers:
+        yield
+        return
+    for observer in observers:
+        observer.enter_stage(name, page_ids)
+    try:
+        yield
+    finally:
+        for observer in reversed(observers):
+            observer.exit_stage(name, page_ids)
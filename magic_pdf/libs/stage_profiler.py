@@ -0,0 +1,195 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from loguru import logger
+
+from magic_pdf.libs.pipeline_stage import StageObserver
+
+
+def parse_page_range(page_range: str | None) -> tuple[int, int] | None:
+    """解析 "3" 或 "3-5" 形式的页码范围(从0开始，包含两端)，为空时返回None."""
+    if not page_range:
+        return None
+    start, _, end = page_range.partition('-')
+    start = int(start)
+    end = int(end) if end else start
+    if end < start:
+        raise ValueError(f'invalid page range: {page_range}')
+    return start, end
+
+
+class SamplingProfiler(StageObserver):
+    """按流水线阶段采样的性能分析器.
+
+    后台线程每隔interval秒采集一次执行阶段的线程的调用栈，调用栈计入该线程最内层的阶段。
+    C扩展持有GIL时采样会推迟，推迟的时长按间隔数计入下一次采样的权重。
+    所有阶段结束时(以及进程退出时)把结果写入 {output_dir}/{pid}/:
+        {stage}.folded: collapsed stack格式，可以直接用flamegraph.pl或speedscope打开
+        {stage}.top.txt: 按自身和累计采样数排序的前top_n个函数
+        summary.json: 每个阶段的调用次数、耗时和采样数
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005, page_range: tuple[int, int] | None = None, top_n: int = 30):
+        """Initialized method.
+
+        Args:
+            output_dir (str): the output directory
+            interval (float, optional): the sampling interval in seconds. Defaults to 0.005.
+            page_range (tuple[int, int] | None, optional): only profile the stages processing the pages in
+                [start, end], None means all pages. Defaults to None.
+            top_n (int, optional): the number of functions in the top summary. Defaults to 30.
+        """
+        self.output_dir = os.path.join(output_dir, str(os.getpid()))
+        self.interval = interval
+        self.page_range = page_range
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        # 线程id -> [(阶段名, 是否分析, 开始时间)]
+        self._stacks: dict[int, list] = {}
+        self._samples: dict[str, Counter] = defaultdict(Counter)
+        self._seconds: dict[str, float] = defaultdict(float)
+        self._calls: Counter = Counter()
+        self._labels = {}
+        self._stop_event = None
+        # 上次写入后是否有新的结果
+        self._dirty = False
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls) -> 'SamplingProfiler':
+        """MINERU_PROFILE_DIR: 输出目录; MINERU_PROFILE_INTERVAL_MS: 采样间隔，默认5毫秒;
+        MINERU_PROFILE_PAGES: 只分析这些页面，如 "3" 或 "3-5"."""
+        return cls(
+            os.environ['MINERU_PROFILE_DIR'],
+            interval=float(os.getenv('MINERU_PROFILE_INTERVAL_MS', 5)) / 1000,
+            page_range=parse_page_range(os.getenv('MINERU_PROFILE_PAGES')),
+        )
+
+    def _in_range(self, page_ids) -> bool:
+        if self.page_range is None:
+            return True
+        start, end = self.page_range
+        return any(start <= page_id <= end for page_id in page_ids)
+
+    def enter_stage(self, name: str, page_ids):
+        thread_id = threading.get_ident()
+        with self._lock:
+            stack = self._stacks.setdefault(thread_id, [])
+            if page_ids is None:
+                profiled = stack[-1][1] if stack else self.page_range is None
+            else:
+                profiled = self._in_range(page_ids)
+            stack.append((name, profiled, time.perf_counter()))
+            if profiled and self._stop_event is None:
+                self._stop_event = threading.Event()
+                threading.Thread(
+                    target=self._sample_loop, args=(self._stop_event,), name='mineru-profiler', daemon=True
+                ).start()
+
+    def exit_stage(self, name: str, page_ids):
+        thread_id = threading.get_ident()
+        with self._lock:
+            stack = self._stacks.get(thread_id)
+            if not stack:
+                return
+            stage, profiled, start = stack.pop()
+            if profiled:
+                self._seconds[stage] += time.perf_counter() - start
+                self._calls[stage] += 1
+                self._dirty = True
+            if not stack:
+                del self._stacks[thread_id]
+            finished = not self._stacks
+            if finished and self._stop_event is not None:
+                self._stop_event.set()
+                self._stop_event = None
+        if finished:
+            self.flush()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = f'{module}:{getattr(code, "co_qualname", code.co_name)}:{code.co_firstlineno}'
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _sample_loop(self, stop_event: threading.Event):
+        last = time.perf_counter()
+        while not stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight = max(1, round((now - last) / self.interval))
+            last = now
+            with self._lock:
+                active = {
+                    thread_id: stack[-1][0]
+                    for thread_id, stack in self._stacks.items()
+                    if stack[-1][1]
+                }
+            frames = sys._current_frames()
+            collected = [
+                (stage, self._collapse(frames[thread_id]))
+                for thread_id, stage in active.items()
+                if thread_id in frames
+            ]
+            del frames
+            with self._lock:
+                for stage, stack in collected:
+                    self._samples[stage][stack] += weight
+
+    def _top(self, samples: Counter) -> str:
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in samples.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        total = sum(samples.values())
+        lines = [f"{'self%':>7} {'total%':>7}  function"]
+        for frame, count in self_counts.most_common(self.top_n):
+            lines.append(f'{count * 100 / total:7.2f} {total_counts[frame] * 100 / total:7.2f}  {frame}')
+        lines.append('')
+        lines.append(f"{'total%':>7}  function (by total)")
+        for frame, count in total_counts.most_common(self.top_n):
+            lines.append(f'{count * 100 / total:7.2f}  {frame}')
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """把目前为止的结果写入输出目录，同一阶段的文件会被覆盖为累计的结果."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            samples = {stage: Counter(counter) for stage, counter in self._samples.items()}
+            summary = {
+                stage: {
+                    'calls': self._calls[stage],
+                    'seconds': round(self._seconds[stage], 3),
+                    'samples': sum(samples.get(stage, {}).values()),
+                }
+                for stage in self._calls
+            }
+        os.makedirs(self.output_dir, exist_ok=True)
+        for stage, counter in samples.items():
+            if not counter:
+                continue
+            with open(os.path.join(self.output_dir, f'{stage}.folded'), 'w', encoding='utf-8') as f:
+                for stack, count in counter.most_common():
+                    f.write(f'{stack} {count}\n')
+            with open(os.path.join(self.output_dir, f'{stage}.top.txt'), 'w', encoding='utf-8') as f:
+                f.write(self._top(counter))
+        with open(os.path.join(self.output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
+        logger.info(f'stage profile saved to {self.output_dir}')
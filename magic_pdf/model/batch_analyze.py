@@ -4,6 +4,7 @@ from loguru import logger
 from tqdm import tqdm
 
 from magic_pdf.config.constants import MODEL_NAME
+from magic_pdf.libs.pipeline_stage import pipeline_stage
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
 from magic_pdf.model.sub_modules.model_utils import (
     clean_vram, crop_img, get_res_list_from_layout_res)
@@ -41,21 +42,22 @@ class BatchAnalyze:
 
         images = [image for image, _, _ in images_with_extra_info]
 
-        if self.model.layout_model_name == MODEL_NAME.LAYOUTLMv3:
-            # layoutlmv3
-            for image in images:
-                layout_res = self.model.layout_model(image, ignore_catids=[])
-                images_layout_res.append(layout_res)
-        elif self.model.layout_model_name == MODEL_NAME.DocLayout_YOLO:
-            # doclayout_yolo
-            layout_images = []
-            for image_index, image in enumerate(images):
-                layout_images.append(image)
-
-            images_layout_res += self.model.layout_model.batch_predict(
-                # layout_images, self.batch_ratio * YOLO_LAYOUT_BASE_BATCH_SIZE
-                layout_images, YOLO_LAYOUT_BASE_BATCH_SIZE
-            )
+        with pipeline_stage('batch_analyze.layout'):
+            if self.model.layout_model_name == MODEL_NAME.LAYOUTLMv3:
+                # layoutlmv3
+                for image in images:
+                    layout_res = self.model.layout_model(image, ignore_catids=[])
+                    images_layout_res.append(layout_res)
+            elif self.model.layout_model_name == MODEL_NAME.DocLayout_YOLO:
+                # doclayout_yolo
+                layout_images = []
+                for image_index, image in enumerate(images):
+                    layout_images.append(image)
+
+                images_layout_res += self.model.layout_model.batch_predict(
+                    # layout_images, self.batch_ratio * YOLO_LAYOUT_BASE_BATCH_SIZE
+                    layout_images, YOLO_LAYOUT_BASE_BATCH_SIZE
+                )
 
         # logger.info(
         #     f'layout time: {round(time.time() - layout_start_time, 2)}, image num: {len(images)}'
@@ -64,21 +66,23 @@ class BatchAnalyze:
         if self.model.apply_formula:
             # 公式检测
             mfd_start_time = time.time()
-            images_mfd_res = self.model.mfd_model.batch_predict(
-                # images, self.batch_ratio * MFD_BASE_BATCH_SIZE
-                images, MFD_BASE_BATCH_SIZE
-            )
+            with pipeline_stage('batch_analyze.mfd'):
+                images_mfd_res = self.model.mfd_model.batch_predict(
+                    # images, self.batch_ratio * MFD_BASE_BATCH_SIZE
+                    images, MFD_BASE_BATCH_SIZE
+                )
             # logger.info(
             #     f'mfd time: {round(time.time() - mfd_start_time, 2)}, image num: {len(images)}'
             # )
 
             # 公式识别
             mfr_start_time = time.time()
-            images_formula_list = self.model.mfr_model.batch_predict(
-                images_mfd_res,
-                images,
-                batch_size=self.batch_ratio * MFR_BASE_BATCH_SIZE,
-            )
+            with pipeline_stage('batch_analyze.mfr'):
+                images_formula_list = self.model.mfr_model.batch_predict(
+                    images_mfd_res,
+                    images,
+                    batch_size=self.batch_ratio * MFR_BASE_BATCH_SIZE,
+                )
             mfr_count = 0
             for image_index in range(len(images)):
                 images_layout_res[image_index] += images_formula_list[image_index]
@@ -120,37 +124,38 @@ class BatchAnalyze:
         det_start = time.time()
         det_count = 0
         # for ocr_res_list_dict in ocr_res_list_all_page:
-        for ocr_res_list_dict in tqdm(ocr_res_list_all_page, desc="OCR-det Predict"):
-            # Process each area that requires OCR processing
-            _lang = ocr_res_list_dict['lang']
-            # Get OCR results for this language's images
-            atom_model_manager = AtomModelSingleton()
-            ocr_model = atom_model_manager.get_atom_model(
-                atom_model_name='ocr',
-                ocr_show_log=False,
-                det_db_box_thresh=0.3,
-                lang=_lang
-            )
-            for res in ocr_res_list_dict['ocr_res_list']:
-                new_image, useful_list = crop_img(
-                    res, ocr_res_list_dict['np_array_img'], crop_paste_x=50, crop_paste_y=50
-                )
-                adjusted_mfdetrec_res = get_adjusted_mfdetrec_res(
-                    ocr_res_list_dict['single_page_mfdetrec_res'], useful_list
+        with pipeline_stage('batch_analyze.ocr_det'):
+            for ocr_res_list_dict in tqdm(ocr_res_list_all_page, desc="OCR-det Predict"):
+                # Process each area that requires OCR processing
+                _lang = ocr_res_list_dict['lang']
+                # Get OCR results for this language's images
+                atom_model_manager = AtomModelSingleton()
+                ocr_model = atom_model_manager.get_atom_model(
+                    atom_model_name='ocr',
+                    ocr_show_log=False,
+                    det_db_box_thresh=0.3,
+                    lang=_lang
                 )
+                for res in ocr_res_list_dict['ocr_res_list']:
+                    new_image, useful_list = crop_img(
+                        res, ocr_res_list_dict['np_array_img'], crop_paste_x=50, crop_paste_y=50
+                    )
+                    adjusted_mfdetrec_res = get_adjusted_mfdetrec_res(
+                        ocr_res_list_dict['single_page_mfdetrec_res'], useful_list
+                    )
 
-                # OCR-det
-                new_image = cv2.cvtColor(new_image, cv2.COLOR_RGB2BGR)
-                ocr_res = ocr_model.ocr(
-                    new_image, mfd_res=adjusted_mfdetrec_res, rec=False
-                )[0]
+                    # OCR-det
+                    new_image = cv2.cvtColor(new_image, cv2.COLOR_RGB2BGR)
+                    ocr_res = ocr_model.ocr(
+                        new_image, mfd_res=adjusted_mfdetrec_res, rec=False
+                    )[0]
 
-                # Integration results
-                if ocr_res:
-                    ocr_result_list = get_ocr_result_list(ocr_res, useful_list, ocr_res_list_dict['ocr_enable'], new_image, _lang)
-                    ocr_res_list_dict['layout_res'].extend(ocr_result_list)
+                    # Integration results
+                    if ocr_res:
+                        ocr_result_list = get_ocr_result_list(ocr_res, useful_list, ocr_res_list_dict['ocr_enable'], new_image, _lang)
+                        ocr_res_list_dict['layout_res'].extend(ocr_result_list)
 
-            # det_count += len(ocr_res_list_dict['ocr_res_list'])
+                # det_count += len(ocr_res_list_dict['ocr_res_list'])
         # logger.info(f'ocr-det time: {round(time.time()-det_start, 2)}, image num: {det_count}')
 
 
@@ -158,41 +163,50 @@ class BatchAnalyze:
         if self.model.apply_table:
             table_start = time.time()
             # for table_res_list_dict in table_res_list_all_page:
-            for table_res_dict in tqdm(table_res_list_all_page, desc="Table Predict"):
-                _lang = table_res_dict['lang']
-                atom_model_manager = AtomModelSingleton()
-                ocr_engine = atom_model_manager.get_atom_model(
-                    atom_model_name='ocr',
-                    ocr_show_log=False,
-                    det_db_box_thresh=0.5,
-                    det_db_unclip_ratio=1.6,
-                    lang=_lang
-                )
-                table_model = atom_model_manager.get_atom_model(
-                    atom_model_name='table',
-                    table_model_name='rapid_table',
-                    table_model_path='',
-                    table_max_time=400,
-                    device='cpu',
-                    ocr_engine=ocr_engine,
-                    table_sub_model_name='slanet_plus'
-                )
-                html_code, table_cell_bboxes, logic_points, elapse = table_model.predict(table_res_dict['table_img'])
-                # 判断是否返回正常
-                if html_code:
-                    expected_ending = html_code.strip().endswith(
-                        '</html>'
-                    ) or html_code.strip().endswith('</table>')
-                    if expected_ending:
-                        table_res_dict['table_res']['html'] = html_code
+            with pipeline_stage('batch_analyze.table'):
+                if table_res_list_all_page:
+                    # 表格模型的缓存键不含表格的语言，所有表格共用同一个模型和它的session池
+                    _lang = table_res_list_all_page[0]['lang']
+                    atom_model_manager = AtomModelSingleton()
+                    ocr_engine = atom_model_manager.get_atom_model(
+                        atom_model_name='ocr',
+                        ocr_show_log=False,
+                        det_db_box_thresh=0.5,
+                        det_db_unclip_ratio=1.6,
+                        lang=_lang
+                    )
+                    table_model = atom_model_manager.get_atom_model(
+                        atom_model_name='table',
+                        table_model_name='rapid_table',
+                        table_model_path='',
+                        table_max_time=400,
+                        device='cpu',
+                        ocr_engine=ocr_engine,
+                        table_sub_model_name='slanet_plus'
+                    )
+                    table_results = table_model.batch_predict(
+                        [table_res_dict['table_img'] for table_res_dict in table_res_list_all_page]
+                    )
+                else:
+                    table_results = []
+                for table_res_dict, (html_code, table_cell_bboxes, logic_points, elapse) in zip(
+                    table_res_list_all_page, table_results
+                ):
+                    # 判断是否返回正常
+                    if html_code:
+                        expected_ending = html_code.strip().endswith(
+                            '</html>'
+                        ) or html_code.strip().endswith('</table>')
+                        if expected_ending:
+                            table_res_dict['table_res']['html'] = html_code
+                        else:
+                            logger.warning(
+                                'table recognition processing fails, not found expected HTML table end'
+                            )
                     else:
                         logger.warning(
-                            'table recognition processing fails, not found expected HTML table end'
+                            'table recognition processing fails, not get html return'
                         )
-                else:
-                    logger.warning(
-                        'table recognition processing fails, not get html return'
-                    )
             # logger.info(f'table time: {round(time.time() - table_start, 2)}, image num: {len(table_res_list_all_page)}')
 
         # Create dictionaries to store items by language
@@ -227,29 +241,30 @@ class BatchAnalyze:
             total_processed = 0
 
             # Process each language separately
-            for lang, img_crop_list in img_crop_lists_by_lang.items():
-                if len(img_crop_list) > 0:
-                    # Get OCR results for this language's images
-                    atom_model_manager = AtomModelSingleton()
-                    ocr_model = atom_model_manager.get_atom_model(
-                        atom_model_name='ocr',
-                        ocr_show_log=False,
-                        det_db_box_thresh=0.3,
-                        lang=lang
-                    )
-                    ocr_res_list = ocr_model.ocr(img_crop_list, det=False, tqdm_enable=True)[0]
+            with pipeline_stage('batch_analyze.ocr_rec'):
+                for lang, img_crop_list in img_crop_lists_by_lang.items():
+                    if len(img_crop_list) > 0:
+                        # Get OCR results for this language's images
+                        atom_model_manager = AtomModelSingleton()
+                        ocr_model = atom_model_manager.get_atom_model(
+                            atom_model_name='ocr',
+                            ocr_show_log=False,
+                            det_db_box_thresh=0.3,
+                            lang=lang
+                        )
+                        ocr_res_list = ocr_model.ocr(img_crop_list, det=False, tqdm_enable=True)[0]
 
-                    # Verify we have matching counts
-                    assert len(ocr_res_list) == len(
-                        need_ocr_lists_by_lang[lang]), f'ocr_res_list: {len(ocr_res_list)}, need_ocr_list: {len(need_ocr_lists_by_lang[lang])} for lang: {lang}'
+                        # Verify we have matching counts
+                        assert len(ocr_res_list) == len(
+                            need_ocr_lists_by_lang[lang]), f'ocr_res_list: {len(ocr_res_list)}, need_ocr_list: {len(need_ocr_lists_by_lang[lang])} for lang: {lang}'
 
-                    # Process OCR results for this language
-                    for index, layout_res_item in enumerate(need_ocr_lists_by_lang[lang]):
-                        ocr_text, ocr_score = ocr_res_list[index]
-                        layout_res_item['text'] = ocr_text
-                        layout_res_item['score'] = float(f"{ocr_score:.3f}")
+                        # Process OCR results for this language
+                        for index, layout_res_item in enumerate(need_ocr_lists_by_lang[lang]):
+                            ocr_text, ocr_score = ocr_res_list[index]
+                            layout_res_item['text'] = ocr_text
+                            layout_res_item['score'] = float(f"{ocr_score:.3f}")
 
-                    total_processed += len(img_crop_list)
+                        total_processed += len(img_crop_list)
 
             rec_time += time.time() - rec_start
             # logger.info(f'ocr-rec time: {round(rec_time, 2)}, total images processed: {total_processed}')
@@ -0,0 +1,187 @@
+import atexit
+import multiprocessing as mp
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from loguru import logger
+
+
+def get_inference_devices() -> list[str]:
+    """读取多设备推理使用的设备列表.
+
+    MINERU_INFERENCE_DEVICES: 逗号分隔的设备列表，例如 "cuda:0,cuda:1"；
+    同一个设备可以重复出现，例如 "cpu,cpu,cpu,cpu" 表示4个cpu worker。
+    未设置时返回空列表，表示使用单设备顺序推理。
+    """
+    devices = os.environ.get('MINERU_INFERENCE_DEVICES', '')
+    return [device.strip() for device in devices.split(',') if device.strip()]
+
+
+def _init_device_worker(device: str):
+    """在worker进程中绑定设备，必须在加载任何模型之前执行."""
+    if device.startswith('cuda:'):
+        os.environ['CUDA_VISIBLE_DEVICES'] = device.split(':')[-1]
+        device = 'cuda'
+    elif device.startswith('npu:'):
+        os.environ['ASCEND_RT_VISIBLE_DEVICES'] = device.split(':')[-1]
+        device = 'npu'
+    os.environ['MINERU_DEVICE_MODE'] = device
+
+
+def _analyze_batch_on_device(batch, show_log, layout_model, formula_enable, table_enable):
+    from magic_pdf.model.doc_analyze_by_custom_model import \
+        may_batch_image_analyze
+    return may_batch_image_analyze(batch, True, show_log, layout_model, formula_enable, table_enable)
+
+
+# 设备worker进程在多次run之间常驻，模型只在进程首次推理时加载；键为(worker序号, 设备)，同一设备可以有多个worker
+_device_executors: dict[tuple[int, str], ProcessPoolExecutor] = {}
+_device_executors_lock = threading.Lock()
+
+
+def _get_device_executor(worker_id: int, device: str) -> ProcessPoolExecutor:
+    with _device_executors_lock:
+        key = (worker_id, device)
+        if key not in _device_executors:
+            _device_executors[key] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=mp.get_context('spawn'),
+                initializer=_init_device_worker,
+                initargs=(device,),
+            )
+        return _device_executors[key]
+
+
+def _discard_device_executor(worker_id: int, device: str):
+    with _device_executors_lock:
+        executor = _device_executors.pop((worker_id, device), None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_device_workers():
+    """Stop all device worker processes, called at exit."""
+    with _device_executors_lock:
+        executors = list(_device_executors.values())
+        _device_executors.clear()
+    for executor in executors:
+        executor.shutdown()
+
+
+atexit.register(shutdown_device_workers)
+
+
+class WorkStealingScheduler:
+    """把页面batch分发到多个设备上推理，空闲的设备会从其它设备的队列尾部窃取batch.
+
+    每个设备对应一个调度线程；use_processes为True时，调度线程把batch提交给该设备独占的worker进程，
+    worker进程在多次run之间常驻，直到进程退出或worker崩溃；
+    否则直接在调度线程中执行(每个线程相当于一个虚拟设备，便于在cpu上测试)。
+    """
+
+    def __init__(self, devices: list[str], analyze_fn: Callable = _analyze_batch_on_device, use_processes=True):
+        """Initialized method.
+
+        Args:
+            devices (list[str]): one worker is started for each entry
+            analyze_fn (Callable, optional): invoked as analyze_fn(batch, *args), must return one result per page.
+                Must be picklable when use_processes is True.
+            use_processes (bool, optional): run each device worker in its own process. Defaults to True.
+        """
+        if len(devices) == 0:
+            raise ValueError('at least one device is required')
+        self.devices = devices
+        self.analyze_fn = analyze_fn
+        self.use_processes = use_processes
+        self.steal_count = 0
+        self.device_batch_count = [0] * len(devices)
+
+    def _split(self, num_batches: int) -> list[deque]:
+        # 按连续区间初始分配，让每个设备先处理相邻的页面
+        queues = [deque() for _ in self.devices]
+        per_device, remainder = divmod(num_batches, len(self.devices))
+        start = 0
+        for worker_id in range(len(self.devices)):
+            end = start + per_device + (1 if worker_id < remainder else 0)
+            queues[worker_id].extend(range(start, end))
+            start = end
+        return queues
+
+    def _next_batch(self, worker_id: int, queues: list[deque], lock: threading.Lock):
+        with lock:
+            if queues[worker_id]:
+                return queues[worker_id].popleft()
+            victim = max(range(len(queues)), key=lambda i: len(queues[i]))
+            if queues[victim]:
+                self.steal_count += 1
+                return queues[victim].pop()
+            return None
+
+    def run(self, batches: list[list], *args, on_batch_done: Callable | None = None) -> list:
+        """Analyze the batches and return the results of all pages in input order.
+
+        Args:
+            batches (list[list]): the page batches, each item is the input of analyze_fn
+            *args: extra arguments passed to analyze_fn
+            on_batch_done (Callable | None, optional): invoked as on_batch_done(batch_index, result) in the
+                scheduling thread once a batch is finished, e.g. to checkpoint it. Defaults to None.
+
+        Returns:
+            list: the flattened results, in the same order as the pages in batches
+        """
+        queues = self._split(len(batches))
+        lock = threading.Lock()
+        batch_results = [None] * len(batches)
+        errors = []
+
+        def worker(worker_id: int):
+            device = self.devices[worker_id]
+            executor = _get_device_executor(worker_id, device) if self.use_processes else None
+            try:
+                while not errors:
+                    batch_index = self._next_batch(worker_id, queues, lock)
+                    if batch_index is None:
+                        break
+                    logger.info(f'device {device} analyze batch {batch_index + 1}/{len(batches)}')
+                    if executor is not None:
+                        result = executor.submit(self.analyze_fn, batches[batch_index], *args).result()
+                    else:
+                        result = self.analyze_fn(batches[batch_index], *args)
+                    if len(result) != len(batches[batch_index]):
+                        raise RuntimeError(
+                            f'device {device} returned {len(result)} results for {len(batches[batch_index])} pages'
+                        )
+                    batch_results[batch_index] = result
+                    self.device_batch_count[worker_id] += 1
+                    if on_batch_done is not None:
+                        on_batch_done(batch_index, result)
+            except BrokenProcessPool as e:
+                # worker进程异常退出，下次run时重新启动
+                _discard_device_executor(worker_id, device)
+                errors.append(e)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=worker, args=(worker_id,), daemon=True)
+            for worker_id in range(len(self.devices))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        logger.info(
+            f'batches per worker: {list(zip(self.devices, self.device_batch_count))}, steals: {self.steal_count}'
+        )
+        results = []
+        for result in batch_results:
+            results.extend(result)
+        return results
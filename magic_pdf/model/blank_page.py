@@ -0,0 +1,77 @@
+import os
+import re
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from magic_pdf.data.dataset import Doc, PageableData
+
+# 页码等只含数字和符号的文字不算内容
+_NON_CONTENT_CHARS = re.compile(r'[\d\W_]+', re.UNICODE)
+
+
+class BlankPageDetector:
+    """推理前识别空白页和近似空白页(分隔页、扫描件的背面、只有页码的页面)，这些页面跳过所有模型阶段.
+
+    页面同时满足以下两个条件时视为空白:
+        文字层去掉数字、空白和标点后不超过max_text_chars个字符(图片没有文字层)；
+        页面缩小到最长边sample_size像素后，与背景色(各通道中位数)相差超过ink_delta的像素比例不超过ink_ratio。
+    阈值偏保守，宁可漏掉空白页也不跳过有内容的页面。
+    """
+
+    def __init__(self, ink_ratio: float = 0.0002, ink_delta: int = 64, max_text_chars: int = 0, sample_size: int = 512):
+        """Initialized method.
+
+        Args:
+            ink_ratio (float, optional): the max ratio of ink pixels of a blank page. Defaults to 0.0002.
+            ink_delta (int, optional): the min difference from the background color of an ink pixel. Defaults to 64.
+            max_text_chars (int, optional): the max number of letters in the text layer of a blank page,
+                digits, spaces and punctuation are not counted. Defaults to 0.
+            sample_size (int, optional): the longest side of the downscaled page. Defaults to 512.
+        """
+        self.ink_ratio = ink_ratio
+        self.ink_delta = ink_delta
+        self.max_text_chars = max_text_chars
+        self.sample_size = sample_size
+        self.skipped_pages = 0
+
+    @classmethod
+    def from_env(cls) -> 'BlankPageDetector | None':
+        """MINERU_SKIP_BLANK_PAGES: 为0时不跳过空白页; MINERU_BLANK_PAGE_INK_RATIO: 墨迹像素比例的上限，默认0.0002;
+        MINERU_BLANK_PAGE_MAX_CHARS: 文字层中字符数的上限，默认0."""
+        if os.getenv('MINERU_SKIP_BLANK_PAGES', '1') == '0':
+            return None
+        return cls(
+            ink_ratio=float(os.getenv('MINERU_BLANK_PAGE_INK_RATIO', 0.0002)),
+            max_text_chars=int(os.getenv('MINERU_BLANK_PAGE_MAX_CHARS', 0)),
+        )
+
+    def _has_text(self, page: PageableData) -> bool:
+        if not isinstance(page, Doc):
+            return False
+        text = page.get_doc().get_text('text')
+        return len(_NON_CONTENT_CHARS.sub('', text)) > self.max_text_chars
+
+    def ink_ratio_of(self, img: np.ndarray) -> float:
+        """The ratio of the pixels that differ from the background color."""
+        h, w = img.shape[:2]
+        scale = self.sample_size / max(h, w)
+        if scale < 1:
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        if img.ndim == 2:
+            img = img[:, :, None]
+        background = np.median(img.reshape(-1, img.shape[2]), axis=0)
+        diff = np.abs(img.astype(np.int16) - background.astype(np.int16)).max(axis=2)
+        return float(np.count_nonzero(diff > self.ink_delta)) / diff.size
+
+    def is_blank(self, img: np.ndarray, page: PageableData) -> bool:
+        """Whether the rendered page img of page is blank."""
+        if self.ink_ratio_of(img) > self.ink_ratio or self._has_text(page):
+            return False
+        self.skipped_pages += 1
+        return True
+
+    def report(self, total_pages: int):
+        if self.skipped_pages:
+            logger.info(f'skip model inference of {self.skipped_pages}/{total_pages} blank pages')
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+
+from loguru import logger
+
+from magic_pdf.data.data_reader_writer import (DataReader, DataWriter,
+                                               FileBasedDataReader,
+                                               FileBasedDataWriter)
+from magic_pdf.data.data_reader_writer.s3 import S3DataReader, S3DataWriter
+from magic_pdf.data.dataset import Dataset
+from magic_pdf.libs.commons import parse_bucket_key
+from magic_pdf.libs.config_reader import (get_formula_config,
+                                          get_layout_config, get_s3_config,
+                                          get_table_recog_config)
+from magic_pdf.libs.version import __version__
+
+# 索引交替写入两个文件，写入中途被中断时另一个文件仍然完整
+INDEX_FILES = ('index.0.json', 'index.1.json')
+
+
+def compute_fingerprint(datasets: list[Dataset], ocr_list: list[bool], **model_options) -> str:
+    """计算推理输入和模型配置的指纹，任何一项变化都会使旧的checkpoint失效.
+
+    Args:
+        datasets (list[Dataset]): the datasets to be analyzed
+        ocr_list (list[bool]): the ocr flag of each dataset
+        **model_options: the other options which affect the inference result, such as layout_model
+
+    Returns:
+        str: the fingerprint
+    """
+    payload = {
+        'docs': [
+            [dataset.data_md5(), ocr, dataset._lang]
+            for dataset, ocr in zip(datasets, ocr_list)
+        ],
+        'options': model_options,
+        'layout_config': get_layout_config(),
+        'formula_config': get_formula_config(),
+        'table_config': get_table_recog_config(),
+        'version': __version__,
+    }
+    return hashlib.md5(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def init_checkpoint_reader_writer(checkpoint_dir: str) -> tuple[DataReader, DataWriter]:
+    """checkpoint_dir可以是本地目录或s3路径(s3://bucket/prefix)"""
+    if checkpoint_dir.startswith('s3://'):
+        bucket, prefix = parse_bucket_key(checkpoint_dir)
+        ak, sk, endpoint = get_s3_config(bucket)
+        return (
+            S3DataReader(prefix, bucket=bucket, ak=ak, sk=sk, endpoint_url=endpoint),
+            S3DataWriter(prefix, bucket=bucket, ak=ak, sk=sk, endpoint_url=endpoint),
+        )
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return FileBasedDataReader(checkpoint_dir), FileBasedDataWriter(checkpoint_dir)
+
+
+class InferenceCheckpoint:
+    """把完成的推理batch持久化，重启后跳过已有有效checkpoint的页面.
+
+    同一份输入(文档内容、ocr、语言、模型配置)的checkpoint保存在 {checkpoint_dir}/{fingerprint}/ 下，
+    每个batch一个文件，记录页面序号和对应的模型结果；索引文件记录已完成的batch。
+    """
+
+    def __init__(self, reader: DataReader, writer: DataWriter, fingerprint: str):
+        """Initialized method.
+
+        Args:
+            reader (DataReader): the reader of checkpoint dir
+            writer (DataWriter): the writer of checkpoint dir
+            fingerprint (str): the fingerprint of inference inputs, see compute_fingerprint
+        """
+        self._reader = reader
+        self._writer = writer
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._seq, self._batch_files = self._load_index()
+
+    def _read_json(self, path: str):
+        try:
+            return json.loads(self._reader.read(f'{self.fingerprint}/{path}'))
+        except Exception:
+            return None
+
+    def _load_index(self) -> tuple[int, list[str]]:
+        latest = (-1, [])
+        for index_file in INDEX_FILES:
+            index = self._read_json(index_file)
+            if not isinstance(index, dict) or index.get('fingerprint') != self.fingerprint:
+                continue
+            if index.get('seq', -1) > latest[0]:
+                latest = (index['seq'], list(index.get('batches', [])))
+        return latest
+
+    def load(self) -> dict[int, dict]:
+        """Load the pages which have valid checkpoints.
+
+        Returns:
+            dict[int, dict]: page index -> the model result of page, {'layout_dets': ..., 'page_info': ...}
+        """
+        pages = {}
+        for batch_file in self._batch_files:
+            batch = self._read_json(batch_file)
+            if (
+                not isinstance(batch, dict)
+                or batch.get('fingerprint') != self.fingerprint
+                or len(batch.get('pages', [])) != len(batch.get('results', []))
+            ):
+                logger.warning(f'invalid inference checkpoint: {batch_file}, ignored')
+                continue
+            pages.update(zip(batch['pages'], batch['results']))
+        if pages:
+            logger.info(f'restored {len(pages)} pages from inference checkpoint {self.fingerprint}')
+        return pages
+
+    def save(self, page_indices: list[int], results: list[dict]):
+        """Persist one finished batch, it is safe to call from multiple threads.
+
+        Args:
+            page_indices (list[int]): the index of pages in the batch
+            results (list[dict]): the model result of each page, {'layout_dets': ..., 'page_info': ...}
+        """
+        batch_file = f'batch_{page_indices[0]}_{page_indices[-1]}_{len(page_indices)}.json'
+        batch = {
+            'fingerprint': self.fingerprint,
+            'pages': page_indices,
+            'results': results,
+        }
+        self._writer.write_string(f'{self.fingerprint}/{batch_file}', json.dumps(batch, ensure_ascii=False))
+        with self._lock:
+            if batch_file not in self._batch_files:
+                self._batch_files.append(batch_file)
+            self._seq += 1
+            index = {
+                'fingerprint': self.fingerprint,
+                'seq': self._seq,
+                'batches': self._batch_files,
+            }
+            self._writer.write_string(
+                f'{self.fingerprint}/{INDEX_FILES[self._seq % 2]}', json.dumps(index)
+            )
+
+
+def open_checkpoint(checkpoint_dir: str | None, datasets: list[Dataset], ocr_list: list[bool], **model_options) -> InferenceCheckpoint | None:
+    """打开推理checkpoint，checkpoint_dir为None时读取环境变量MINERU_CHECKPOINT_DIR，都未设置时不使用checkpoint."""
+    if checkpoint_dir is None:
+        checkpoint_dir = os.environ.get('MINERU_CHECKPOINT_DIR')
+    if not checkpoint_dir:
+        return None
+    reader, writer = init_checkpoint_reader_writer(checkpoint_dir)
+    return InferenceCheckpoint(reader, writer, compute_fingerprint(datasets, ocr_list, **model_options))
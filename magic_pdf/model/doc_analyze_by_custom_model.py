@@ -1,3 +1,4 @@
+import math
 import os
 import time
 
@@ -16,16 +17,25 @@ from magic_pdf.model.sub_modules.model_utils import get_vram
 from magic_pdf.config.enums import SupportedPdfParseMethod
 import magic_pdf.model as model_config
 from magic_pdf.data.dataset import Dataset
-from magic_pdf.libs.clean_memory import clean_memory
 from magic_pdf.libs.config_reader import (get_device, get_formula_config,
                                           get_layout_config,
                                           get_local_models_dir,
                                           get_table_recog_config)
+from magic_pdf.libs.memory_governor import get_memory_governor
+from magic_pdf.libs.pipeline_stage import pipeline_stage
+from magic_pdf.model.batch_scheduler import (WorkStealingScheduler,
+                                             get_inference_devices)
+from magic_pdf.model.blank_page import BlankPageDetector
+from magic_pdf.model.checkpoint import open_checkpoint
+from magic_pdf.model.inference_broker import get_inference_broker
 from magic_pdf.model.model_list import MODEL
+from magic_pdf.model.model_registry import ModelRegistry, get_model_cache_limits
 
 class ModelSingleton:
     _instance = None
-    _models = {}
+    # CustomPEKModel只引用AtomModelSingleton中常驻的layout和公式模型，ocr和表格模型每次使用时重新获取，
+    # 模型的显存预算在AtomModelSingleton中统计，这里只限制数量
+    _models = ModelRegistry('custom_model', get_model_cache_limits()[0])
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -42,16 +52,17 @@ class ModelSingleton:
         table_enable=None,
     ):
         key = (ocr, show_log, lang, layout_model, formula_enable, table_enable)
-        if key not in self._models:
-            self._models[key] = custom_model_init(
+        return self._models.get_or_create(
+            key,
+            lambda: custom_model_init(
                 ocr=ocr,
                 show_log=show_log,
                 lang=lang,
                 layout_model=layout_model,
                 formula_enable=formula_enable,
                 table_enable=table_enable,
-            )
-        return self._models[key]
+            ),
+        )
 
 
 def custom_model_init(
@@ -120,6 +131,7 @@ def custom_model_init(
 
     return custom_model
 
+@pipeline_stage('doc_analyze')
 def doc_analyze(
     dataset: Dataset,
     ocr: bool = False,
@@ -130,6 +142,7 @@ def doc_analyze(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    checkpoint_dir=None,
 ):
     end_page_id = (
         end_page_id
@@ -138,45 +151,66 @@ def doc_analyze(
     )
 
     MIN_BATCH_INFERENCE_SIZE = int(os.environ.get('MINERU_MIN_BATCH_INFERENCE_SIZE', 200))
-    images = []
+
+    # 已有有效checkpoint的页面不再推理
+    checkpoint = open_checkpoint(
+        checkpoint_dir, [dataset], [ocr],
+        layout_model=layout_model, formula_enable=formula_enable, table_enable=table_enable,
+    )
+    page_dicts = checkpoint.load() if checkpoint is not None else {}
+
+    page_ids = []
+    images_with_extra_info = []
     page_wh_list = []
+    blank_page_detector = BlankPageDetector.from_env()
     for index in range(len(dataset)):
-        if start_page_id <= index <= end_page_id:
+        if start_page_id <= index <= end_page_id and index not in page_dicts:
             page_data = dataset.get_page(index)
-            img_dict = page_data.get_image()
-            images.append(img_dict['img'])
+            with pipeline_stage('render', [index]):
+                img_dict = page_data.get_image()
+            if blank_page_detector is not None and blank_page_detector.is_blank(img_dict['img'], page_data):
+                # 空白页不推理，直接给出没有任何元素的页面结果
+                page_info = {'page_no': index, 'width': img_dict['width'], 'height': img_dict['height']}
+                page_dicts[index] = {'layout_dets': [], 'page_info': page_info}
+                continue
+            page_ids.append(index)
+            images_with_extra_info.append((img_dict['img'], ocr, dataset._lang))
             page_wh_list.append((img_dict['width'], img_dict['height']))
 
-    images_with_extra_info = [(images[index], ocr, dataset._lang) for index in range(len(images))]
+    if blank_page_detector is not None:
+        blank_page_detector.report(end_page_id - start_page_id + 1)
 
-    if len(images) >= MIN_BATCH_INFERENCE_SIZE:
+    if len(images_with_extra_info) >= MIN_BATCH_INFERENCE_SIZE:
         batch_size = MIN_BATCH_INFERENCE_SIZE
-        batch_images = [images_with_extra_info[i:i+batch_size] for i in range(0, len(images_with_extra_info), batch_size)]
     else:
-        batch_images = [images_with_extra_info]
-
-    results = []
-    for batch_image in batch_images:
-        result = may_batch_image_analyze(batch_image, ocr, show_log,layout_model, formula_enable, table_enable)
-        results.extend(result)
+        batch_size = max(1, len(images_with_extra_info))
+
+    for i in range(0, len(images_with_extra_info), batch_size):
+        batch_image = images_with_extra_info[i:i+batch_size]
+        batch_page_ids = page_ids[i:i+batch_size]
+        with pipeline_stage('batch_analyze', batch_page_ids):
+            result = batch_image_analyze(batch_image, ocr, show_log, layout_model, formula_enable, table_enable)
+        batch_page_dicts = []
+        for index, layout_dets, (page_width, page_height) in zip(batch_page_ids, result, page_wh_list[i:i+batch_size]):
+            page_info = {'page_no': index, 'width': page_width, 'height': page_height}
+            batch_page_dicts.append({'layout_dets': layout_dets, 'page_info': page_info})
+        page_dicts.update(zip(batch_page_ids, batch_page_dicts))
+        if checkpoint is not None:
+            checkpoint.save(batch_page_ids, batch_page_dicts)
 
     model_json = []
     for index in range(len(dataset)):
         if start_page_id <= index <= end_page_id:
-            result = results.pop(0)
-            page_width, page_height = page_wh_list.pop(0)
+            page_dict = page_dicts[index]
         else:
-            result = []
-            page_height = 0
-            page_width = 0
-
-        page_info = {'page_no': index, 'width': page_width, 'height': page_height}
-        page_dict = {'layout_dets': result, 'page_info': page_info}
+            page_info = {'page_no': index, 'width': 0, 'height': 0}
+            page_dict = {'layout_dets': [], 'page_info': page_info}
         model_json.append(page_dict)
 
     from magic_pdf.operators.models import InferenceResult
     return InferenceResult(model_json, dataset)
 
+@pipeline_stage('doc_analyze')
 def batch_doc_analyze(
     datasets: list[Dataset],
     parse_method: str = 'auto',
@@ -185,14 +219,14 @@ def batch_doc_analyze(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    devices: list[str] | None = None,
+    checkpoint_dir=None,
 ):
     MIN_BATCH_INFERENCE_SIZE = int(os.environ.get('MINERU_MIN_BATCH_INFERENCE_SIZE', 200))
     batch_size = MIN_BATCH_INFERENCE_SIZE
-    page_wh_list = []
 
-    images_with_extra_info = []
+    ocr_list = []
     for dataset in datasets:
-
         ocr = False
         if parse_method == 'auto':
             if dataset.classify() == SupportedPdfParseMethod.TXT:
@@ -203,39 +237,100 @@ def batch_doc_analyze(
             ocr = True
         elif parse_method == 'txt':
             ocr = False
+        ocr_list.append(ocr)
 
+    # 所有文档的页面按顺序编号，已有有效checkpoint的页面不再推理
+    checkpoint = open_checkpoint(
+        checkpoint_dir, datasets, ocr_list,
+        layout_model=layout_model, formula_enable=formula_enable, table_enable=table_enable,
+    )
+    page_dicts = checkpoint.load() if checkpoint is not None else {}
+
+    page_ids = []
+    page_info_list = []
+    images_with_extra_info = []
+    blank_page_detector = BlankPageDetector.from_env()
+    global_index = 0
+    for dataset, ocr in zip(datasets, ocr_list):
         _lang = dataset._lang
 
         for index in range(len(dataset)):
-            page_data = dataset.get_page(index)
-            img_dict = page_data.get_image()
-            page_wh_list.append((img_dict['width'], img_dict['height']))
-            images_with_extra_info.append((img_dict['img'], ocr, _lang))
-
+            if global_index not in page_dicts:
+                page_data = dataset.get_page(index)
+                with pipeline_stage('render', [index]):
+                    img_dict = page_data.get_image()
+                if blank_page_detector is not None and blank_page_detector.is_blank(img_dict['img'], page_data):
+                    page_info = {'page_no': index, 'width': img_dict['width'], 'height': img_dict['height']}
+                    page_dicts[global_index] = {'layout_dets': [], 'page_info': page_info}
+                    global_index += 1
+                    continue
+                page_ids.append(global_index)
+                page_info_list.append({'page_no': index, 'width': img_dict['width'], 'height': img_dict['height']})
+                images_with_extra_info.append((img_dict['img'], ocr, _lang))
+            global_index += 1
+
+    if blank_page_detector is not None:
+        blank_page_detector.report(global_index)
+
+    if devices is None:
+        devices = get_inference_devices()
+
+    if len(devices) > 1:
+        # 每个设备至少分到几个batch，空闲设备才有batch可以窃取
+        batch_size = max(1, min(batch_size, math.ceil(len(images_with_extra_info) / (len(devices) * 4))))
     batch_images = [images_with_extra_info[i:i+batch_size] for i in range(0, len(images_with_extra_info), batch_size)]
-    results = []
-    processed_images_count = 0
-    for index, batch_image in enumerate(batch_images):
-        processed_images_count += len(batch_image)
-        logger.info(f'Batch {index + 1}/{len(batch_images)}: {processed_images_count} pages/{len(images_with_extra_info)} pages')
-        result = may_batch_image_analyze(batch_image, True, show_log, layout_model, formula_enable, table_enable)
-        results.extend(result)
+
+    def on_batch_done(batch_index, result):
+        start = batch_index * batch_size
+        batch_page_ids = page_ids[start:start + len(result)]
+        batch_page_dicts = [
+            {'layout_dets': layout_dets, 'page_info': page_info}
+            for layout_dets, page_info in zip(result, page_info_list[start:start + len(result)])
+        ]
+        page_dicts.update(zip(batch_page_ids, batch_page_dicts))
+        if checkpoint is not None:
+            checkpoint.save(batch_page_ids, batch_page_dicts)
+
+    if len(devices) > 1:
+        scheduler = WorkStealingScheduler(devices)
+        scheduler.run(batch_images, show_log, layout_model, formula_enable, table_enable, on_batch_done=on_batch_done)
+    else:
+        processed_images_count = 0
+        for index, batch_image in enumerate(batch_images):
+            processed_images_count += len(batch_image)
+            logger.info(f'Batch {index + 1}/{len(batch_images)}: {processed_images_count} pages/{len(images_with_extra_info)} pages')
+            # 页码是页面在各自文档中的序号
+            batch_page_nos = [page_info['page_no'] for page_info in page_info_list[index * batch_size:index * batch_size + len(batch_image)]]
+            with pipeline_stage('batch_analyze', batch_page_nos):
+                result = batch_image_analyze(batch_image, True, show_log, layout_model, formula_enable, table_enable)
+            on_batch_done(index, result)
 
     infer_results = []
     from magic_pdf.operators.models import InferenceResult
-    for index in range(len(datasets)):
-        dataset = datasets[index]
+    global_index = 0
+    for dataset in datasets:
         model_json = []
         for i in range(len(dataset)):
-            result = results.pop(0)
-            page_width, page_height = page_wh_list.pop(0)
-            page_info = {'page_no': i, 'width': page_width, 'height': page_height}
-            page_dict = {'layout_dets': result, 'page_info': page_info}
-            model_json.append(page_dict)
+            model_json.append(page_dicts[global_index])
+            global_index += 1
         infer_results.append(InferenceResult(model_json, dataset))
     return infer_results
 
 
+def batch_image_analyze(
+        images_with_extra_info: list[(np.ndarray, bool, str)],
+        ocr: bool,
+        show_log: bool = False,
+        layout_model=None,
+        formula_enable=None,
+        table_enable=None):
+    """开启MINERU_INFERENCE_BROKER时，页面交给进程内的InferenceBroker与其他线程的页面合并推理."""
+    broker = get_inference_broker()
+    if broker is None:
+        return may_batch_image_analyze(images_with_extra_info, ocr, show_log, layout_model, formula_enable, table_enable)
+    return broker.analyze(images_with_extra_info, show_log, layout_model, formula_enable, table_enable)
+
+
 def may_batch_image_analyze(
         images_with_extra_info: list[(np.ndarray, bool, str)],
         ocr: bool,
@@ -281,11 +376,15 @@ def may_batch_image_analyze(
 
     # doc_analyze_start = time.time()
 
+    # 显存清理后仍然紧张时减小batch
+    memory_governor = get_memory_governor()
+    batch_ratio = memory_governor.scale_batch_ratio(batch_ratio)
+
     batch_model = BatchAnalyze(model_manager, batch_ratio, show_log, layout_model, formula_enable, table_enable)
     results = batch_model(images_with_extra_info)
 
     # gc_start = time.time()
-    clean_memory(get_device())
+    memory_governor.maybe_clean(device)
     # gc_time = round(time.time() - gc_start, 2)
     # logger.debug(f'gc time: {gc_time}')
 
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from loguru import logger
+
+
+def _analyze_batch(batch, show_log, layout_model, formula_enable, table_enable):
+    from magic_pdf.model.doc_analyze_by_custom_model import \
+        may_batch_image_analyze
+    return may_batch_image_analyze(batch, True, show_log, layout_model, formula_enable, table_enable)
+
+
+class _Request:
+    __slots__ = ('pages', 'args', 'future', 'results', 'remaining', 'arrival')
+
+    def __init__(self, pages: list, args: tuple):
+        self.pages = pages
+        self.args = args
+        self.future = Future()
+        self.results = [None] * len(pages)
+        # 尚未分配到batch的页面的起始位置
+        self.remaining = 0
+        self.arrival = time.monotonic()
+
+
+class InferenceBroker:
+    """进程内的动态batch代理.
+
+    多个线程(例如web服务中并发的请求)提交的页面先进入队列，调度线程把模型参数相同的页面合并成一个batch，
+    交给BatchAnalyze推理(它再按layout、MFD、MFR、OCR等阶段分别成批)，结果按页面送回各自调用方的future。
+    队列中的页面达到max_batch_pages，或者最早的请求已经等待了max_wait秒时立即推理；
+    一个请求的页面可以被拆到多个batch中。batch推理都在调度线程中串行执行。
+    各请求的pdf_parse_union仍在自己的线程中并发运行，其中用到的OCR和layoutreader模型各自加锁，
+    与调度线程中的推理互斥。
+    """
+
+    def __init__(self, analyze_fn: Callable = _analyze_batch, max_batch_pages: int | None = None,
+                 max_wait: float | None = None):
+        """Initialized method.
+
+        Args:
+            analyze_fn (Callable, optional): invoked as analyze_fn(batch, *args), must return one result per page.
+            max_batch_pages (int, optional): the max number of pages in one batch, read from
+                MINERU_BROKER_BATCH_PAGES if None, which defaults to MINERU_MIN_BATCH_INFERENCE_SIZE (200).
+                Defaults to None.
+            max_wait (float, optional): the max seconds a request waits for other requests to fill the batch,
+                read from MINERU_BROKER_WAIT_MS if None, which defaults to 50ms. Defaults to None.
+        """
+        if max_batch_pages is None:
+            max_batch_pages = int(os.getenv('MINERU_BROKER_BATCH_PAGES',
+                                            os.getenv('MINERU_MIN_BATCH_INFERENCE_SIZE', 200)))
+        if max_wait is None:
+            max_wait = float(os.getenv('MINERU_BROKER_WAIT_MS', 50)) / 1000
+        self.analyze_fn = analyze_fn
+        self.max_batch_pages = max(1, max_batch_pages)
+        self.max_wait = max_wait
+        self.batch_count = 0
+        self.page_count = 0
+        self._pending: list[_Request] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='mineru-inference-broker', daemon=True)
+        self._thread.start()
+
+    def submit(self, pages: list, *args) -> Future:
+        """Submit the pages of one caller.
+
+        Args:
+            pages (list): the (image, ocr, lang) of each page, same as may_batch_image_analyze
+            *args: the model arguments, only pages with equal args are batched together
+
+        Returns:
+            Future: the future of the results, one per page
+        """
+        request = _Request(pages, args)
+        if not pages:
+            request.future.set_result([])
+            return request.future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('the inference broker is closed')
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request.future
+
+    def analyze(self, pages: list, *args) -> list:
+        """Submit the pages and wait for the results."""
+        return self.submit(pages, *args).result()
+
+    def _queued_pages(self, args) -> int:
+        return sum(len(r.pages) - r.remaining for r in self._pending if r.args == args)
+
+    def _take_batch(self) -> tuple[tuple, list]:
+        """在持有锁时调用，按到达顺序取出与最早请求参数相同的页面."""
+        args = self._pending[0].args
+        parts = []
+        size = 0
+        for request in list(self._pending):
+            if request.args != args:
+                continue
+            count = min(len(request.pages) - request.remaining, self.max_batch_pages - size)
+            parts.append((request, request.remaining, count))
+            request.remaining += count
+            size += count
+            if request.remaining == len(request.pages):
+                self._pending.remove(request)
+            if size == self.max_batch_pages:
+                break
+        return args, parts
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # 等待更多页面直到batch填满或者最早的请求到达期限
+                deadline = self._pending[0].arrival + self.max_wait
+                while not self._closed and self._queued_pages(self._pending[0].args) < self.max_batch_pages:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                args, parts = self._take_batch()
+
+            batch = [page for request, start, count in parts for page in request.pages[start:start + count]]
+            try:
+                results = self.analyze_fn(batch, *args)
+            except BaseException as e:
+                for request, _, _ in parts:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                with self._cond:
+                    # 出错的请求剩余的页面不再推理
+                    self._pending = [r for r in self._pending if not r.future.done()]
+                continue
+
+            self.batch_count += 1
+            self.page_count += len(batch)
+            logger.debug(f'inference broker batch {self.batch_count}: {len(batch)} pages from {len(parts)} requests')
+            offset = 0
+            for request, start, count in parts:
+                request.results[start:start + count] = results[offset:offset + count]
+                offset += count
+                if start + count == len(request.pages) and not request.future.done():
+                    request.future.set_result(request.results)
+
+    def close(self):
+        """Process the queued pages and stop the dispatcher thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_inference_broker() -> InferenceBroker | None:
+    """The process-wide broker, enabled by MINERU_INFERENCE_BROKER=1, None if disabled."""
+    global _broker
+    if os.getenv('MINERU_INFERENCE_BROKER', '0') != '1':
+        return None
+    with _broker_lock:
+        if _broker is None:
+            _broker = InferenceBroker()
+        return _broker
@@ -1,5 +1,8 @@
+import bisect
 import enum
 
+import numpy as np
+
 from magic_pdf.config.model_block_type import ModelBlockTypeEnum
 from magic_pdf.config.ocr_content_type import CategoryId, ContentType
 from magic_pdf.data.dataset import Dataset
@@ -20,99 +23,147 @@ class PosRelationEnum(enum.Enum):
     ALL = 'all'
 
 
+class PageLayoutIndex:
+    """单页layout_dets的列式索引.
+
+    bbox和score保存为numpy数组，并按category_id记录行号(行号即在layout_dets中的下标，按升序排列)，
+    MagicModel的各个访问函数和修正逻辑按类别取行，不再反复遍历整页的layout_dets。
+    """
+
+    def __init__(self, layout_dets: list):
+        self.layout_dets = layout_dets
+        self.bboxes = np.array(
+            [layout_det.get('bbox') for layout_det in layout_dets], dtype=np.float64
+        ).reshape(-1, 4)
+        self.scores = np.array(
+            [layout_det.get('score') for layout_det in layout_dets], dtype=np.float64
+        )
+        self.rows_by_category = {}
+        for row, layout_det in enumerate(layout_dets):
+            self.rows_by_category.setdefault(layout_det.get('category_id', -1), []).append(row)
+
+    def rows(self, *category_ids) -> list:
+        """指定类别的行号，按在layout_dets中的顺序."""
+        if len(category_ids) == 1:
+            return self.rows_by_category.get(category_ids[0], [])
+        rows = []
+        for category_id in set(category_ids):
+            rows.extend(self.rows_by_category.get(category_id, []))
+        return sorted(rows)
+
+    def dets(self, *category_ids) -> list:
+        return [self.layout_dets[row] for row in self.rows(*category_ids)]
+
+    def set_category(self, row: int, category_id):
+        layout_det = self.layout_dets[row]
+        self.rows_by_category[layout_det.get('category_id', -1)].remove(row)
+        bisect.insort(self.rows_by_category.setdefault(category_id, []), row)
+        layout_det['category_id'] = category_id
+
+    def iou_matrix(self, rows: list) -> np.ndarray:
+        """指定行两两之间的iou，计算方式与calculate_iou一致."""
+        bboxes = self.bboxes[rows]
+        x_left = np.maximum(bboxes[:, None, 0], bboxes[None, :, 0])
+        y_top = np.maximum(bboxes[:, None, 1], bboxes[None, :, 1])
+        x_right = np.minimum(bboxes[:, None, 2], bboxes[None, :, 2])
+        y_bottom = np.minimum(bboxes[:, None, 3], bboxes[None, :, 3])
+        intersection_area = (x_right - x_left) * (y_bottom - y_top)
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iou = intersection_area / (areas[:, None] + areas[None, :] - intersection_area)
+        iou[(x_right < x_left) | (y_bottom < y_top)] = 0.0
+        iou[(areas[:, None] == 0) | (areas[None, :] == 0)] = 0.0
+        return iou
+
+
 class MagicModel:
     """每个函数没有得到元素的时候返回空list."""
 
-    def __fix_axis(self):
-        for model_page_info in self.__model_list:
-            need_remove_list = []
-            page_no = model_page_info['page_info']['page_no']
-            horizontal_scale_ratio, vertical_scale_ratio = get_scale_ratio(
-                model_page_info, self.__docs.get_page(page_no)
-            )
-            layout_dets = model_page_info['layout_dets']
-            for layout_det in layout_dets:
-
-                if layout_det.get('bbox') is not None:
-                    # 兼容直接输出bbox的模型数据,如paddle
-                    x0, y0, x1, y1 = layout_det['bbox']
-                else:
-                    # 兼容直接输出poly的模型数据，如xxx
-                    x0, y0, _, _, x1, y1, _, _ = layout_det['poly']
-
-                bbox = [
-                    int(x0 / horizontal_scale_ratio),
-                    int(y0 / vertical_scale_ratio),
-                    int(x1 / horizontal_scale_ratio),
-                    int(y1 / vertical_scale_ratio),
-                ]
-                layout_det['bbox'] = bbox
-                # 删除高度或者宽度小于等于0的spans
-                if bbox[2] - bbox[0] <= 0 or bbox[3] - bbox[1] <= 0:
-                    need_remove_list.append(layout_det)
-            for need_remove in need_remove_list:
-                layout_dets.remove(need_remove)
-
-    def __fix_by_remove_low_confidence(self):
-        for model_page_info in self.__model_list:
-            need_remove_list = []
-            layout_dets = model_page_info['layout_dets']
-            for layout_det in layout_dets:
-                if layout_det['score'] <= 0.05:
-                    need_remove_list.append(layout_det)
-                else:
-                    continue
-            for need_remove in need_remove_list:
-                layout_dets.remove(need_remove)
-
-    def __fix_by_remove_high_iou_and_low_confidence(self):
-        for model_page_info in self.__model_list:
-            need_remove_list = []
-            layout_dets = model_page_info['layout_dets']
-            for layout_det1 in layout_dets:
-                for layout_det2 in layout_dets:
-                    if layout_det1 == layout_det2:
-                        continue
-                    if layout_det1['category_id'] in [
-                        0,
-                        1,
-                        2,
-                        3,
-                        4,
-                        5,
-                        6,
-                        7,
-                        8,
-                        9,
-                    ] and layout_det2['category_id'] in [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]:
-                        if (
-                            calculate_iou(layout_det1['bbox'], layout_det2['bbox'])
-                            > 0.9
-                        ):
-                            if layout_det1['score'] < layout_det2['score']:
-                                layout_det_need_remove = layout_det1
-                            else:
-                                layout_det_need_remove = layout_det2
+    def __fix_axis(self, model_page_info):
+        page_no = model_page_info['page_info']['page_no']
+        horizontal_scale_ratio, vertical_scale_ratio = get_scale_ratio(
+            model_page_info, self.__docs.get_page(page_no)
+        )
+        layout_dets = model_page_info['layout_dets']
+        for layout_det in layout_dets:
 
-                            if layout_det_need_remove not in need_remove_list:
-                                need_remove_list.append(layout_det_need_remove)
-                        else:
-                            continue
-                    else:
-                        continue
-            for need_remove in need_remove_list:
-                layout_dets.remove(need_remove)
+            if layout_det.get('bbox') is not None:
+                # 兼容直接输出bbox的模型数据,如paddle
+                x0, y0, x1, y1 = layout_det['bbox']
+            else:
+                # 兼容直接输出poly的模型数据，如xxx
+                x0, y0, _, _, x1, y1, _, _ = layout_det['poly']
+
+            bbox = [
+                int(x0 / horizontal_scale_ratio),
+                int(y0 / vertical_scale_ratio),
+                int(x1 / horizontal_scale_ratio),
+                int(y1 / vertical_scale_ratio),
+            ]
+            layout_det['bbox'] = bbox
+        # 删除高度或者宽度小于等于0的spans
+        layout_dets[:] = [
+            layout_det for layout_det in layout_dets
+            if layout_det['bbox'][2] - layout_det['bbox'][0] > 0 and layout_det['bbox'][3] - layout_det['bbox'][1] > 0
+        ]
+
+    def __fix_by_remove_low_confidence(self, model_page_info):
+        layout_dets = model_page_info['layout_dets']
+        layout_dets[:] = [layout_det for layout_det in layout_dets if layout_det['score'] > 0.05]
+
+    def __fix_by_remove_high_iou_and_low_confidence(self, page_index: PageLayoutIndex) -> PageLayoutIndex:
+        # 只在0-9类的layout之间比较
+        rows = page_index.rows(*range(10))
+        if len(rows) < 2:
+            return page_index
+        layout_dets = page_index.layout_dets
+        need_remove_list = []
+        iou = page_index.iou_matrix(rows)
+        for i, j in zip(*np.nonzero(iou > 0.9)):
+            layout_det1 = layout_dets[rows[i]]
+            layout_det2 = layout_dets[rows[j]]
+            if layout_det1 == layout_det2:
+                continue
+            if layout_det1['score'] < layout_det2['score']:
+                layout_det_need_remove = layout_det1
+            else:
+                layout_det_need_remove = layout_det2
+
+            if layout_det_need_remove not in need_remove_list:
+                need_remove_list.append(layout_det_need_remove)
+        if len(need_remove_list) == 0:
+            return page_index
+
+        # 和list.remove一样，每项只删除第一个相等的layout
+        removed_rows = set()
+        for need_remove in need_remove_list:
+            for row in rows:
+                if row not in removed_rows and layout_dets[row] == need_remove:
+                    removed_rows.add(row)
+                    break
+        layout_dets[:] = [
+            layout_det for row, layout_det in enumerate(layout_dets) if row not in removed_rows
+        ]
+        return PageLayoutIndex(layout_dets)
 
     def __init__(self, model_list: list, docs: Dataset):
         self.__model_list = model_list
         self.__docs = docs
-        """为所有模型数据添加bbox信息(缩放，poly->bbox)"""
-        self.__fix_axis()
-        """删除置信度特别低的模型数据(<0.05),提高质量"""
-        self.__fix_by_remove_low_confidence()
-        """删除高iou(>0.9)数据中置信度较低的那个"""
-        self.__fix_by_remove_high_iou_and_low_confidence()
-        self.__fix_footnote()
+        self.__page_indexes = []
+        self.__page_idx_by_page_no = {}
+        for page_idx, model_page_info in enumerate(self.__model_list):
+            """为所有模型数据添加bbox信息(缩放，poly->bbox)"""
+            self.__fix_axis(model_page_info)
+            """删除置信度特别低的模型数据(<0.05),提高质量"""
+            self.__fix_by_remove_low_confidence(model_page_info)
+            """删除高iou(>0.9)数据中置信度较低的那个"""
+            page_index = self.__fix_by_remove_high_iou_and_low_confidence(
+                PageLayoutIndex(model_page_info['layout_dets'])
+            )
+            self.__fix_footnote(page_index)
+            self.__page_indexes.append(page_index)
+            page_no = model_page_info.get('page_info', {}).get('page_no', -1)
+            self.__page_idx_by_page_no.setdefault(page_no, []).append(page_idx)
 
     def _bbox_distance(self, bbox1, bbox2):
         left, right, bottom, top = bbox_relative_pos(bbox1, bbox2)
@@ -132,67 +183,57 @@ class MagicModel:
 
         return bbox_distance(bbox1, bbox2)
 
-    def __fix_footnote(self):
+    def __fix_footnote(self, page_index: PageLayoutIndex):
         # 3: figure, 5: table, 7: footnote
-        for model_page_info in self.__model_list:
-            footnotes = []
-            figures = []
-            tables = []
-
-            for obj in model_page_info['layout_dets']:
-                if obj['category_id'] == 7:
-                    footnotes.append(obj)
-                elif obj['category_id'] == 3:
-                    figures.append(obj)
-                elif obj['category_id'] == 5:
-                    tables.append(obj)
-                if len(footnotes) * len(figures) == 0:
-                    continue
-            dis_figure_footnote = {}
-            dis_table_footnote = {}
-
-            for i in range(len(footnotes)):
-                for j in range(len(figures)):
-                    pos_flag_count = sum(
-                        list(
-                            map(
-                                lambda x: 1 if x else 0,
-                                bbox_relative_pos(
-                                    footnotes[i]['bbox'], figures[j]['bbox']
-                                ),
-                            )
+        footnote_rows = list(page_index.rows(7))
+        footnotes = [page_index.layout_dets[row] for row in footnote_rows]
+        figures = page_index.dets(3)
+        tables = page_index.dets(5)
+        dis_figure_footnote = {}
+        dis_table_footnote = {}
+
+        for i in range(len(footnotes)):
+            for j in range(len(figures)):
+                pos_flag_count = sum(
+                    list(
+                        map(
+                            lambda x: 1 if x else 0,
+                            bbox_relative_pos(
+                                footnotes[i]['bbox'], figures[j]['bbox']
+                            ),
                         )
                     )
-                    if pos_flag_count > 1:
-                        continue
-                    dis_figure_footnote[i] = min(
-                        self._bbox_distance(figures[j]['bbox'], footnotes[i]['bbox']),
-                        dis_figure_footnote.get(i, float('inf')),
-                    )
-            for i in range(len(footnotes)):
-                for j in range(len(tables)):
-                    pos_flag_count = sum(
-                        list(
-                            map(
-                                lambda x: 1 if x else 0,
-                                bbox_relative_pos(
-                                    footnotes[i]['bbox'], tables[j]['bbox']
-                                ),
-                            )
+                )
+                if pos_flag_count > 1:
+                    continue
+                dis_figure_footnote[i] = min(
+                    self._bbox_distance(figures[j]['bbox'], footnotes[i]['bbox']),
+                    dis_figure_footnote.get(i, float('inf')),
+                )
+        for i in range(len(footnotes)):
+            for j in range(len(tables)):
+                pos_flag_count = sum(
+                    list(
+                        map(
+                            lambda x: 1 if x else 0,
+                            bbox_relative_pos(
+                                footnotes[i]['bbox'], tables[j]['bbox']
+                            ),
                         )
                     )
-                    if pos_flag_count > 1:
-                        continue
-
-                    dis_table_footnote[i] = min(
-                        self._bbox_distance(tables[j]['bbox'], footnotes[i]['bbox']),
-                        dis_table_footnote.get(i, float('inf')),
-                    )
-            for i in range(len(footnotes)):
-                if i not in dis_figure_footnote:
+                )
+                if pos_flag_count > 1:
                     continue
-                if dis_table_footnote.get(i, float('inf')) > dis_figure_footnote[i]:
-                    footnotes[i]['category_id'] = CategoryId.ImageFootnote
+
+                dis_table_footnote[i] = min(
+                    self._bbox_distance(tables[j]['bbox'], footnotes[i]['bbox']),
+                    dis_table_footnote.get(i, float('inf')),
+                )
+        for i in range(len(footnotes)):
+            if i not in dis_figure_footnote:
+                continue
+            if dis_table_footnote.get(i, float('inf')) > dis_figure_footnote[i]:
+                page_index.set_category(footnote_rows[i], CategoryId.ImageFootnote)
 
     def __reduct_overlap(self, bboxes):
         N = len(bboxes)
@@ -225,27 +266,17 @@ class MagicModel:
         """
         AXIS_MULPLICITY = 0.5
         subjects = self.__reduct_overlap(
-            list(
-                map(
-                    lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == subject_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
-                )
-            )
+            [
+                {'bbox': x['bbox'], 'score': x['score']}
+                for x in self.__page_indexes[page_no].dets(subject_category_id)
+            ]
         )
 
         objects = self.__reduct_overlap(
-            list(
-                map(
-                    lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == object_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
-                )
-            )
+            [
+                {'bbox': x['bbox'], 'score': x['score']}
+                for x in self.__page_indexes[page_no].dets(object_category_id)
+            ]
         )
         M = len(objects)
 
@@ -459,26 +490,16 @@ class MagicModel:
         priority_pos: PosRelationEnum,
     ):
         subjects = self.__reduct_overlap(
-            list(
-                map(
-                    lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == subject_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
-                )
-            )
+            [
+                {'bbox': x['bbox'], 'score': x['score']}
+                for x in self.__page_indexes[page_no].dets(subject_category_id)
+            ]
         )
         objects = self.__reduct_overlap(
-            list(
-                map(
-                    lambda x: {'bbox': x['bbox'], 'score': x['score']},
-                    filter(
-                        lambda x: x['category_id'] == object_category_id,
-                        self.__model_list[page_no]['layout_dets'],
-                    ),
-                )
-            )
+            [
+                {'bbox': x['bbox'], 'score': x['score']}
+                for x in self.__page_indexes[page_no].dets(object_category_id)
+            ]
         )
 
         ret = []
@@ -678,29 +699,30 @@ class MagicModel:
 
     def get_ocr_text(self, page_no: int) -> list:  # paddle 搞的，有字也有坐标
         text_spans = []
-        model_page_info = self.__model_list[page_no]
-        layout_dets = model_page_info['layout_dets']
-        for layout_det in layout_dets:
-            if layout_det['category_id'] == '15':
-                span = {
-                    'bbox': layout_det['bbox'],
-                    'content': layout_det['text'],
-                }
-                text_spans.append(span)
+        for layout_det in self.__page_indexes[page_no].dets('15'):
+            span = {
+                'bbox': layout_det['bbox'],
+                'content': layout_det['text'],
+            }
+            text_spans.append(span)
         return text_spans
 
     def get_all_spans(self, page_no: int) -> list:
 
         def remove_duplicate_spans(spans):
+            # 用span的内容作为key去重，避免逐个比较
             new_spans = []
+            seen = set()
             for span in spans:
-                if not any(span == existing_span for existing_span in new_spans):
+                key = tuple(sorted(
+                    (k, tuple(v) if isinstance(v, list) else v) for k, v in span.items()
+                ))
+                if key not in seen:
+                    seen.add(key)
                     new_spans.append(span)
             return new_spans
 
         all_spans = []
-        model_page_info = self.__model_list[page_no]
-        layout_dets = model_page_info['layout_dets']
         allow_category_id_list = [3, 5, 13, 14, 15]
         """当成span拼接的"""
         #  3: 'image', # 图片
@@ -708,31 +730,30 @@ class MagicModel:
         #  13: 'inline_equation',     # 行内公式
         #  14: 'interline_equation',      # 行间公式
         #  15: 'text',      # ocr识别文本
-        for layout_det in layout_dets:
+        for layout_det in self.__page_indexes[page_no].dets(*allow_category_id_list):
             category_id = layout_det['category_id']
-            if category_id in allow_category_id_list:
-                span = {'bbox': layout_det['bbox'], 'score': layout_det['score']}
-                if category_id == 3:
-                    span['type'] = ContentType.Image
-                elif category_id == 5:
-                    # 获取table模型结果
-                    latex = layout_det.get('latex', None)
-                    html = layout_det.get('html', None)
-                    if latex:
-                        span['latex'] = latex
-                    elif html:
-                        span['html'] = html
-                    span['type'] = ContentType.Table
-                elif category_id == 13:
-                    span['content'] = layout_det['latex']
-                    span['type'] = ContentType.InlineEquation
-                elif category_id == 14:
-                    span['content'] = layout_det['latex']
-                    span['type'] = ContentType.InterlineEquation
-                elif category_id == 15:
-                    span['content'] = layout_det['text']
-                    span['type'] = ContentType.Text
-                all_spans.append(span)
+            span = {'bbox': layout_det['bbox'], 'score': layout_det['score']}
+            if category_id == 3:
+                span['type'] = ContentType.Image
+            elif category_id == 5:
+                # 获取table模型结果
+                latex = layout_det.get('latex', None)
+                html = layout_det.get('html', None)
+                if latex:
+                    span['latex'] = latex
+                elif html:
+                    span['html'] = html
+                span['type'] = ContentType.Table
+            elif category_id == 13:
+                span['content'] = layout_det['latex']
+                span['type'] = ContentType.InlineEquation
+            elif category_id == 14:
+                span['content'] = layout_det['latex']
+                span['type'] = ContentType.InterlineEquation
+            elif category_id == 15:
+                span['content'] = layout_det['text']
+                span['type'] = ContentType.Text
+            all_spans.append(span)
         return remove_duplicate_spans(all_spans)
 
     def get_page_size(self, page_no: int):  # 获取页面宽高
@@ -747,24 +768,15 @@ class MagicModel:
         self, type: int, page_no: int, extra_col: list[str] = []
     ) -> list:
         blocks = []
-        for page_dict in self.__model_list:
-            layout_dets = page_dict.get('layout_dets', [])
-            page_info = page_dict.get('page_info', {})
-            page_number = page_info.get('page_no', -1)
-            if page_no != page_number:
-                continue
-            for item in layout_dets:
-                category_id = item.get('category_id', -1)
-                bbox = item.get('bbox', None)
-
-                if category_id == type:
-                    block = {
-                        'bbox': bbox,
-                        'score': item.get('score'),
-                    }
-                    for col in extra_col:
-                        block[col] = item.get(col, None)
-                    blocks.append(block)
+        for page_idx in self.__page_idx_by_page_no.get(page_no, []):
+            for item in self.__page_indexes[page_idx].dets(type):
+                block = {
+                    'bbox': item.get('bbox', None),
+                    'score': item.get('score'),
+                }
+                for col in extra_col:
+                    block[col] = item.get(col, None)
+                blocks.append(block)
         return blocks
 
     def get_model_list(self, page_no):
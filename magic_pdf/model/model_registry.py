@@ -0,0 +1,207 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable
+
+from loguru import logger
+
+
+def get_model_cache_limits():
+    """读取模型缓存的预算.
+
+    MINERU_MODEL_CACHE_MAX_COUNT: 最多缓存的模型数量，未设置或<=0表示不限制
+    MINERU_MODEL_CACHE_MAX_MEMORY: 模型权重占用上限(GB)，未设置或<=0表示不限制
+
+    Returns:
+        tuple[int | None, float | None]: (max_models, max_memory_bytes)
+    """
+    max_models = int(os.environ.get('MINERU_MODEL_CACHE_MAX_COUNT', 0))
+    max_memory = float(os.environ.get('MINERU_MODEL_CACHE_MAX_MEMORY', 0))
+    return (
+        max_models if max_models > 0 else None,
+        max_memory * (1024 ** 3) if max_memory > 0 else None,
+    )
+
+
+def estimate_model_memory(model, max_depth=3) -> int:
+    """估算模型持有的torch参数和buffer字节数.
+
+    只沿对象属性向下查找max_depth层，避免把通过引用共享的其它模型(例如表格模型里的ocr引擎)重复计入。
+    """
+    try:
+        import torch
+    except ImportError:
+        return 0
+
+    seen_objs = set()
+    seen_tensors = set()
+    total = 0
+
+    def visit(obj, depth):
+        nonlocal total
+        if depth > max_depth or id(obj) in seen_objs:
+            return
+        seen_objs.add(id(obj))
+        if isinstance(obj, torch.nn.Module):
+            for tensor in list(obj.parameters()) + list(obj.buffers()):
+                if id(tensor) not in seen_tensors:
+                    seen_tensors.add(id(tensor))
+                    total += tensor.numel() * tensor.element_size()
+            return
+        if isinstance(obj, dict):
+            children = obj.values()
+        elif isinstance(obj, (list, tuple)):
+            children = obj
+        elif hasattr(obj, '__dict__'):
+            children = vars(obj).values()
+        else:
+            return
+        for child in children:
+            visit(child, depth + 1)
+
+    visit(model, 0)
+    return total
+
+
+class ModelRegistry:
+    """有容量上限的LRU模型缓存.
+
+    超出数量或显存/内存预算时，淘汰最久未使用且未被固定(pinned)的模型。
+    常驻模型(layout、mfd等)在创建时固定，永远不会被淘汰。
+    引用了其它缓存模型的模型(例如持有ocr引擎的表格模型)在创建时声明依赖，被依赖的模型淘汰时一并淘汰，
+    否则残留的引用会让被淘汰的模型留在内存中，再次使用时又加载一份。
+    """
+
+    def __init__(self, name: str, max_models: int | None = None, max_memory: float | None = None):
+        """Initialized method.
+
+        Args:
+            name (str): the name used in logs
+            max_models (int | None, optional): the max number of cached models. Defaults to None, means no limit.
+            max_memory (float | None, optional): the max estimated bytes of cached models. Defaults to None, means no limit.
+        """
+        self.name = name
+        self.max_models = max_models
+        self.max_memory = max_memory
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._pinned = set()
+        self._dependents = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable, pinned: bool = False,
+                      depends_on: Iterable[Hashable] | Callable[[Any], Iterable[Hashable]] = ()):
+        """Get the cached model of key, create it by factory if missing.
+
+        Args:
+            key (Hashable): the cache key
+            factory (Callable): invoked without arguments to build the model on cache miss
+            pinned (bool, optional): pinned models are never evicted. Defaults to False.
+            depends_on (Iterable[Hashable] | Callable, optional): the keys of the cached models referenced by the
+                new model, it is evicted together with any of them. A callable is invoked with the new model to
+                find the keys of the models it actually holds. Defaults to ().
+
+        Returns:
+            Any: the cached model
+        """
+        with self._lock:
+            if key in self._models:
+                self.hits += 1
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            self.misses += 1
+            model = factory()
+            self._models[key] = model
+            self._sizes[key] = estimate_model_memory(model) if self.max_memory is not None else 0
+            if pinned:
+                self._pinned.add(key)
+            if callable(depends_on):
+                depends_on = depends_on(model)
+            for dependency in depends_on:
+                if dependency in self._models:
+                    self._dependents.setdefault(dependency, set()).add(key)
+            self._evict(keep=key)
+            return model
+
+    def find(self, model) -> Hashable | None:
+        """The key of a cached model, None if it is not cached."""
+        with self._lock:
+            return next((k for k, v in self._models.items() if v is model), None)
+
+    def _over_budget(self) -> bool:
+        if self.max_models is not None and len(self._models) > self.max_models:
+            return True
+        if self.max_memory is not None and sum(self._sizes.values()) > self.max_memory:
+            return True
+        return False
+
+    def _remove(self, key: Hashable):
+        if key not in self._models:
+            return
+        del self._models[key]
+        del self._sizes[key]
+        self._pinned.discard(key)
+        self.evictions += 1
+        logger.info(f'{self.name} registry evict model: {key}')
+        for dependents in self._dependents.values():
+            dependents.discard(key)
+        for dependent in self._dependents.pop(key, ()):
+            self._remove(dependent)
+
+    def _evict(self, keep: Hashable):
+        # 新模型依赖的模型不能淘汰，否则新模型会被连带淘汰
+        protected = {keep} | {k for k, dependents in self._dependents.items() if keep in dependents}
+        evicted = False
+        while self._over_budget():
+            victim = next(
+                (k for k in self._models if k not in self._pinned and k not in protected),
+                None,
+            )
+            if victim is None:
+                break
+            self._remove(victim)
+            evicted = True
+        if evicted:
+            # 被淘汰模型的显存块会留在torch的缓存分配器中，供下一个加载的模型复用
+            gc.collect()
+
+    def pin(self, key: Hashable):
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: Hashable):
+        with self._lock:
+            self._pinned.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+            self._pinned.clear()
+            self._dependents.clear()
+
+    def stats(self) -> dict:
+        """Get the counters of registry.
+
+        Returns:
+            dict: hits, misses, evictions, the number of cached models and the estimated memory in bytes
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'models': len(self._models),
+                'memory': sum(self._sizes.values()),
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
@@ -141,28 +141,38 @@ class CustomPEKModel:
                 ),
                 device=self.device,
             )
-        # 初始化ocr
-        self.ocr_model = atom_model_manager.get_atom_model(
+        # ocr和表格模型可能被AtomModelSingleton淘汰，这里只保存参数，每次使用时重新获取，不持有模型的引用
+        self._ocr_model_kwargs = dict(
             atom_model_name=AtomicModel.OCR,
             ocr_show_log=show_log,
             det_db_box_thresh=0.3,
             lang=self.lang
         )
+        # 初始化ocr
+        atom_model_manager.get_atom_model(**self._ocr_model_kwargs)
         # init table model
         if self.apply_table:
             table_model_dir = self.configs['weights'][self.table_model_name]
-            self.table_model = atom_model_manager.get_atom_model(
+            self._table_model_kwargs = dict(
                 atom_model_name=AtomicModel.Table,
                 table_model_name=self.table_model_name,
                 table_model_path=str(os.path.join(models_dir, table_model_dir)),
                 table_max_time=self.table_max_time,
                 device=self.device,
-                ocr_engine=self.ocr_model,
                 table_sub_model_name=self.table_sub_model_name
             )
+            atom_model_manager.get_atom_model(ocr_engine=self.ocr_model, **self._table_model_kwargs)
 
         logger.info('DocAnalysis init done!')
 
+    @property
+    def ocr_model(self):
+        return AtomModelSingleton().get_atom_model(**self._ocr_model_kwargs)
+
+    @property
+    def table_model(self):
+        return AtomModelSingleton().get_atom_model(ocr_engine=self.ocr_model, **self._table_model_kwargs)
+
     def __call__(self, image):
         # layout检测
         layout_start = time.time()
@@ -199,6 +209,7 @@ class CustomPEKModel:
 
         # ocr识别
         ocr_start = time.time()
+        ocr_model = self.ocr_model
         # Process each area that requires OCR processing
         for res in ocr_res_list:
             new_image, useful_list = crop_img(res, image, crop_paste_x=50, crop_paste_y=50)
@@ -208,9 +219,9 @@ class CustomPEKModel:
             new_image = cv2.cvtColor(new_image, cv2.COLOR_RGB2BGR)
 
             if self.apply_ocr:
-                ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res)[0]
+                ocr_res = ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res)[0]
             else:
-                ocr_res = self.ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
+                ocr_res = ocr_model.ocr(new_image, mfd_res=adjusted_mfdetrec_res, rec=False)[0]
 
             # Integration results
             if ocr_res:
@@ -226,19 +237,20 @@ class CustomPEKModel:
         # 表格识别 table recognition
         if self.apply_table:
             table_start = time.time()
+            table_model = self.table_model
             for res in table_res_list:
                 new_image, _ = crop_img(res, image)
                 single_table_start_time = time.time()
                 html_code = None
                 if self.table_model_name == MODEL_NAME.STRUCT_EQTABLE:
                     with torch.no_grad():
-                        table_result = self.table_model.predict(new_image, 'html')
+                        table_result = table_model.predict(new_image, 'html')
                         if len(table_result) > 0:
                             html_code = table_result[0]
                 elif self.table_model_name == MODEL_NAME.TABLE_MASTER:
-                    html_code = self.table_model.img2html(new_image)
+                    html_code = table_model.img2html(new_image)
                 elif self.table_model_name == MODEL_NAME.RAPID_TABLE:
-                    html_code, table_cell_bboxes, logic_points, elapse = self.table_model.predict(
+                    html_code, table_cell_bboxes, logic_points, elapse = table_model.predict(
                         new_image
                     )
                 run_time = time.time() - single_table_start_time
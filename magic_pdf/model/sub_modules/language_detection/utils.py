@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 
+import fitz
 import yaml
 os.environ['NO_ALBUMENTATIONS_UPDATE'] = '1'  # 禁止albumentations检查更新
 
@@ -53,8 +54,8 @@ def get_text_images(simple_images):
     return text_images
 
 
-def auto_detect_lang(pdf_bytes: bytes):
-    sample_docs = extract_pages(pdf_bytes)
+def auto_detect_lang(pdf_bytes: bytes | fitz.Document, page_ids: range = None):
+    sample_docs = extract_pages(pdf_bytes, page_ids)
     sample_pdf_bytes = sample_docs.tobytes()
     simple_images = load_images_from_pdf(sample_pdf_bytes, dpi=200)
     text_images = get_text_images(simple_images)
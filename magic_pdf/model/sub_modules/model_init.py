@@ -3,11 +3,12 @@ from loguru import logger
 
 from magic_pdf.config.constants import MODEL_NAME
 from magic_pdf.model.model_list import AtomicModel
+from magic_pdf.model.model_registry import ModelRegistry, get_model_cache_limits
 from magic_pdf.model.sub_modules.language_detection.yolov11.YOLOv11 import YOLOv11LangDetModel
 from magic_pdf.model.sub_modules.layout.doclayout_yolo.DocLayoutYOLO import DocLayoutYOLOModel
 from magic_pdf.model.sub_modules.mfd.yolov8.YOLOv8 import YOLOv8MFDModel
 from magic_pdf.model.sub_modules.mfr.unimernet.Unimernet import UnimernetModel
-from magic_pdf.model.sub_modules.ocr.paddleocr2pytorch.pytorch_paddle import PytorchPaddleOCR
+from magic_pdf.model.sub_modules.ocr.paddleocr2pytorch.pytorch_paddle import PytorchPaddleOCR, PytorchPaddleOCRView
 from magic_pdf.model.sub_modules.table.rapidtable.rapid_table import RapidTableModel
 # try:
 #     from magic_pdf_ascend_plugin.libs.license_verifier import (
@@ -124,7 +125,7 @@ def ocr_model_init(show_log: bool = False,
 
 class AtomModelSingleton:
     _instance = None
-    _models = {}
+    _models = ModelRegistry('atom_model', *get_model_cache_limits())
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -146,9 +147,34 @@ class AtomModelSingleton:
         else:
             key = atom_model_name
 
-        if key not in self._models:
-            self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
-        return self._models[key]
+        # 表格模型持有ocr引擎，ocr模型被淘汰时表格模型一并淘汰。
+        # 依赖按表格模型实际持有的引擎计算：rapid_table按自己的lang获取ocr引擎，并不使用传入的ocr_engine
+        def table_dependencies(table_model):
+            ocr_engine = getattr(table_model, 'ocr_engine', None)
+            if ocr_engine is None:
+                return ()
+            ocr_key = self._models.find(getattr(ocr_engine, 'ocr_model', ocr_engine))
+            return () if ocr_key is None else (ocr_key,)
+
+        # layout和公式模型每个文档都会用到，常驻内存；ocr和表格模型按语言加载，空闲时可被淘汰
+        model = self._models.get_or_create(
+            key,
+            lambda: atom_model_init(model_name=atom_model_name, **kwargs),
+            pinned=atom_model_name in [AtomicModel.Layout, AtomicModel.MFD, AtomicModel.MFR],
+            depends_on=table_dependencies if atom_model_name in [AtomicModel.Table] else (),
+        )
+
+        if atom_model_name in [AtomicModel.OCR]:
+            # 检测阈值属于运行时参数，同一语言的所有阈值配置共享一份网络权重
+            return PytorchPaddleOCRView(
+                model,
+                det_db_box_thresh=kwargs.get('det_db_box_thresh', 0.3),
+                det_db_unclip_ratio=kwargs.get('det_db_unclip_ratio', 1.8),
+            )
+        return model
+
+    def get_stats(self) -> dict:
+        return self._models.stats()
 
 def atom_model_init(model_name: str, **kwargs):
     atom_model = None
@@ -179,10 +205,10 @@ def atom_model_init(model_name: str, **kwargs):
             kwargs.get('device')
         )
     elif model_name == AtomicModel.OCR:
+        # det_db_box_thresh/det_db_unclip_ratio由PytorchPaddleOCRView按次传入，这里只加载权重
         atom_model = ocr_model_init(
-            kwargs.get('ocr_show_log'),
-            kwargs.get('det_db_box_thresh'),
-            kwargs.get('lang'),
+            kwargs.get('ocr_show_log', False),
+            lang=kwargs.get('lang'),
         )
     elif model_name == AtomicModel.Table:
         atom_model = table_model_init(
@@ -1,6 +1,7 @@
 # Copyright (c) Opendatalab. All rights reserved.
 import copy
 import os.path
+import threading
 import warnings
 from pathlib import Path
 
@@ -81,6 +82,8 @@ class PytorchPaddleOCR(TextSystem):
         args = argparse.Namespace(**default_args)
 
         super().__init__(args)
+        # 同一个模型会被推理线程和各请求的解析线程同时调用，推理本身不是线程安全的
+        self._lock = threading.Lock()
 
     def ocr(self,
             img,
@@ -88,6 +91,8 @@ class PytorchPaddleOCR(TextSystem):
             rec=True,
             mfd_res=None,
             tqdm_enable=False,
+            det_db_box_thresh=None,
+            det_db_unclip_ratio=None,
             ):
         assert isinstance(img, (np.ndarray, list, str, bytes))
         if isinstance(img, list) and det == True:
@@ -95,13 +100,17 @@ class PytorchPaddleOCR(TextSystem):
             exit(0)
         img = check_img(img)
         imgs = [img]
-        with warnings.catch_warnings():
+        with self._lock, warnings.catch_warnings():
             warnings.simplefilter("ignore", category=RuntimeWarning)
             if det and rec:
                 ocr_res = []
                 for img in imgs:
                     img = preprocess_image(img)
-                    dt_boxes, rec_res = self.__call__(img, mfd_res=mfd_res)
+                    dt_boxes, rec_res = self.__call__(
+                        img, mfd_res=mfd_res,
+                        det_db_box_thresh=det_db_box_thresh,
+                        det_db_unclip_ratio=det_db_unclip_ratio,
+                    )
                     if not dt_boxes and not rec_res:
                         ocr_res.append(None)
                         continue
@@ -112,7 +121,11 @@ class PytorchPaddleOCR(TextSystem):
                 ocr_res = []
                 for img in imgs:
                     img = preprocess_image(img)
-                    dt_boxes, elapse = self.text_detector(img)
+                    dt_boxes, elapse = self.text_detector(
+                        img,
+                        det_db_box_thresh=det_db_box_thresh,
+                        det_db_unclip_ratio=det_db_unclip_ratio,
+                    )
                     # logger.debug("dt_boxes num : {}, elapsed : {}".format(len(dt_boxes), elapse))
                     if dt_boxes is None:
                         ocr_res.append(None)
@@ -136,14 +149,18 @@ class PytorchPaddleOCR(TextSystem):
                     ocr_res.append(rec_res)
                 return ocr_res
 
-    def __call__(self, img, mfd_res=None):
+    def __call__(self, img, mfd_res=None, det_db_box_thresh=None, det_db_unclip_ratio=None):
 
         if img is None:
             logger.debug("no valid image provided")
             return None, None
 
         ori_im = img.copy()
-        dt_boxes, elapse = self.text_detector(img)
+        dt_boxes, elapse = self.text_detector(
+            img,
+            det_db_box_thresh=det_db_box_thresh,
+            det_db_unclip_ratio=det_db_unclip_ratio,
+        )
 
         if dt_boxes is None:
             logger.debug("no dt_boxes found, elapsed : {}".format(elapse))
@@ -178,6 +195,41 @@ class PytorchPaddleOCR(TextSystem):
 
         return filter_boxes, filter_rec_res
 
+class PytorchPaddleOCRView:
+    """PytorchPaddleOCR的轻量视图.
+
+    检测阈值只影响DB后处理，不影响网络权重。多个阈值配置共享同一个已加载的
+    PytorchPaddleOCR，各自的阈值在每次调用时传入。
+    """
+
+    def __init__(self, ocr_model: PytorchPaddleOCR, det_db_box_thresh=0.3, det_db_unclip_ratio=1.8):
+        self.ocr_model = ocr_model
+        self.det_db_box_thresh = det_db_box_thresh
+        self.det_db_unclip_ratio = det_db_unclip_ratio
+
+    def ocr(self, img, det=True, rec=True, mfd_res=None, tqdm_enable=False):
+        return self.ocr_model.ocr(
+            img,
+            det=det,
+            rec=rec,
+            mfd_res=mfd_res,
+            tqdm_enable=tqdm_enable,
+            det_db_box_thresh=self.det_db_box_thresh,
+            det_db_unclip_ratio=self.det_db_unclip_ratio,
+        )
+
+    def __call__(self, img, mfd_res=None):
+        return self.ocr_model(
+            img,
+            mfd_res=mfd_res,
+            det_db_box_thresh=self.det_db_box_thresh,
+            det_db_unclip_ratio=self.det_db_unclip_ratio,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.ocr_model, name)
+
+
 if __name__ == '__main__':
     pytorch_paddle_ocr = PytorchPaddleOCR()
     img = cv2.imread("/Users/myhloli/Downloads/screenshot-20250326-194348.png")
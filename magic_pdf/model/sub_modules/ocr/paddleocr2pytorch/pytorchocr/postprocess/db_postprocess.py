@@ -39,11 +39,14 @@ class DBPostProcess(object):
         self.dilation_kernel = None if not use_dilation else np.array(
             [[1, 1], [1, 1]])
 
-    def boxes_from_bitmap(self, pred, _bitmap, dest_width, dest_height):
+    def boxes_from_bitmap(self, pred, _bitmap, dest_width, dest_height, box_thresh=None, unclip_ratio=None):
         '''
         _bitmap: single map with shape (1, H, W),
                 whose values are binarized as {0, 1}
+        box_thresh, unclip_ratio: per-call overrides of the values given at init
         '''
+        if box_thresh is None:
+            box_thresh = self.box_thresh
 
         bitmap = _bitmap
         height, width = bitmap.shape
@@ -69,10 +72,10 @@ class DBPostProcess(object):
                 score = self.box_score_fast(pred, points.reshape(-1, 2))
             else:
                 score = self.box_score_slow(pred, contour)
-            if self.box_thresh > score:
+            if box_thresh > score:
                 continue
 
-            box = self.unclip(points).reshape(-1, 1, 2)
+            box = self.unclip(points, unclip_ratio).reshape(-1, 1, 2)
             box, sside = self.get_mini_boxes(box)
             if sside < self.min_size + 2:
                 continue
@@ -86,8 +89,9 @@ class DBPostProcess(object):
             scores.append(score)
         return np.array(boxes, dtype=np.int16), scores
 
-    def unclip(self, box):
-        unclip_ratio = self.unclip_ratio
+    def unclip(self, box, unclip_ratio=None):
+        if unclip_ratio is None:
+            unclip_ratio = self.unclip_ratio
         poly = Polygon(box)
         distance = poly.area * unclip_ratio / poly.length
         offset = pyclipper.PyclipperOffset()
@@ -156,7 +160,7 @@ class DBPostProcess(object):
         cv2.fillPoly(mask, contour.reshape(1, -1, 2).astype(np.int32), 1)
         return cv2.mean(bitmap[ymin:ymax + 1, xmin:xmax + 1], mask)[0]
 
-    def __call__(self, outs_dict, shape_list):
+    def __call__(self, outs_dict, shape_list, box_thresh=None, unclip_ratio=None):
         pred = outs_dict['maps']
         if isinstance(pred, torch.Tensor):
             pred = pred.cpu().numpy()
@@ -173,7 +177,9 @@ class DBPostProcess(object):
             else:
                 mask = segmentation[batch_index]
             boxes, scores = self.boxes_from_bitmap(pred[batch_index], mask,
-                                                   src_w, src_h)
+                                                   src_w, src_h,
+                                                   box_thresh=box_thresh,
+                                                   unclip_ratio=unclip_ratio)
 
             boxes_batch.append({'points': boxes})
         return boxes_batch
\ No newline at end of file
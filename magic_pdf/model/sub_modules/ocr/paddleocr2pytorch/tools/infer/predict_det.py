@@ -170,7 +170,7 @@ class TextDetector(BaseOCRV20):
         dt_boxes = np.array(dt_boxes_new)
         return dt_boxes
 
-    def __call__(self, img):
+    def __call__(self, img, det_db_box_thresh=None, det_db_unclip_ratio=None):
         ori_im = img.copy()
         data = {'image': img}
         data = transform(data, self.preprocess_op)
@@ -204,7 +204,15 @@ class TextDetector(BaseOCRV20):
         else:
             raise NotImplementedError
 
-        post_result = self.postprocess_op(preds, shape_list)
+        if self.det_algorithm in ['DB', 'DB++']:
+            # DB后处理阈值可按次覆盖，同一份权重可服务于不同的阈值配置
+            post_result = self.postprocess_op(
+                preds, shape_list,
+                box_thresh=det_db_box_thresh,
+                unclip_ratio=det_db_unclip_ratio,
+            )
+        else:
+            post_result = self.postprocess_op(preds, shape_list)
         dt_boxes = post_result[0]['points']
         if (self.det_algorithm == "SAST" and
             self.det_sast_polygon) or (self.det_algorithm in ["PSE", "FCE"] and
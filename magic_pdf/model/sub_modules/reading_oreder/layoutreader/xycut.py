@@ -17,11 +17,11 @@ def projection_by_bboxes(boxes: np.array, axis: int) -> np.ndarray:
     """
     assert axis in [0, 1]
     length = np.max(boxes[:, axis::2])
-    res = np.zeros(length, dtype=int)
-    # TODO: how to remove for loop?
-    for start, end in boxes[:, axis::2]:
-        res[start:end] += 1
-    return res
+    starts, ends = boxes[:, axis], boxes[:, axis + 2]
+    valid = ends > starts
+    # 在起点+1、终点-1得到差分数组，前缀和即为每个像素被覆盖的次数
+    diff = np.bincount(starts[valid], minlength=length + 1) - np.bincount(ends[valid], minlength=length + 1)
+    return np.cumsum(diff[:length])
 
 
 # from: https://dothinking.github.io/2021-06-19-%E9%80%92%E5%BD%92%E6%8A%95%E5%BD%B1%E5%88%86%E5%89%B2%E7%AE%97%E6%B3%95/#:~:text=%E9%80%92%E5%BD%92%E6%8A%95%E5%BD%B1%E5%88%86%E5%89%B2%EF%BC%88Recursive%20XY,%EF%BC%8C%E5%8F%AF%E4%BB%A5%E5%88%92%E5%88%86%E6%AE%B5%E8%90%BD%E3%80%81%E8%A1%8C%E3%80%82
@@ -68,61 +68,100 @@ def split_projection_profile(arr_values: np.array, min_value: float, min_gap: fl
     return arr_start, arr_end
 
 
-def recursive_xy_cut(boxes: np.ndarray, indices: List[int], res: List[int]):
-    """
+def _stable_sort_by(boxes: np.ndarray, indices: np.ndarray, column: int):
+    # 稳定排序，坐标相同的box保持原来的相对顺序，结果是确定的
+    order = np.argsort(boxes[:, column], kind='stable')
+    return boxes[order], indices[order]
 
-    Args:
-        boxes: (N, 4)
-        indices: 递归过程中始终表示 box 在原始数据中的索引
-        res: 保存输出结果
 
-    """
-    # 向 y 轴投影
-    assert len(boxes) == len(indices)
+def _projection_range_starts(boxes: np.ndarray, axis: int):
+    # 只在box覆盖的坐标范围内投影，切分结果与从0开始投影相同
+    valid = boxes[:, axis + 2] > boxes[:, axis]
+    if not valid.any():
+        return None
+    offset = boxes[valid, axis].min()
+    shifted_boxes = boxes[valid].copy()
+    shifted_boxes[:, axis::2] -= offset
+    pos = split_projection_profile(projection_by_bboxes(shifted_boxes, axis=axis), 0, 1)
+    if not pos:
+        return None
+    return pos[0] + offset
 
-    _indices = boxes[:, 1].argsort()
-    y_sorted_boxes = boxes[_indices]
-    y_sorted_indices = indices[_indices]
 
-    # debug_vis(y_sorted_boxes, y_sorted_indices)
+def _split_by_ranges(boxes: np.ndarray, indices: np.ndarray, column: int, range_starts: np.ndarray):
+    # boxes已按column排序，box按起点坐标归入投影区间；
+    # 宽或高为0的box没有投影，起点落在区间之间的空隙时归入前一个区间
+    split_points = np.searchsorted(boxes[:, column], range_starts[1:], side='left')
+    return list(zip(np.split(boxes, split_points), np.split(indices, split_points)))
 
-    y_projection = projection_by_bboxes(boxes=y_sorted_boxes, axis=1)
-    pos_y = split_projection_profile(y_projection, 0, 1)
-    if not pos_y:
-        return
 
-    arr_y0, arr_y1 = pos_y
-    for r0, r1 in zip(arr_y0, arr_y1):
-        # [r0, r1] 表示按照水平切分，有 bbox 的区域，对这些区域会再进行垂直切分
-        _indices = (r0 <= y_sorted_boxes[:, 1]) & (y_sorted_boxes[:, 1] < r1)
+def xy_cut(boxes: np.ndarray, indices: np.ndarray = None) -> List[int]:
+    """XY-cut阅读顺序排序.
 
-        y_sorted_boxes_chunk = y_sorted_boxes[_indices]
-        y_sorted_indices_chunk = y_sorted_indices[_indices]
+    先向y轴投影按水平方向切分，每个区域再向x轴投影，x方向能分开的区域继续切分，不能分开的区域按x坐标输出。
+    用显式栈代替递归，排序都是稳定排序，同样的输入总是得到同样的顺序；每个box都会出现在结果中。
 
-        _indices = y_sorted_boxes_chunk[:, 0].argsort()
-        x_sorted_boxes_chunk = y_sorted_boxes_chunk[_indices]
-        x_sorted_indices_chunk = y_sorted_indices_chunk[_indices]
+    Args:
+        boxes: (N, 4), int
+        indices: box在原始数据中的索引, 默认为 0...N-1
 
-        # 往 x 方向投影
-        x_projection = projection_by_bboxes(boxes=x_sorted_boxes_chunk, axis=0)
-        pos_x = split_projection_profile(x_projection, 0, 1)
-        if not pos_x:
+    Returns:
+        按阅读顺序排列的索引
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if indices is None:
+        indices = np.arange(len(boxes))
+    indices = np.asarray(indices)
+    res = []
+    # 栈中的元素为 (boxes, indices, 是否需要继续切分)，按逆序压栈以保持深度优先的输出顺序
+    stack = [(boxes, indices, True)]
+    while stack:
+        boxes, indices, need_cut = stack.pop()
+        if not need_cut or len(boxes) <= 1:
+            res.extend(indices.tolist())
             continue
 
-        arr_x0, arr_x1 = pos_x
-        if len(arr_x0) == 1:
-            # x 方向无法切分
-            res.extend(x_sorted_indices_chunk)
+        # 向 y 轴投影
+        y_sorted_boxes, y_sorted_indices = _stable_sort_by(boxes, indices, 1)
+        y_range_starts = _projection_range_starts(y_sorted_boxes, axis=1)
+        if y_range_starts is None:
+            # 所有box的高度都为0
+            stack.append((*_stable_sort_by(y_sorted_boxes, y_sorted_indices, 0), False))
             continue
 
-        # x 方向上能分开，继续递归调用
-        for c0, c1 in zip(arr_x0, arr_x1):
-            _indices = (c0 <= x_sorted_boxes_chunk[:, 0]) & (
-                x_sorted_boxes_chunk[:, 0] < c1
-            )
-            recursive_xy_cut(
-                x_sorted_boxes_chunk[_indices], x_sorted_indices_chunk[_indices], res
-            )
+        tasks = []
+        for y_boxes_chunk, y_indices_chunk in _split_by_ranges(y_sorted_boxes, y_sorted_indices, 1, y_range_starts):
+            x_sorted_boxes_chunk, x_sorted_indices_chunk = _stable_sort_by(y_boxes_chunk, y_indices_chunk, 0)
+
+            # 往 x 方向投影
+            x_range_starts = None
+            if len(x_sorted_boxes_chunk) > 1:
+                x_range_starts = _projection_range_starts(x_sorted_boxes_chunk, axis=0)
+            if x_range_starts is None or len(x_range_starts) == 1:
+                # x 方向无法切分
+                tasks.append((x_sorted_boxes_chunk, x_sorted_indices_chunk, False))
+                continue
+
+            # x 方向上能分开，继续切分
+            for x_boxes_chunk, x_indices_chunk in _split_by_ranges(
+                x_sorted_boxes_chunk, x_sorted_indices_chunk, 0, x_range_starts
+            ):
+                tasks.append((x_boxes_chunk, x_indices_chunk, True))
+        stack.extend(reversed(tasks))
+    return res
+
+
+def recursive_xy_cut(boxes: np.ndarray, indices: List[int], res: List[int]):
+    """
+
+    Args:
+        boxes: (N, 4)
+        indices: 递归过程中始终表示 box 在原始数据中的索引
+        res: 保存输出结果
+
+    """
+    assert len(boxes) == len(indices)
+    res.extend(xy_cut(boxes, indices))
 
 
 def points_to_bbox(points):
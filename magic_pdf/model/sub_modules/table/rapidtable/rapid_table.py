@@ -1,4 +1,8 @@
 import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 import cv2
 import numpy as np
@@ -10,22 +14,54 @@ from rapid_table.main import ModelType
 from magic_pdf.libs.config_reader import get_device
 
 
+@dataclass
+class _RapidTableSessionInput(RapidTableInput):
+    # RapidTable把配置整体传给OrtInferSession，onnxruntime会读取这两个线程数
+    intra_op_num_threads: int = -1
+    inter_op_num_threads: int = -1
+
+
+def get_table_session_config(cpu_count: int | None = None) -> tuple[int, int]:
+    """表格识别的onnxruntime session数和每个session的线程数.
+
+    MINERU_TABLE_SESSIONS默认为cpu核数/4(1到8之间)，MINERU_TABLE_THREADS默认平分cpu核数，
+    所有session同时运行时正好用满cpu而不会超额订阅。
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    sessions = int(os.getenv('MINERU_TABLE_SESSIONS', min(8, max(1, cpu_count // 4))))
+    threads = int(os.getenv('MINERU_TABLE_THREADS', max(1, cpu_count // sessions)))
+    return max(1, sessions), max(1, threads)
+
+
 class RapidTableModel(object):
-    def __init__(self, ocr_engine, table_sub_model_name='slanet_plus'):
+    def __init__(self, ocr_engine, table_sub_model_name='slanet_plus', sessions=None, threads_per_session=None):
         sub_model_list = [model.value for model in ModelType]
+        default_sessions, default_threads = get_table_session_config()
+        sessions = sessions or default_sessions
+        threads_per_session = threads_per_session or default_threads
         if table_sub_model_name is None:
-            input_args = RapidTableInput()
+            input_args = _RapidTableSessionInput()
         elif table_sub_model_name in  sub_model_list:
             if torch.cuda.is_available() and table_sub_model_name == "unitable":
-                input_args = RapidTableInput(model_type=table_sub_model_name, use_cuda=True, device=get_device())
+                input_args = _RapidTableSessionInput(model_type=table_sub_model_name, use_cuda=True, device=get_device())
+                # unitable是torch模型，不使用session池
+                sessions = 1
             else:
                 root_dir = Path(__file__).absolute().parent.parent.parent.parent.parent
                 slanet_plus_model_path = os.path.join(root_dir, 'resources', 'slanet_plus', 'slanet-plus.onnx')
-                input_args = RapidTableInput(model_type=table_sub_model_name, model_path=slanet_plus_model_path)
+                input_args = _RapidTableSessionInput(model_type=table_sub_model_name, model_path=slanet_plus_model_path)
         else:
             raise ValueError(f"Invalid table_sub_model_name: {table_sub_model_name}. It must be one of {sub_model_list}")
 
-        self.table_model = RapidTable(input_args)
+        # 每个RapidTable持有一个onnxruntime session，同一个session不并发使用
+        input_args.intra_op_num_threads = threads_per_session
+        input_args.inter_op_num_threads = 1
+        self.sessions = sessions
+        self._table_models = queue.Queue()
+        for _ in range(sessions):
+            self._table_models.put(RapidTable(input_args))
+        self.table_model = self._table_models.queue[0]
+        logger.info(f'table model sessions: {sessions}, threads per session: {threads_per_session}')
 
         # self.ocr_model_name = "RapidOCR"
         # if torch.cuda.is_available():
@@ -49,6 +85,7 @@ class RapidTableModel(object):
 
         if img_is_portrait:
 
+            # ocr模型内部加锁，多个表格的ocr串行执行
             det_res = self.ocr_engine.ocr(bgr_image, rec=False)[0]
             # Check if table is rotated by analyzing text box aspect ratios
             is_rotated = False
@@ -93,7 +130,11 @@ class RapidTableModel(object):
 
 
         if ocr_result:
-            table_results = self.table_model(np.asarray(image), ocr_result)
+            table_model = self._table_models.get()
+            try:
+                table_results = table_model(np.asarray(image), ocr_result)
+            finally:
+                self._table_models.put(table_model)
             html_code = table_results.pred_html
             table_cell_bboxes = table_results.cell_bboxes
             logic_points = table_results.logic_points
@@ -101,3 +142,37 @@ class RapidTableModel(object):
             return html_code, table_cell_bboxes, logic_points, elapse
         else:
             return None, None, None, None
+
+    def batch_predict(self, images) -> list:
+        """Recognize the tables concurrently, one table per session at a time.
+
+        Args:
+            images (list): the table images
+
+        Returns:
+            list: the predict result of each image, in the same order as images
+        """
+        if len(images) == 0:
+            return []
+        latencies = [0.0] * len(images)
+
+        def run(index):
+            start = time.perf_counter()
+            result = self.predict(images[index])
+            latencies[index] = time.perf_counter() - start
+            return result
+
+        start = time.perf_counter()
+        if self.sessions == 1 or len(images) == 1:
+            results = [run(index) for index in range(len(images))]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.sessions, len(images)), thread_name_prefix='mineru-table') as pool:
+                results = list(pool.map(run, range(len(images))))
+        for index, latency in enumerate(latencies):
+            logger.debug(f'table {index} latency: {round(latency, 3)}s')
+        sorted_latencies = sorted(latencies)
+        logger.info(
+            f'table num: {len(images)}, time: {round(time.perf_counter() - start, 2)}s, '
+            f'latency p50: {round(sorted_latencies[len(images) // 2], 3)}s, max: {round(sorted_latencies[-1], 3)}s'
+        )
+        return results
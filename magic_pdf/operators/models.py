@@ -38,16 +38,20 @@ class InferenceResult(InferenceResultBase):
             copy.deepcopy(self._infer_res), self._dataset, dir_name, base_name
         )
 
-    def dump_model(self, writer: DataWriter, file_path: str):
+    def dump_model(self, writer: DataWriter, file_path: str, compact: bool = True):
         """Dump model inference result to file.
 
         Args:
             writer (DataWriter): writer handle
             file_path (str): the location of target file
+            compact (bool, optional): dump json without indentation and spaces, indented by 4 spaces if False.
+                Defaults to True.
         """
-        writer.write_string(
-            file_path, json.dumps(self._infer_res, ensure_ascii=False, indent=4)
-        )
+        if compact:
+            model_json = json.dumps(self._infer_res, ensure_ascii=False, separators=(',', ':'))
+        else:
+            model_json = json.dumps(self._infer_res, ensure_ascii=False, indent=4)
+        writer.write_string(file_path, model_json)
 
     def get_infer_res(self):
         """Get the inference result.
@@ -76,6 +80,7 @@ class InferenceResult(InferenceResultBase):
         end_page_id=None,
         debug_mode=False,
         lang=None,
+        page_callback=None,
     ) -> PipeResult:
         """Post-proc the model inference result, Extract the text using the
         third library, such as `pymupdf`
@@ -86,6 +91,7 @@ class InferenceResult(InferenceResultBase):
             end_page_id (int, optional):  Defaults to the last page index of dataset. Let user select some pages He/She want to process
             debug_mode (bool, optional): Defaults to False. will dump more log if enabled
             lang (str, optional): Defaults to None.
+            page_callback (Callable, optional): Defaults to None. invoked as page_callback(page_id, page_info) once a page is parsed, before the cross-page paragraph merge
 
         Returns:
             PipeResult: the result
@@ -108,6 +114,7 @@ class InferenceResult(InferenceResultBase):
             end_page_id=end_page_id,
             debug_mode=debug_mode,
             lang=lang,
+            page_callback=page_callback,
         )
         return res
 
@@ -118,6 +125,7 @@ class InferenceResult(InferenceResultBase):
         end_page_id=None,
         debug_mode=False,
         lang=None,
+        page_callback=None,
     ) -> PipeResult:
         """Post-proc the model inference result, Extract the text using `OCR`
         technical.
@@ -128,6 +136,7 @@ class InferenceResult(InferenceResultBase):
             end_page_id (int, optional):  Defaults to the last page index of dataset. Let user select some pages He/She want to process
             debug_mode (bool, optional): Defaults to False. will dump more log if enabled
             lang (str, optional): Defaults to None.
+            page_callback (Callable, optional): Defaults to None. invoked as page_callback(page_id, page_info) once a page is parsed, before the cross-page paragraph merge
 
         Returns:
             PipeResult: the result
@@ -150,5 +159,6 @@ class InferenceResult(InferenceResultBase):
             end_page_id=end_page_id,
             debug_mode=debug_mode,
             lang=lang,
+            page_callback=page_callback,
         )
         return res
@@ -6,9 +6,10 @@ from typing import Callable
 from magic_pdf.config.make_content_config import DropMode, MakeMode
 from magic_pdf.data.data_reader_writer import DataWriter
 from magic_pdf.data.dataset import Dataset
-from magic_pdf.dict2md.ocr_mkcontent import union_make
+from magic_pdf.dict2md.ocr_mkcontent import union_make, union_make_multi
 from magic_pdf.libs.draw_bbox import (draw_layout_bbox, draw_line_sort_bbox,
-                                      draw_span_bbox)
+                                      draw_overlays, draw_span_bbox,
+                                      submit_draw_overlays)
 from magic_pdf.libs.json_compressor import JsonCompressor
 
 
@@ -113,6 +114,54 @@ class PipeResult:
             file_path, json.dumps(content_list, ensure_ascii=False, indent=4)
         )
 
+    def dump_all(
+        self,
+        writer: DataWriter,
+        img_dir_or_bucket_prefix: str,
+        md_file_path: str = None,
+        content_list_file_path: str = None,
+        middle_json_file_path: str = None,
+        nlp_md_file_path: str = None,
+        drop_mode=DropMode.NONE,
+        md_make_mode=MakeMode.MM_MD,
+    ):
+        """Dump markdown, content list, middle json and nlp markdown in one
+        traversal of the result, the text of each block is only merged once.
+
+        Args:
+            writer (DataWriter): File writer handle
+            img_dir_or_bucket_prefix (str): The s3 bucket prefix or local file directory which used to store the figure
+            md_file_path (str, optional): The file location of markdown, skipped if None. Defaults to None.
+            content_list_file_path (str, optional): The file location of content list, skipped if None. Defaults to None.
+            middle_json_file_path (str, optional): The file location of middle json, skipped if None. Defaults to None.
+            nlp_md_file_path (str, optional): The file location of nlp markdown, skipped if None. Defaults to None.
+            drop_mode (str, optional): Drop strategy when some page which is corrupted or inappropriate. Defaults to DropMode.NONE.
+            md_make_mode (str, optional): The content Type of Markdown be made. Defaults to MakeMode.MM_MD.
+        """
+        # 按文件记录输出，md_make_mode为NLP_MD时md和nlp md是同一种内容，两个文件都要写
+        outputs = []
+        if md_file_path is not None:
+            outputs.append((md_make_mode, md_file_path))
+        if nlp_md_file_path is not None:
+            outputs.append((MakeMode.NLP_MD, nlp_md_file_path))
+        if content_list_file_path is not None:
+            outputs.append((MakeMode.STANDARD_FORMAT, content_list_file_path))
+
+        make_modes = list(dict.fromkeys(make_mode for make_mode, _ in outputs))
+        contents = union_make_multi(
+            self._pipe_res['pdf_info'], make_modes, drop_mode, img_dir_or_bucket_prefix
+        )
+        for make_mode, file_path in outputs:
+            if make_mode == MakeMode.STANDARD_FORMAT:
+                writer.write_string(
+                    file_path, json.dumps(contents[make_mode], ensure_ascii=False, indent=4)
+                )
+            else:
+                writer.write_string(file_path, contents[make_mode])
+
+        if middle_json_file_path is not None:
+            self.dump_middle_json(writer, middle_json_file_path)
+
     def get_middle_json(self) -> str:
         """Get middle json.
 
@@ -121,14 +170,19 @@ class PipeResult:
         """
         return json.dumps(self._pipe_res, ensure_ascii=False, indent=4)
 
-    def dump_middle_json(self, writer: DataWriter, file_path: str):
+    def dump_middle_json(self, writer: DataWriter, file_path: str, compact: bool = True):
         """Dump the result of pipeline.
 
         Args:
             writer (DataWriter): File writer handler
             file_path (str): The file location of middle json
+            compact (bool, optional): dump json without indentation and spaces, indented by 4 spaces if False.
+                Defaults to True.
         """
-        middle_json = self.get_middle_json()
+        if compact:
+            middle_json = json.dumps(self._pipe_res, ensure_ascii=False, separators=(',', ':'))
+        else:
+            middle_json = self.get_middle_json()
         writer.write_string(file_path, middle_json)
 
     def draw_layout(self, file_path: str) -> None:
@@ -170,6 +224,43 @@ class PipeResult:
         pdf_info = self._pipe_res['pdf_info']
         draw_line_sort_bbox(pdf_info, self._dataset.data_bits(), dir_name, base_name)
 
+    def draw_all(
+        self,
+        layout_file_path: str = None,
+        span_file_path: str = None,
+        line_sort_file_path: str = None,
+        deferred: bool = False,
+    ):
+        """Draw the layout, span and line sort results in one call.
+
+        Args:
+            layout_file_path (str, optional): The file location of layout result file, skipped if None. Defaults to None.
+            span_file_path (str, optional): The file location of span result file, skipped if None. Defaults to None.
+            line_sort_file_path (str, optional): The file location of line sort result file, skipped if None. Defaults to None.
+            deferred (bool, optional): Draw in a background process and return immediately. Defaults to False.
+
+        Returns:
+            Future | None: the future of the background drawing if deferred, otherwise None
+        """
+        overlays = {}
+        for overlay_type, file_path in [
+            ('layout', layout_file_path),
+            ('span', span_file_path),
+            ('line_sort', line_sort_file_path),
+        ]:
+            if file_path is not None:
+                dir_name = os.path.dirname(file_path)
+                if dir_name and not os.path.exists(dir_name):
+                    os.makedirs(dir_name, exist_ok=True)
+                overlays[overlay_type] = file_path
+        if not overlays:
+            return None
+        pdf_info = self._pipe_res['pdf_info']
+        if deferred:
+            return submit_draw_overlays(pdf_info, self._dataset.data_bits(), overlays)
+        draw_overlays(pdf_info, self._dataset.data_bits(), overlays)
+        return None
+
     def get_compress_pdf_mid_data(self):
         """Compress the pipeline result.
 
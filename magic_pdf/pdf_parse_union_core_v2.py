@@ -3,6 +3,7 @@ import math
 import os
 import re
 import statistics
+import threading
 import time
 import warnings
 from typing import List
@@ -18,12 +19,14 @@ from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.config.ocr_content_type import BlockType, ContentType
 from magic_pdf.data.dataset import Dataset, PageableData
 from magic_pdf.libs.boxbase import calculate_overlap_area_in_bbox1_area_ratio, __is_overlaps_y_exceeds_threshold
-from magic_pdf.libs.clean_memory import clean_memory
-from magic_pdf.libs.config_reader import get_local_layoutreader_model_dir, get_llm_aided_config, get_device
+from magic_pdf.libs.config_reader import get_local_layoutreader_model_dir, get_llm_aided_config, get_device, \
+    get_reading_order_model
 from magic_pdf.libs.convert_utils import dict_to_list
-from magic_pdf.libs.hash_utils import compute_md5
+from magic_pdf.libs.memory_governor import get_memory_governor
+from magic_pdf.libs.pipeline_stage import pipeline_stage
 from magic_pdf.libs.pdf_image_tools import cut_image_to_pil_image
 from magic_pdf.model.magic_model import MagicModel
+from magic_pdf.model.model_registry import ModelRegistry
 from magic_pdf.post_proc.llm_aided import llm_aided_formula, llm_aided_text, llm_aided_title
 
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
@@ -360,7 +363,9 @@ def model_init(model_name: str):
 
 class ModelSingleton:
     _instance = None
-    _models = {}
+    _models = ModelRegistry('reading_order')
+    # 多个请求线程同时解析时，layoutreader的推理串行执行
+    predict_lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -368,9 +373,9 @@ class ModelSingleton:
         return cls._instance
 
     def get_model(self, model_name: str):
-        if model_name not in self._models:
-            self._models[model_name] = model_init(model_name=model_name)
-        return self._models[model_name]
+        return self._models.get_or_create(
+            model_name, lambda: model_init(model_name=model_name), pinned=True
+        )
 
 
 def do_predict(boxes: List[List[int]], model) -> List[int]:
@@ -425,17 +430,14 @@ def cal_block_index(fix_blocks, sorted_bboxes):
         import numpy as np
 
         from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import \
-            recursive_xy_cut
+            xy_cut
 
-        random_boxes = np.array(block_bboxes)
-        np.random.shuffle(random_boxes)
-        res = []
-        recursive_xy_cut(np.asarray(random_boxes).astype(int), np.arange(len(block_bboxes)), res)
+        res = xy_cut(np.array(block_bboxes).reshape(-1, 4).astype(int))
         assert len(res) == len(block_bboxes)
-        sorted_boxes = random_boxes[np.array(res)].tolist()
 
-        for i, block in enumerate(fix_blocks):
-            block['index'] = sorted_boxes.index(block['bbox'])
+        # res[i]是排在第i位的block的下标
+        for i, block_idx in enumerate(res):
+            fix_blocks[block_idx]['index'] = i
 
         # 生成line index
         sorted_blocks = sorted(fix_blocks, key=lambda b: b['index'])
@@ -526,6 +528,10 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height, footnote_blocks
     if len(page_line_list) > 200:  # layoutreader最高支持512line
         return None
 
+    if get_reading_order_model() != 'layoutreader':
+        # 返回None时使用xycut排序
+        return None
+
     # 使用layoutreader排序
     x_scale = 1000.0 / page_w
     y_scale = 1000.0 / page_h
@@ -563,7 +569,7 @@ def sort_lines_by_model(fix_blocks, page_w, page_h, line_height, footnote_blocks
         boxes.append([left, top, right, bottom])
     model_manager = ModelSingleton()
     model = model_manager.get_model('layoutreader')
-    with torch.no_grad():
+    with ModelSingleton.predict_lock, torch.no_grad():
         orders = do_predict(boxes, model)
     sorted_bboxes = [page_line_list[i] for i in orders]
 
@@ -907,67 +913,12 @@ def parse_page_core(
     return page_info
 
 
-def pdf_parse_union(
-    model_list,
-    dataset: Dataset,
-    imageWriter,
-    parse_mode,
-    start_page_id=0,
-    end_page_id=None,
-    debug_mode=False,
-    lang=None,
-):
-
-    pdf_bytes_md5 = compute_md5(dataset.data_bits())
-
-    """初始化空的pdf_info_dict"""
-    pdf_info_dict = {}
-
-    """用model_list和docs对象初始化magic_model"""
-    magic_model = MagicModel(model_list, dataset)
-
-    """根据输入的起始范围解析pdf"""
-    end_page_id = (
-        end_page_id
-        if end_page_id is not None and end_page_id >= 0
-        else len(dataset) - 1
-    )
-
-    if end_page_id > len(dataset) - 1:
-        logger.warning('end_page_id is out of range, use pdf_docs length')
-        end_page_id = len(dataset) - 1
-
-    # """初始化启动时间"""
-    # start_time = time.time()
-
-    # for page_id, page in enumerate(dataset):
-    for page_id, page in tqdm(enumerate(dataset), total=len(dataset), desc="Processing pages"):
-        # """debug时输出每页解析的耗时."""
-        # if debug_mode:
-            # time_now = time.time()
-            # logger.info(
-            #     f'page_id: {page_id}, last_page_cost_time: {round(time.time() - start_time, 2)}'
-            # )
-            # start_time = time_now
-
-        """解析pdf中的每一页"""
-        if start_page_id <= page_id <= end_page_id:
-            page_info = parse_page_core(
-                page, magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
-            )
-        else:
-            page_info = page.get_page_info()
-            page_w = page_info.w
-            page_h = page_info.h
-            page_info = ocr_construct_page_component_v2(
-                [], [], page_id, page_w, page_h, [], [], [], [], [], True, 'skip page'
-            )
-        pdf_info_dict[f'page_{page_id}'] = page_info
-
+def ocr_text_spans(page_infos, lang=None):
+    """对页面中需要OCR的文本span(带np_img的span)批量识别，填充content和score"""
     need_ocr_list = []
     img_crop_list = []
     text_block_list = []
-    for pange_id, page_info in pdf_info_dict.items():
+    for page_info in page_infos:
         for block in page_info['preproc_blocks']:
             if block['type'] in ['table', 'image']:
                 for sub_block in block['blocks']:
@@ -1006,33 +957,132 @@ def pdf_parse_union(
         # logger.info(f'ocr-dynamic-rec time: {round(rec_time, 2)}, total images processed: {len(img_crop_list)}')
 
 
+def pdf_parse_union(
+    model_list,
+    dataset: Dataset,
+    imageWriter,
+    parse_mode,
+    start_page_id=0,
+    end_page_id=None,
+    debug_mode=False,
+    lang=None,
+    page_callback=None,
+):
+
+    """根据输入的起始范围解析pdf"""
+    end_page_id = (
+        end_page_id
+        if end_page_id is not None and end_page_id >= 0
+        else len(dataset) - 1
+    )
+
+    if end_page_id > len(dataset) - 1:
+        logger.warning('end_page_id is out of range, use pdf_docs length')
+        end_page_id = len(dataset) - 1
+
+    return pdf_parse_union_by_windows(
+        [(start_page_id, end_page_id, model_list)],
+        dataset,
+        imageWriter,
+        parse_mode,
+        lang=lang,
+        page_callback=page_callback,
+    )
+
+
+@pipeline_stage('pdf_parse_union')
+def pdf_parse_union_by_windows(
+    model_windows,
+    dataset: Dataset,
+    imageWriter,
+    parse_mode,
+    lang=None,
+    page_callback=None,
+):
+    """按页面窗口解析pdf，窗口的模型结果可以边推理边产生.
+
+    Args:
+        model_windows (Iterable): 每一项为(start_page_id, end_page_id, model_list)，
+            model_list是覆盖整个文档的模型结果，只有窗口内的页面会被解析；可以是生成器，
+            解析完一个窗口后才会取下一个窗口
+        dataset (Dataset): the dataset
+        imageWriter (DataWriter): the image writer handle
+        parse_mode (SupportedPdfParseMethod): txt or ocr
+        lang (str, optional): Defaults to None.
+        page_callback (Callable, optional): 每解析完一页调用page_callback(page_id, page_info)，
+            此时页内的文本OCR已完成，但尚未做跨页的段落合并. Defaults to None.
+
+    Returns:
+        dict: {'pdf_info': [page_info, ...]}
+    """
+    pdf_bytes_md5 = dataset.data_md5()
+
+    parsed_pages = {}
+    with tqdm(total=len(dataset), desc="Processing pages") as pbar:
+        for start_page_id, end_page_id, model_list in model_windows:
+            """用model_list和docs对象初始化magic_model"""
+            with pipeline_stage('magic_model', range(start_page_id, end_page_id + 1)):
+                magic_model = MagicModel(model_list, dataset)
+
+            """解析pdf中的每一页"""
+            for page_id in range(start_page_id, end_page_id + 1):
+                with pipeline_stage('parse_page_core', [page_id]):
+                    page_info = parse_page_core(
+                        dataset.get_page(page_id), magic_model, page_id, pdf_bytes_md5, imageWriter, parse_mode, lang
+                    )
+                if page_callback is not None:
+                    # 流式输出时页内的文本OCR不能等到全部页面解析完
+                    ocr_text_spans([page_info], lang)
+                    page_callback(page_id, page_info)
+                parsed_pages[page_id] = page_info
+                pbar.update(1)
+
+    """初始化空的pdf_info_dict，未解析的页面标记为skip page"""
+    pdf_info_dict = {}
+    for page_id, page in enumerate(dataset):
+        if page_id in parsed_pages:
+            page_info = parsed_pages[page_id]
+        else:
+            page_info = page.get_page_info()
+            page_w = page_info.w
+            page_h = page_info.h
+            page_info = ocr_construct_page_component_v2(
+                [], [], page_id, page_w, page_h, [], [], [], [], [], True, 'skip page'
+            )
+        pdf_info_dict[f'page_{page_id}'] = page_info
+
+    with pipeline_stage('ocr_text_spans'):
+        ocr_text_spans(pdf_info_dict.values(), lang)
+
     """分段"""
-    para_split(pdf_info_dict)
+    with pipeline_stage('para_split'):
+        para_split(pdf_info_dict)
 
     """llm优化"""
-    llm_aided_config = get_llm_aided_config()
-    if llm_aided_config is not None:
-        """公式优化"""
-        formula_aided_config = llm_aided_config.get('formula_aided', None)
-        if formula_aided_config is not None:
-            if formula_aided_config.get('enable', False):
-                llm_aided_formula_start_time = time.time()
-                llm_aided_formula(pdf_info_dict, formula_aided_config)
-                logger.info(f'llm aided formula time: {round(time.time() - llm_aided_formula_start_time, 2)}')
-        """文本优化"""
-        text_aided_config = llm_aided_config.get('text_aided', None)
-        if text_aided_config is not None:
-            if text_aided_config.get('enable', False):
-                llm_aided_text_start_time = time.time()
-                llm_aided_text(pdf_info_dict, text_aided_config)
-                logger.info(f'llm aided text time: {round(time.time() - llm_aided_text_start_time, 2)}')
-        """标题优化"""
-        title_aided_config = llm_aided_config.get('title_aided', None)
-        if title_aided_config is not None:
-            if title_aided_config.get('enable', False):
-                llm_aided_title_start_time = time.time()
-                llm_aided_title(pdf_info_dict, title_aided_config)
-                logger.info(f'llm aided title time: {round(time.time() - llm_aided_title_start_time, 2)}')
+    with pipeline_stage('llm_aided'):
+        llm_aided_config = get_llm_aided_config()
+        if llm_aided_config is not None:
+            """公式优化"""
+            formula_aided_config = llm_aided_config.get('formula_aided', None)
+            if formula_aided_config is not None:
+                if formula_aided_config.get('enable', False):
+                    llm_aided_formula_start_time = time.time()
+                    llm_aided_formula(pdf_info_dict, formula_aided_config)
+                    logger.info(f'llm aided formula time: {round(time.time() - llm_aided_formula_start_time, 2)}')
+            """文本优化"""
+            text_aided_config = llm_aided_config.get('text_aided', None)
+            if text_aided_config is not None:
+                if text_aided_config.get('enable', False):
+                    llm_aided_text_start_time = time.time()
+                    llm_aided_text(pdf_info_dict, text_aided_config)
+                    logger.info(f'llm aided text time: {round(time.time() - llm_aided_text_start_time, 2)}')
+            """标题优化"""
+            title_aided_config = llm_aided_config.get('title_aided', None)
+            if title_aided_config is not None:
+                if title_aided_config.get('enable', False):
+                    llm_aided_title_start_time = time.time()
+                    llm_aided_title(pdf_info_dict, title_aided_config)
+                    logger.info(f'llm aided title time: {round(time.time() - llm_aided_title_start_time, 2)}')
 
     """dict转list"""
     pdf_info_list = dict_to_list(pdf_info_dict)
@@ -1040,7 +1090,7 @@ def pdf_parse_union(
         'pdf_info': pdf_info_list,
     }
 
-    clean_memory(get_device())
+    get_memory_governor().maybe_clean(get_device())
 
     return new_pdf_info_dict
 
@@ -30,45 +30,36 @@ class ListLineTag:
     IS_LIST_END_LINE = 'is_list_end_line'
 
 
-def __process_blocks(blocks):
-    # 对所有block预处理
-    # 1.通过title和interline_equation将block分组
-    # 2.bbox边界根据line信息重置
-
-    result = []
-    current_group = []
-
-    for i in range(len(blocks)):
-        current_block = blocks[i]
-
-        # 如果当前块是 text 类型
-        if current_block['type'] == 'text':
-            current_block['bbox_fs'] = copy.deepcopy(current_block['bbox'])
-            if 'lines' in current_block and len(current_block['lines']) > 0:
-                current_block['bbox_fs'] = [
-                    min([line['bbox'][0] for line in current_block['lines']]),
-                    min([line['bbox'][1] for line in current_block['lines']]),
-                    max([line['bbox'][2] for line in current_block['lines']]),
-                    max([line['bbox'][3] for line in current_block['lines']]),
-                ]
-            current_group.append(current_block)
-
-        # 检查下一个块是否存在
-        if i + 1 < len(blocks):
-            next_block = blocks[i + 1]
-            # 如果下一个块不是 text 类型且是 title 或 interline_equation 类型
-            if next_block['type'] in ['title', 'interline_equation']:
-                result.append(current_group)
-                current_group = []
-
-    # 处理最后一个 group
-    if current_group:
-        result.append(current_group)
-
-    return result
-
-
-def __is_list_or_index_block(block):
+def _copy_block(block):
+    """复制合并段落时会被修改的dict和list，bbox、文本等叶子数据与原block共享."""
+    new_block = block.copy()
+    if 'lines' in block:
+        new_block['lines'] = [_copy_line(line) for line in block['lines']]
+    if 'blocks' in block:
+        new_block['blocks'] = [_copy_block(sub_block) for sub_block in block['blocks']]
+    return new_block
+
+
+def _copy_line(line):
+    new_line = line.copy()
+    if 'spans' in line:
+        new_line['spans'] = [span.copy() for span in line['spans']]
+    return new_line
+
+
+def _lines_bbox(block):
+    # bbox边界根据line信息重置
+    if 'lines' in block and len(block['lines']) > 0:
+        return [
+            min([line['bbox'][0] for line in block['lines']]),
+            min([line['bbox'][1] for line in block['lines']]),
+            max([line['bbox'][2] for line in block['lines']]),
+            max([line['bbox'][3] for line in block['lines']]),
+        ]
+    return copy.copy(block['bbox'])
+
+
+def _is_list_or_index_block(block):
     # 一个block如果是list block 应该同时满足以下特征
     # 1.block内有多个line 2.block 内有多个line左侧顶格写 3.block内有多个line 右侧不顶格（狗牙状）
     # 1.block内有多个line 2.block 内有多个line左侧顶格写 3.多个line以endflag结尾
@@ -267,15 +258,16 @@ def __is_list_or_index_block(block):
         return BlockType.Text
 
 
-def __merge_2_text_blocks(block1, block2):
-    if len(block1['lines']) > 0:
+def _can_merge_2_text_blocks(block1, block2, block2_last_line):
+    # block2_last_line是block2合并到更前面的block之前的最后一行
+    if len(block1['lines']) > 0 and block2_last_line is not None:
         first_line = block1['lines'][0]
         line_height = first_line['bbox'][3] - first_line['bbox'][1]
         block1_weight = block1['bbox'][2] - block1['bbox'][0]
         block2_weight = block2['bbox'][2] - block2['bbox'][0]
         min_block_weight = min(block1_weight, block2_weight)
         if abs(block1['bbox_fs'][0] - first_line['bbox'][0]) < line_height / 2:
-            last_line = block2['lines'][-1]
+            last_line = block2_last_line
             if len(last_line['spans']) > 0:
                 last_span = last_line['spans'][-1]
                 line_height = last_line['bbox'][3] - last_line['bbox'][1]
@@ -296,99 +288,109 @@ def __merge_2_text_blocks(block1, block2):
                             # 下一个block的第一个字符是大写字母
                             and not span_start_with_big_char
                         ):
-                            if block1['page_num'] != block2['page_num']:
-                                for line in block1['lines']:
-                                    for span in line['spans']:
-                                        span[CROSS_PAGE] = True
-                            block2['lines'].extend(block1['lines'])
-                            block1['lines'] = []
-                            block1[LINES_DELETED] = True
+                            return True
+    return False
 
-    return block1, block2
 
-
-def __merge_2_list_blocks(block1, block2):
-    if block1['page_num'] != block2['page_num']:
-        for line in block1['lines']:
+def _move_lines(block, head_block):
+    # 连续合并的block最终都并入链首的block，页码不同即为跨页
+    if block['page_num'] != head_block['page_num']:
+        for line in block['lines']:
             for span in line['spans']:
                 span[CROSS_PAGE] = True
-    block2['lines'].extend(block1['lines'])
-    block1['lines'] = []
-    block1[LINES_DELETED] = True
-
-    return block1, block2
-
-
-def __is_list_group(text_blocks_group):
-    # list group的特征是一个group内的所有block都满足以下条件
-    # 1.每个block都不超过3行 2. 每个block 的左边界都比较接近(逻辑简单点先不加这个规则)
-    for block in text_blocks_group:
-        if len(block['lines']) > 3:
-            return False
-    return True
-
-
-def __para_merge_page(blocks):
-    page_text_blocks_groups = __process_blocks(blocks)
-    for text_blocks_group in page_text_blocks_groups:
-        if len(text_blocks_group) > 0:
-            # 需要先在合并前对所有block判断是否为list or index block
-            for block in text_blocks_group:
-                block_type = __is_list_or_index_block(block)
-                block['type'] = block_type
-                # logger.info(f"{block['type']}:{block}")
-
-        if len(text_blocks_group) > 1:
-            # 在合并前判断这个group 是否是一个 list group
-            is_list_group = __is_list_group(text_blocks_group)
-
-            # 倒序遍历
-            for i in range(len(text_blocks_group) - 1, -1, -1):
-                current_block = text_blocks_group[i]
-
-                # 检查是否有前一个块
-                if i - 1 >= 0:
-                    prev_block = text_blocks_group[i - 1]
-
-                    if (
-                        current_block['type'] == 'text'
-                        and prev_block['type'] == 'text'
-                        and not is_list_group
-                    ):
-                        __merge_2_text_blocks(current_block, prev_block)
-                    elif (
-                        current_block['type'] == BlockType.List
-                        and prev_block['type'] == BlockType.List
-                    ) or (
-                        current_block['type'] == BlockType.Index
-                        and prev_block['type'] == BlockType.Index
-                    ):
-                        __merge_2_list_blocks(current_block, prev_block)
+    head_block['lines'].extend(block['lines'])
+    block['lines'] = []
+    block[LINES_DELETED] = True
+
+
+class ParaSplitter:
+    """按页增量地识别list/index block并合并跨页段落.
+
+    title和interline_equation把文本block分组，只有同组内相邻的同类block才会合并。
+    合并按页顺序进行，状态只有当前组的最后一个block；一组内所有block都不超过3行时视为list group，
+    其中的文本block不合并，因此在组内出现超过3行的block之前，文本合并先记录下来，组结束时再决定是否执行。
+
+    页面的para_blocks在add_page时生成，之后的页面仍可能把行合并进前面页面的block，
+    全部页面传入后调用finish。
+    """
+
+    def __init__(self):
+        self._reset_group()
+
+    def _reset_group(self):
+        self._prev_block = None
+        # 上一个block合并前的最后一行
+        self._prev_last_line = None
+        # 上一个block的行最终所在的block(合并链的链首)
+        self._prev_head = None
+        # 组内目前所有block都不超过3行
+        self._maybe_list_group = True
+        # 尚未确定是否执行的文本合并, (block, head_block)
+        self._pending_merges = []
+
+    def _close_group(self):
+        # 组内所有block都不超过3行，是list group，记录的文本合并不执行
+        self._reset_group()
+
+    def _flush_pending_merges(self):
+        for block, head_block in self._pending_merges:
+            _move_lines(block, head_block)
+        self._pending_merges = []
+
+    def _add_text_block(self, block):
+        block['bbox_fs'] = _lines_bbox(block)
+        block['type'] = _is_list_or_index_block(block)
+        last_line = block['lines'][-1] if len(block['lines']) > 0 else None
+
+        if self._maybe_list_group and len(block['lines']) > 3:
+            self._maybe_list_group = False
+            self._flush_pending_merges()
+
+        head_block = block
+        prev_block = self._prev_block
+        if prev_block is not None:
+            if block['type'] == BlockType.Text and prev_block['type'] == BlockType.Text:
+                if _can_merge_2_text_blocks(block, prev_block, self._prev_last_line):
+                    head_block = self._prev_head
+                    if self._maybe_list_group:
+                        self._pending_merges.append((block, head_block))
+                    else:
+                        _move_lines(block, head_block)
+            elif block['type'] == prev_block['type'] and block['type'] in [BlockType.List, BlockType.Index]:
+                head_block = self._prev_head
+                _move_lines(block, head_block)
+
+        self._prev_block = block
+        self._prev_last_line = last_line
+        self._prev_head = head_block
+
+    def add_page(self, page_num, page_info):
+        """Generate para_blocks of the page and merge them with the previous pages.
+
+        Args:
+            page_num (str): the page key in pdf_info_dict, such as page_0
+            page_info (dict): the page info which has preproc_blocks and page_size
+        """
+        para_blocks = []
+        for block in page_info['preproc_blocks']:
+            block = _copy_block(block)
+            block['page_num'] = page_num
+            block['page_size'] = page_info['page_size']
+            para_blocks.append(block)
 
-        else:
-            continue
+            if block['type'] in [BlockType.Title, BlockType.InterlineEquation]:
+                self._close_group()
+            elif block['type'] == BlockType.Text:
+                self._add_text_block(block)
+        page_info['para_blocks'] = para_blocks
 
+    def finish(self):
+        """Finish the last group, must be called after all pages are added."""
+        self._close_group()
 
-def para_split(pdf_info_dict):
-    all_blocks = []
-    for page_num, page in pdf_info_dict.items():
-        blocks = copy.deepcopy(page['preproc_blocks'])
-        for block in blocks:
-            block['page_num'] = page_num
-            block['page_size'] = page['page_size']
-        all_blocks.extend(blocks)
 
-    __para_merge_page(all_blocks)
+def para_split(pdf_info_dict):
+    para_splitter = ParaSplitter()
     for page_num, page in pdf_info_dict.items():
-        page['para_blocks'] = []
-        for block in all_blocks:
-            if block['page_num'] == page_num:
-                page['para_blocks'].append(block)
-
-
-if __name__ == '__main__':
-    input_blocks = []
-    # 调用函数
-    groups = __process_blocks(input_blocks)
-    for group_index, group in enumerate(groups):
-        print(f'Group {group_index}: {group}')
+        para_splitter.add_page(page_num, page)
+    para_splitter.finish()
@@ -1,6 +1,14 @@
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
 from loguru import logger
 
+import magic_pdf.model as model_config
 from magic_pdf.config.drop_reason import DropReason
+from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.data.data_reader_writer import DataWriter
+from magic_pdf.data.dataset import Dataset, ImageDataset, PymuDocDataset
 
 
 def get_data_source(jso: dict):
@@ -47,3 +55,142 @@ def spark_json_extractor(jso: dict) -> dict:
         '_pdf_type': jso['_pdf_type'],
         'model_list': jso['doc_layout_result'],
     }
+
+
+class _MemoryDataWriter(DataWriter):
+    """把pipeline写出的图片保留在内存中，随结果记录一起返回."""
+
+    def __init__(self):
+        self.files = {}
+
+    def write(self, path: str, data: bytes) -> None:
+        self.files[path] = data
+
+
+def _build_dataset(data, lang=None) -> Dataset:
+    if isinstance(data, (bytes, bytearray)):
+        return PymuDocDataset(bytes(data), lang=lang)
+    if Path(data).suffix.lower() in ('.png', '.jpg', '.jpeg'):
+        with open(data, 'rb') as f:
+            return ImageDataset(f.read(), lang=lang)
+    # pdf按路径打开，页面按需读取
+    return PymuDocDataset(str(data), lang=lang)
+
+
+def _iter_batches(records: Iterable, batch_pages: int, lang=None) -> Iterator[list]:
+    """把记录按页数攒成批次，总页数达到batch_pages时结束当前批次，文档不会被拆分.
+
+    无法打开的文档以异常的形式留在批次中，保持输入的顺序。
+    """
+    batch, pages = [], 0
+    for record_id, data in records:
+        try:
+            dataset = _build_dataset(data, lang)
+            pages += len(dataset)
+        except Exception as e:
+            dataset = e
+        batch.append((record_id, dataset))
+        if pages >= batch_pages:
+            yield batch
+            batch, pages = [], 0
+    if batch:
+        yield batch
+
+
+def _use_ocr(dataset: Dataset, parse_method: str) -> bool:
+    if parse_method == 'auto':
+        return dataset.classify() == SupportedPdfParseMethod.OCR
+    return parse_method == 'ocr'
+
+
+def process_partition(
+    records: Iterable,
+    parse_method: str = 'auto',
+    lang=None,
+    batch_pages: int | None = None,
+    image_dir: str = 'images',
+    image_writer_factory: Callable[[str], DataWriter] | None = None,
+    layout_model=None,
+    formula_enable=None,
+    table_enable=None,
+) -> Iterator[dict]:
+    """在executor中解析一个分区的文档，用于rdd.mapPartitions.
+
+    模型由ModelSingleton在进程内缓存，python worker被复用(spark.python.worker.reuse，默认开启)时
+    每个executor进程只加载一次。分区内多个文档的页面合并成批次推理，批次的总页数由batch_pages控制。
+    单个文档失败不影响其他文档，失败的记录由exception_handler标记为_need_drop。
+
+    Example:
+        rdd.mapPartitions(functools.partial(process_partition, parse_method='ocr'))
+
+    Args:
+        records (Iterable): (id, data) tuples, data is the pdf bytes or the local path of a pdf or image file
+        parse_method (str, optional): auto, txt or ocr. Defaults to 'auto'.
+        lang (str, optional): the language of the documents. Defaults to None.
+        batch_pages (int, optional): the number of pages inferred together across documents,
+            MINERU_MIN_BATCH_INFERENCE_SIZE (default 200) is used if None. Defaults to None.
+        image_dir (str, optional): the image path prefix in the markdown and content list. Defaults to 'images'.
+        image_writer_factory (Callable[[str], DataWriter], optional): create the image writer of a record from
+            its id, the images are returned in the 'images' field of the record if None. Defaults to None.
+        layout_model, formula_enable, table_enable: same as batch_doc_analyze
+
+    Returns:
+        Iterator[dict]: one record per input, with id, parse_type, markdown, content_list and middle_json,
+            or id, _need_drop, _drop_reason and _exception if the document failed
+    """
+    from magic_pdf.model.doc_analyze_by_custom_model import batch_doc_analyze
+
+    model_config.__use_inside_model__ = True
+    model_config.__model_mode__ = 'full'
+    if batch_pages is None:
+        batch_pages = int(os.environ.get('MINERU_MIN_BATCH_INFERENCE_SIZE', 200))
+
+    def analyze(datasets):
+        return batch_doc_analyze(
+            datasets, parse_method, lang=lang,
+            layout_model=layout_model, formula_enable=formula_enable, table_enable=table_enable,
+        )
+
+    for batch in _iter_batches(records, batch_pages, lang):
+        # 批次内按位置对应，记录id可以重复
+        valid = [i for i, (_, dataset) in enumerate(batch) if isinstance(dataset, Dataset)]
+        try:
+            infer_results = dict(zip(valid, analyze([batch[i][1] for i in valid]))) if valid else {}
+        except Exception as e:
+            # 批次推理失败时逐个文档重试，找出出错的文档
+            logger.warning(f'batch inference of {len(valid)} documents failed ({e}), retry one by one')
+            infer_results = {}
+            for i in valid:
+                try:
+                    infer_results[i] = analyze([batch[i][1]])[0]
+                except Exception as e:
+                    infer_results[i] = e
+
+        for i, (record_id, dataset) in enumerate(batch):
+            result = infer_results.get(i, dataset)
+            if isinstance(result, Exception):
+                yield exception_handler({'id': record_id}, result)
+                continue
+            try:
+                if image_writer_factory is None:
+                    image_writer = _MemoryDataWriter()
+                else:
+                    image_writer = image_writer_factory(record_id)
+                if _use_ocr(dataset, parse_method):
+                    pipe_result = result.pipe_ocr_mode(image_writer, lang=lang)
+                    parse_type = 'ocr'
+                else:
+                    pipe_result = result.pipe_txt_mode(image_writer, lang=lang)
+                    parse_type = 'txt'
+                record = {
+                    'id': record_id,
+                    'parse_type': parse_type,
+                    'markdown': pipe_result.get_markdown(image_dir),
+                    'content_list': pipe_result.get_content_list(image_dir),
+                    'middle_json': pipe_result.get_middle_json(),
+                }
+                if isinstance(image_writer, _MemoryDataWriter):
+                    record['images'] = image_writer.files
+                yield record
+            except Exception as e:
+                yield exception_handler({'id': record_id}, e)
@@ -4,16 +4,17 @@ import tempfile
 from pathlib import Path
 
 import click
-import fitz
 from loguru import logger
 
 import magic_pdf.model as model_config
 from magic_pdf.data.batch_build_dataset import batch_build_dataset
 from magic_pdf.data.data_reader_writer import FileBasedDataReader
-from magic_pdf.data.dataset import Dataset
+from magic_pdf.data.dataset import Dataset, ImageDataset
+from magic_pdf.libs.stage_profiler import parse_page_range
 from magic_pdf.libs.version import __version__
 from magic_pdf.tools.common import batch_do_parse, do_parse, parse_pdf_methods
-from magic_pdf.utils.office_to_pdf import convert_file_to_pdf
+from magic_pdf.utils.office_to_pdf import (convert_file_to_pdf,
+                                          convert_files_to_pdf)
 
 pdf_suffixes = ['.pdf']
 ms_office_suffixes = ['.ppt', '.pptx', '.doc', '.docx']
@@ -89,22 +90,53 @@ without method specified, auto will be used by default.""",
     help='The ending page for PDF parsing, beginning from 0.',
     default=None,
 )
-def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
+@click.option(
+    '--profile-dir',
+    'profile_dir',
+    type=click.Path(),
+    help="""Profile each pipeline stage and save the collapsed stacks (flamegraph compatible)
+    and the top functions of each stage into this directory. Same as MINERU_PROFILE_DIR.""",
+    default=None,
+)
+@click.option(
+    '--profile-pages',
+    'profile_pages',
+    type=str,
+    help='Only profile the stages processing these pages, e.g. "3" or "3-5", beginning from 0. Same as MINERU_PROFILE_PAGES.',
+    default=None,
+)
+@click.option(
+    '--memory-report',
+    'memory_report',
+    type=click.Path(),
+    help="""Record the RSS and device memory delta and peak of each pipeline stage per document,
+    and append the report as json lines to this file. Same as MINERU_MEMORY_REPORT.""",
+    default=None,
+)
+def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id, profile_dir, profile_pages, memory_report):
     os.makedirs(output_dir, exist_ok=True)
+    # 通过环境变量开启，子进程也会继承
+    if profile_dir:
+        os.environ['MINERU_PROFILE_DIR'] = os.path.abspath(profile_dir)
+    if profile_pages:
+        try:
+            parse_page_range(profile_pages)
+        except ValueError:
+            raise click.BadParameter(f'invalid page range: {profile_pages}', param_hint='--profile-pages')
+        os.environ['MINERU_PROFILE_PAGES'] = profile_pages
+    if memory_report:
+        os.environ['MINERU_MEMORY_REPORT'] = os.path.abspath(memory_report)
     temp_dir = tempfile.mkdtemp()
     def read_fn(path: Path):
         if path.suffix in ms_office_suffixes:
-            convert_file_to_pdf(str(path), temp_dir)
-            fn = os.path.join(temp_dir, f'{path.stem}.pdf')
+            fn = convert_file_to_pdf(str(path), temp_dir)
         elif path.suffix in image_suffixes:
+            # 图片直接解码，不转换成pdf
             with open(str(path), 'rb') as f:
-                bits = f.read()
-            pdf_bytes = fitz.open(stream=bits).convert_to_pdf()
-            fn = os.path.join(temp_dir, f'{path.stem}.pdf')
-            with open(fn, 'wb') as f:
-                f.write(pdf_bytes)
+                return ImageDataset(f.read(), lang=lang)
         elif path.suffix in pdf_suffixes:
-            fn = str(path)
+            # pdf按路径打开，只读取需要解析的页面
+            return str(path)
         else:
             raise Exception(f'Unknown file suffix: {path.suffix}')
 
@@ -134,22 +166,19 @@ def cli(path, output_dir, method, lang, debug_able, start_page_id, end_page_id):
             logger.exception(e)
 
     if os.path.isdir(path):
-        doc_paths = []
-        for doc_path in Path(path).glob('*'):
-            if doc_path.suffix in pdf_suffixes + image_suffixes + ms_office_suffixes:
-                if doc_path.suffix in ms_office_suffixes:
-                    convert_file_to_pdf(str(doc_path), temp_dir)
-                    doc_path = Path(os.path.join(temp_dir, f'{doc_path.stem}.pdf'))
-                elif doc_path.suffix in image_suffixes:
-                    with open(str(doc_path), 'rb') as f:
-                        bits = f.read()
-                        pdf_bytes = fitz.open(stream=bits).convert_to_pdf()
-                    fn = os.path.join(temp_dir, f'{doc_path.stem}.pdf')
-                    with open(fn, 'wb') as f:
-                        f.write(pdf_bytes)
-                    doc_path = Path(fn)
-                doc_paths.append(doc_path)
-        datasets = batch_build_dataset(doc_paths, 4, lang)
+        image_datasets = {}
+        doc_paths = [p for p in Path(path).glob('*') if p.suffix in pdf_suffixes + image_suffixes + ms_office_suffixes]
+        # office文件由转换进程池并发转换
+        office_paths = [p for p in doc_paths if p.suffix in ms_office_suffixes]
+        converted = dict(zip(office_paths, map(Path, convert_files_to_pdf([str(p) for p in office_paths], temp_dir))))
+        for i, doc_path in enumerate(doc_paths):
+            if doc_path in converted:
+                doc_paths[i] = converted[doc_path]
+            elif doc_path.suffix in image_suffixes:
+                with open(str(doc_path), 'rb') as f:
+                    image_datasets[doc_path] = ImageDataset(f.read(), lang=lang)
+        pdf_datasets = iter(batch_build_dataset([p for p in doc_paths if p not in image_datasets], 4, lang))
+        datasets = [image_datasets[p] if p in image_datasets else next(pdf_datasets) for p in doc_paths]
         batch_do_parse(output_dir, [str(doc_path.stem) for doc_path in doc_paths], datasets, method, debug_able, lang=lang)
     else:
         parse_doc(Path(path))
@@ -1,12 +1,21 @@
 import json as json_parse
 import os
+import sys
 from pathlib import Path
 
 import click
 
 import magic_pdf.model as model_config
-from magic_pdf.data.data_reader_writer import FileBasedDataReader, S3DataReader
+from magic_pdf.bench.e2e import BENCH_MODELS, run_e2e_benchmark
+from magic_pdf.bench.micro import (load_fixtures, run_microbenchmark,
+                                   synthetic_fixtures)
+from magic_pdf.bench.report import compare_reports
+from magic_pdf.bench.synthetic import DOC_KINDS
+from magic_pdf.data.data_reader_writer import (FileBasedDataReader,
+                                               FileBasedDataWriter,
+                                               S3DataReader)
 from magic_pdf.libs.config_reader import get_s3_config
+from magic_pdf.libs.draw_bbox import OVERLAY_DRAWERS, draw_overlays
 from magic_pdf.libs.path_utils import (parse_s3_range_params, parse_s3path,
                                        remove_non_official_s3_args)
 from magic_pdf.libs.version import __version__
@@ -145,5 +154,170 @@ def pdf(pdf, json_data, output_dir, method):
     )
 
 
+@cli.command()
+@click.option(
+    '-p',
+    '--pdf',
+    'pdf',
+    type=click.Path(exists=True),
+    required=True,
+    help='解析时使用的 PDF 文件，例如输出目录中的 *_origin.pdf',
+)
+@click.option(
+    '-j',
+    '--json',
+    'json_data',
+    type=click.Path(exists=True),
+    required=True,
+    help='中间json(*_middle.json)',
+)
+@click.option('-o',
+              '--output-dir',
+              'output_dir',
+              type=click.Path(),
+              required=True,
+              help='本地输出目录')
+@click.option(
+    '-t',
+    '--type',
+    'overlay_types',
+    type=click.Choice(list(OVERLAY_DRAWERS)),
+    multiple=True,
+    default=['layout', 'span'],
+    show_default=True,
+    help='绘制的bbox类型，可以指定多次',
+)
+def draw(pdf, json_data, output_dir, overlay_types):
+    """根据中间json绘制layout、span、line sort的调试pdf，不需要重新解析."""
+    reader = FileBasedDataReader()
+    middle_json = json_parse.loads(reader.read(json_data).decode('utf-8'))
+    file_name = Path(json_data).name.split('.')[0]
+    if file_name.endswith('_middle'):
+        file_name = file_name[:-len('_middle')]
+    os.makedirs(output_dir, exist_ok=True)
+    overlay_suffixes = {'layout': 'layout', 'span': 'spans', 'line_sort': 'line_sort'}
+    draw_overlays(
+        middle_json['pdf_info'],
+        reader.read(pdf),
+        {
+            overlay_type: os.path.join(output_dir, f'{file_name}_{overlay_suffixes[overlay_type]}.pdf')
+            for overlay_type in overlay_types
+        },
+    )
+
+
+def _output_report(report, output_path, baseline, threshold):
+    report_json = json_parse.dumps(report, ensure_ascii=False, indent=4)
+    if output_path:
+        FileBasedDataWriter().write_string(output_path, report_json)
+    else:
+        sys.stdout.write(report_json + '\n')
+    if baseline is None:
+        return
+    rows = compare_reports(
+        json_parse.loads(FileBasedDataReader().read(baseline).decode('utf-8')), report, threshold
+    )
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else ''
+        click.echo(
+            f"{row['name']:<24} {row['stage']:<24} {row['baseline']:>12.3f} {row['current']:>12.3f} {row['ratio']:>8.3f} {flag}",
+            err=True,
+        )
+    if any(row['regression'] for row in rows):
+        sys.exit(1)
+
+
+@cli.command()
+@click.option(
+    '-k',
+    '--kind',
+    'kinds',
+    type=click.Choice(list(DOC_KINDS)),
+    multiple=True,
+    default=list(DOC_KINDS),
+    show_default=True,
+    help='合成文档的类型，可以指定多次',
+)
+@click.option('-n', '--pages', 'page_count', type=int, default=8, show_default=True, help='每个文档的页数')
+@click.option('-r', '--repeat', 'repeat', type=int, default=3, show_default=True, help='每个文档计时的运行次数')
+@click.option('--warmup', 'warmup', type=int, default=1, show_default=True, help='计时前的预热运行次数')
+@click.option('--seed', 'seed', type=int, default=0, show_default=True, help='合成文档的随机种子')
+@click.option(
+    '--model',
+    'model',
+    type=click.Choice(list(BENCH_MODELS)),
+    default='synthetic',
+    show_default=True,
+    help='synthetic: 由合成文档的真实版面直接生成模型结果，不需要模型权重; full: 使用配置的模型推理',
+)
+@click.option(
+    '-m',
+    '--method',
+    'method',
+    type=parse_pdf_methods,
+    help='指定解析方法。txt: 文本型 pdf 解析方法， ocr: 光学识别解析 pdf, auto: 程序智能选择解析方法',
+    default='auto',
+)
+@click.option('-o', '--output', 'output_path', type=click.Path(), help='报告json的输出路径，默认输出到标准输出')
+@click.option('-b', '--baseline', 'baseline', type=click.Path(exists=True), help='与之比较的基线报告json')
+@click.option('--threshold', 'threshold', type=float, default=0.1, show_default=True, help='与基线相比变慢超过该比例视为性能回退')
+def bench(kinds, page_count, repeat, warmup, seed, model, method, output_path, baseline, threshold):
+    """在合成文档上运行端到端性能测试，输出吞吐、各阶段耗时分位数和峰值内存的json报告."""
+    model_config.__use_inside_model__ = True
+    report = run_e2e_benchmark(
+        kinds=kinds,
+        page_count=page_count,
+        repeat=repeat,
+        warmup=warmup,
+        seed=seed,
+        model=model,
+        parse_method=method,
+    )
+    _output_report(report, output_path, baseline, threshold)
+
+
+@cli.command()
+@click.option(
+    '-i',
+    '--input',
+    'input_paths',
+    type=click.Path(exists=True),
+    multiple=True,
+    help='保存的模型json(*_model.json / *.model.json)或其所在目录，需要同目录下有对应的pdf，可以指定多次',
+)
+@click.option(
+    '-k',
+    '--kind',
+    'kinds',
+    type=click.Choice(list(DOC_KINDS)),
+    multiple=True,
+    help='同时测试的合成文档类型，可以指定多次；未指定输入和类型时测试全部合成文档',
+)
+@click.option('-n', '--pages', 'page_count', type=int, default=8, show_default=True, help='合成文档的页数')
+@click.option('-r', '--repeat', 'repeat', type=int, default=5, show_default=True, help='每个阶段计时的运行次数')
+@click.option('--warmup', 'warmup', type=int, default=1, show_default=True, help='计时前的预热运行次数')
+@click.option('--no-alloc', 'no_alloc', is_flag=True, help='不统计内存分配')
+@click.option(
+    '-m',
+    '--method',
+    'method',
+    type=parse_pdf_methods,
+    help='指定解析方法。txt: 文本型 pdf 解析方法， ocr: 光学识别解析 pdf, auto: 程序智能选择解析方法',
+    default='auto',
+)
+@click.option('-o', '--output', 'output_path', type=click.Path(), help='报告json的输出路径，默认输出到标准输出')
+@click.option('-b', '--baseline', 'baseline', type=click.Path(exists=True), help='与之比较的基线报告json')
+@click.option('--threshold', 'threshold', type=float, default=0.1, show_default=True, help='与基线相比变慢超过该比例视为性能回退')
+def microbench(input_paths, kinds, page_count, repeat, warmup, no_alloc, method, output_path, baseline, threshold):
+    """用保存的模型结果测试各后处理阶段的耗时和内存分配，不需要模型."""
+    fixtures = load_fixtures(list(input_paths))
+    if kinds or not input_paths:
+        fixtures += synthetic_fixtures(kinds or DOC_KINDS, page_count)
+    report = run_microbenchmark(
+        fixtures, repeat=repeat, warmup=warmup, parse_method=method, track_allocations=not no_alloc
+    )
+    _output_report(report, output_path, baseline, threshold)
+
+
 if __name__ == '__main__':
     cli()
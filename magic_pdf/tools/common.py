@@ -1,3 +1,4 @@
+import copy
 import os
 
 import click
@@ -5,13 +6,16 @@ import fitz
 from loguru import logger
 
 import magic_pdf.model as model_config
+from magic_pdf.config.constants import PARSE_TYPE_OCR, PARSE_TYPE_TXT
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.config.make_content_config import DropMode, MakeMode
 from magic_pdf.data.data_reader_writer import FileBasedDataWriter
 from magic_pdf.data.dataset import Dataset, PymuDocDataset
 from magic_pdf.libs.draw_bbox import draw_char_bbox
+from magic_pdf.libs.version import __version__
 from magic_pdf.model.doc_analyze_by_custom_model import (batch_doc_analyze,
                                                          doc_analyze)
+from magic_pdf.post_proc.para_split_v3 import para_split
 
 # from io import BytesIO
 # from pypdf import PdfReader, PdfWriter
@@ -67,6 +71,90 @@ def convert_pdf_bytes_to_bytes_by_pymupdf(pdf_bytes, start_page_id=0, end_page_i
     return output_bytes
 
 
+def stream_analyze(
+    dataset: Dataset,
+    parse_method,
+    image_writer,
+    image_dir,
+    page_callback,
+    start_page_id=0,
+    end_page_id=None,
+    lang=None,
+    layout_model=None,
+    formula_enable=None,
+    table_enable=None,
+    window_size=None,
+):
+    """按页面窗口交替执行推理和后处理，每处理完一页就回调该页的内容，缩短拿到第一页结果的等待时间.
+
+    page_callback(page_id, md_content, content_list)收到的是该页单独分段的结果，
+    跨页的段落合并在所有页面处理完之后进行，最终内容以返回的pipe_result为准。
+    窗口大小默认读取环境变量MINERU_STREAM_WINDOW_SIZE，未设置时为8页。
+
+    Returns:
+        tuple[InferenceResult, PipeResult]: 与doc_analyze和pipe_txt_mode/pipe_ocr_mode的结果相同
+    """
+    from magic_pdf.operators.models import InferenceResult
+    from magic_pdf.operators.pipes import PipeResult
+    from magic_pdf.pdf_parse_union_core_v2 import pdf_parse_union_by_windows
+
+    if parse_method == 'auto':
+        ocr = dataset.classify() == SupportedPdfParseMethod.OCR
+    else:
+        ocr = parse_method == 'ocr'
+    if window_size is None:
+        window_size = int(os.environ.get('MINERU_STREAM_WINDOW_SIZE', 8))
+    window_size = max(1, window_size)
+    if end_page_id is None or end_page_id < 0 or end_page_id > len(dataset) - 1:
+        end_page_id = len(dataset) - 1
+
+    model_list = [
+        {'layout_dets': [], 'page_info': {'page_no': index, 'width': 0, 'height': 0}}
+        for index in range(len(dataset))
+    ]
+
+    def model_windows():
+        for window_start in range(start_page_id, end_page_id + 1, window_size):
+            window_end = min(window_start + window_size - 1, end_page_id)
+            infer_result = doc_analyze(
+                dataset,
+                ocr=ocr,
+                start_page_id=window_start,
+                end_page_id=window_end,
+                lang=lang,
+                layout_model=layout_model,
+                formula_enable=formula_enable,
+                table_enable=table_enable,
+            )
+            window_model_list = infer_result.get_infer_res()
+            # MagicModel会原地修改模型结果，保留一份原始结果用于dump_model
+            model_list[window_start:window_end + 1] = copy.deepcopy(window_model_list[window_start:window_end + 1])
+            yield window_start, window_end, window_model_list
+
+    def on_page(page_id, page_info):
+        para_split({f'page_{page_id}': page_info})
+        page_result = PipeResult({'pdf_info': [page_info]}, dataset)
+        page_callback(
+            page_id,
+            page_result.get_markdown(image_dir),
+            page_result.get_content_list(image_dir),
+        )
+
+    res = pdf_parse_union_by_windows(
+        model_windows(),
+        dataset,
+        image_writer,
+        SupportedPdfParseMethod.OCR if ocr else SupportedPdfParseMethod.TXT,
+        lang=lang,
+        page_callback=on_page,
+    )
+    res['_parse_type'] = PARSE_TYPE_OCR if ocr else PARSE_TYPE_TXT
+    res['_version_name'] = __version__
+    if lang is not None:
+        res['lang'] = lang
+    return InferenceResult(model_list, dataset), PipeResult(res, dataset)
+
+
 def _do_parse(
     output_dir,
     pdf_file_name,
@@ -91,6 +179,8 @@ def _do_parse(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    page_callback=None,
+    f_draw_deferred=None,
 ):
     from magic_pdf.operators.models import InferenceResult
     if debug_able:
@@ -99,14 +189,11 @@ def _do_parse(
         f_draw_line_sort_bbox = True
         # f_draw_char_bbox = True
 
-    if isinstance(pdf_bytes_or_dataset, bytes):
-        pdf_bytes = convert_pdf_bytes_to_bytes_by_pymupdf(
-            pdf_bytes_or_dataset, start_page_id, end_page_id
-        )
-        ds = PymuDocDataset(pdf_bytes, lang=lang)
-    else:
+    if isinstance(pdf_bytes_or_dataset, Dataset):
         ds = pdf_bytes_or_dataset
-    pdf_bytes = ds._raw_data
+    else:
+        # 只打开需要的页面，不重新生成pdf
+        ds = PymuDocDataset(pdf_bytes_or_dataset, lang=lang, start_page_id=start_page_id, end_page_id=end_page_id)
     local_image_dir, local_md_dir = prepare_env(output_dir, pdf_file_name, parse_method)
 
     image_writer, md_writer = FileBasedDataWriter(local_image_dir), FileBasedDataWriter(local_md_dir)
@@ -114,7 +201,19 @@ def _do_parse(
 
     if len(model_list) == 0:
         if model_config.__use_inside_model__:
-            if parse_method == 'auto':
+            if page_callback is not None and parse_method in ['auto', 'txt', 'ocr']:
+                infer_result, pipe_result = stream_analyze(
+                    ds,
+                    parse_method,
+                    image_writer,
+                    image_dir,
+                    page_callback,
+                    lang=ds._lang,
+                    layout_model=layout_model,
+                    formula_enable=formula_enable,
+                    table_enable=table_enable,
+                )
+            elif parse_method == 'auto':
                 if ds.classify() == SupportedPdfParseMethod.TXT:
                     infer_result = ds.apply(
                         doc_analyze,
@@ -197,32 +296,29 @@ def _do_parse(
             os.path.join(local_md_dir, f'{pdf_file_name}_model.pdf')
         )
 
-    if f_draw_layout_bbox:
-        pipe_result.draw_layout(
-            os.path.join(local_md_dir, f'{pdf_file_name}_layout.pdf')
-        )
-    if f_draw_span_bbox:
-        pipe_result.draw_span(os.path.join(local_md_dir, f'{pdf_file_name}_spans.pdf'))
-
-    if f_draw_line_sort_bbox:
-        pipe_result.draw_line_sort(
-            os.path.join(local_md_dir, f'{pdf_file_name}_line_sort.pdf')
-        )
+    # deferred时layout、span和line sort在后台进程中绘制，不阻塞解析
+    if f_draw_deferred is None:
+        f_draw_deferred = os.getenv('MINERU_DEFERRED_DRAW', '').lower() in ['1', 'true']
+    pipe_result.draw_all(
+        layout_file_path=os.path.join(local_md_dir, f'{pdf_file_name}_layout.pdf') if f_draw_layout_bbox else None,
+        span_file_path=os.path.join(local_md_dir, f'{pdf_file_name}_spans.pdf') if f_draw_span_bbox else None,
+        line_sort_file_path=os.path.join(local_md_dir, f'{pdf_file_name}_line_sort.pdf') if f_draw_line_sort_bbox else None,
+        deferred=f_draw_deferred,
+    )
 
     if f_draw_char_bbox:
-        draw_char_bbox(pdf_bytes, local_md_dir, f'{pdf_file_name}_char_bbox.pdf')
-
-    if f_dump_md:
-        pipe_result.dump_md(
-            md_writer,
-            f'{pdf_file_name}.md',
-            image_dir,
-            drop_mode=DropMode.NONE,
-            md_make_mode=f_make_md_mode,
-        )
-
-    if f_dump_middle_json:
-        pipe_result.dump_middle_json(md_writer, f'{pdf_file_name}_middle.json')
+        draw_char_bbox(ds.data_bits(), local_md_dir, f'{pdf_file_name}_char_bbox.pdf')
+
+    # md、content_list和middle json在一次遍历中导出
+    pipe_result.dump_all(
+        md_writer,
+        image_dir,
+        md_file_path=f'{pdf_file_name}.md' if f_dump_md else None,
+        content_list_file_path=f'{pdf_file_name}_content_list.json' if f_dump_content_list else None,
+        middle_json_file_path=f'{pdf_file_name}_middle.json' if f_dump_middle_json else None,
+        drop_mode=DropMode.NONE,
+        md_make_mode=f_make_md_mode,
+    )
 
     if f_dump_model_json:
         infer_result.dump_model(md_writer, f'{pdf_file_name}_model.json')
@@ -230,14 +326,7 @@ def _do_parse(
     if f_dump_orig_pdf:
         md_writer.write(
             f'{pdf_file_name}_origin.pdf',
-            pdf_bytes,
-        )
-
-    if f_dump_content_list:
-        pipe_result.dump_content_list(
-            md_writer,
-            f'{pdf_file_name}_content_list.json',
-            image_dir
+            ds.data_bits(),
         )
 
     logger.info(f'local output dir is {local_md_dir}')
@@ -266,22 +355,22 @@ def do_parse(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    page_callback=None,
+    f_draw_deferred=None,
 ):
     parallel_count = 1
     if os.environ.get('MINERU_PARALLEL_INFERENCE_COUNT'):
         parallel_count = int(os.environ['MINERU_PARALLEL_INFERENCE_COUNT'])
 
-    if parallel_count > 1:
-        if isinstance(pdf_bytes_or_dataset, bytes):
-            pdf_bytes = convert_pdf_bytes_to_bytes_by_pymupdf(
-                pdf_bytes_or_dataset, start_page_id, end_page_id
-            )
-            ds = PymuDocDataset(pdf_bytes, lang=lang)
-        else:
+    # 逐页回调需要边推理边后处理，不走批量推理
+    if parallel_count > 1 and page_callback is None:
+        if isinstance(pdf_bytes_or_dataset, Dataset):
             ds = pdf_bytes_or_dataset
-        batch_do_parse(output_dir, [pdf_file_name], [ds], parse_method, debug_able, f_draw_span_bbox=f_draw_span_bbox, f_draw_layout_bbox=f_draw_layout_bbox, f_dump_md=f_dump_md, f_dump_middle_json=f_dump_middle_json, f_dump_model_json=f_dump_model_json, f_dump_orig_pdf=f_dump_orig_pdf, f_dump_content_list=f_dump_content_list, f_make_md_mode=f_make_md_mode, f_draw_model_bbox=f_draw_model_bbox, f_draw_line_sort_bbox=f_draw_line_sort_bbox, f_draw_char_bbox=f_draw_char_bbox, lang=lang)
+        else:
+            ds = PymuDocDataset(pdf_bytes_or_dataset, lang=lang, start_page_id=start_page_id, end_page_id=end_page_id)
+        batch_do_parse(output_dir, [pdf_file_name], [ds], parse_method, debug_able, f_draw_span_bbox=f_draw_span_bbox, f_draw_layout_bbox=f_draw_layout_bbox, f_dump_md=f_dump_md, f_dump_middle_json=f_dump_middle_json, f_dump_model_json=f_dump_model_json, f_dump_orig_pdf=f_dump_orig_pdf, f_dump_content_list=f_dump_content_list, f_make_md_mode=f_make_md_mode, f_draw_model_bbox=f_draw_model_bbox, f_draw_line_sort_bbox=f_draw_line_sort_bbox, f_draw_char_bbox=f_draw_char_bbox, lang=lang, f_draw_deferred=f_draw_deferred)
     else:
-        _do_parse(output_dir, pdf_file_name, pdf_bytes_or_dataset, model_list, parse_method, debug_able, start_page_id=start_page_id, end_page_id=end_page_id, lang=lang, layout_model=layout_model, formula_enable=formula_enable, table_enable=table_enable,  f_draw_span_bbox=f_draw_span_bbox, f_draw_layout_bbox=f_draw_layout_bbox, f_dump_md=f_dump_md, f_dump_middle_json=f_dump_middle_json, f_dump_model_json=f_dump_model_json, f_dump_orig_pdf=f_dump_orig_pdf, f_dump_content_list=f_dump_content_list, f_make_md_mode=f_make_md_mode, f_draw_model_bbox=f_draw_model_bbox, f_draw_line_sort_bbox=f_draw_line_sort_bbox, f_draw_char_bbox=f_draw_char_bbox)
+        _do_parse(output_dir, pdf_file_name, pdf_bytes_or_dataset, model_list, parse_method, debug_able, start_page_id=start_page_id, end_page_id=end_page_id, lang=lang, layout_model=layout_model, formula_enable=formula_enable, table_enable=table_enable,  f_draw_span_bbox=f_draw_span_bbox, f_draw_layout_bbox=f_draw_layout_bbox, f_dump_md=f_dump_md, f_dump_middle_json=f_dump_middle_json, f_dump_model_json=f_dump_model_json, f_dump_orig_pdf=f_dump_orig_pdf, f_dump_content_list=f_dump_content_list, f_make_md_mode=f_make_md_mode, f_draw_model_bbox=f_draw_model_bbox, f_draw_line_sort_bbox=f_draw_line_sort_bbox, f_draw_char_bbox=f_draw_char_bbox, page_callback=page_callback, f_draw_deferred=f_draw_deferred)
 
 
 def batch_do_parse(
@@ -305,13 +394,14 @@ def batch_do_parse(
     layout_model=None,
     formula_enable=None,
     table_enable=None,
+    f_draw_deferred=None,
 ):
     dss = []
     for v in pdf_bytes_or_datasets:
-        if isinstance(v, bytes):
-            dss.append(PymuDocDataset(v, lang=lang))
-        else:
+        if isinstance(v, Dataset):
             dss.append(v)
+        else:
+            dss.append(PymuDocDataset(v, lang=lang))
 
     infer_results = batch_doc_analyze(dss, parse_method, lang=lang, layout_model=layout_model, formula_enable=formula_enable, table_enable=table_enable)
     for idx, infer_result in enumerate(infer_results):
@@ -334,6 +424,7 @@ def batch_do_parse(
             f_draw_line_sort_bbox=f_draw_line_sort_bbox,
             f_draw_char_bbox=f_draw_char_bbox,
             lang=lang,
+            f_draw_deferred=f_draw_deferred,
         )
 
 
@@ -1,8 +1,17 @@
+import atexit
 import os
-import subprocess
 import platform
-from pathlib import Path
+import queue
 import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import Future
+from pathlib import Path
 
 from loguru import logger
 
@@ -88,28 +97,379 @@ def get_soffice_command():
             raise ConvertToPdfError(f"Error locating LibreOffice: {str(e)}")
 
 
-def convert_file_to_pdf(input_path, output_dir):
-    """Convert a single document (ppt, doc, etc.) to PDF."""
-    if not os.path.isfile(input_path):
-        raise FileNotFoundError(f"The input file {input_path} does not exist.")
+# soffice --convert-to的默认输出文件名
+def _pdf_output_path(input_path, output_dir) -> str:
+    return os.path.join(str(output_dir), f'{Path(input_path).stem}.pdf')
 
-    os.makedirs(output_dir, exist_ok=True)
 
-    check_fonts_installed()
+def _import_uno():
+    try:
+        import uno
+        return uno
+    except ImportError:
+        return None
 
-    soffice_cmd = get_soffice_command()
 
-    cmd = [
-        soffice_cmd,
-        '--headless',
-        '--norestore',
-        '--invisible',
-        '--convert-to', 'pdf',
-        '--outdir', str(output_dir),
-        str(input_path)
-    ]
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+_command_fallback_warned = False
+
+
+class _OfficeWorker:
+    """一个常驻的转换进程，有自己的用户配置目录，多个worker可以同时转换.
+
+    能导入uno(LibreOffice自带的Python绑定)时，soffice以监听模式常驻，通过UNO加载和导出文档；
+    否则安装了unoserver时，每个worker常驻一个unoserver(它用LibreOffice自带的Python启动soffice)，通过XML-RPC转换；
+    两者都没有时才每个任务执行一次 soffice --convert-to，只复用已经初始化好的用户配置目录。
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.profile_dir = tempfile.mkdtemp(prefix=f'mineru_soffice_{index}_')
+        self._pipe_name = f'mineru_soffice_{os.getpid()}_{index}'
+        self._uno = _import_uno()
+        self._unoserver = shutil.which('unoserver') if self._uno is None else None
+        self._process = None
+        self._desktop = None
+        self._rpc_url = None
+
+    def _base_cmd(self) -> list[str]:
+        return [
+            get_soffice_command(),
+            f'-env:UserInstallation={Path(self.profile_dir).as_uri()}',
+            '--headless',
+            '--norestore',
+            '--invisible',
+            '--nologo',
+            '--nodefault',
+        ]
+
+    def convert(self, input_path, output_dir, timeout: float) -> str:
+        if self._uno is not None:
+            return self._convert_by_uno(input_path, output_dir, timeout)
+        if self._unoserver is not None:
+            return self._convert_by_unoserver(input_path, output_dir, timeout)
+        global _command_fallback_warned
+        if not _command_fallback_warned:
+            _command_fallback_warned = True
+            logger.warning('neither uno nor unoserver is available, every document starts a new LibreOffice process, '
+                           'install unoserver to keep the converter processes alive')
+        return self._convert_by_command(input_path, output_dir, timeout)
+
+    def _convert_by_command(self, input_path, output_dir, timeout: float) -> str:
+        cmd = self._base_cmd() + ['--convert-to', 'pdf', '--outdir', str(output_dir), str(input_path)]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_tree(process)
+            process.communicate()
+            raise ConvertToPdfError(f'LibreOffice convert timeout after {timeout}s: {input_path}')
+        output_path = _pdf_output_path(input_path, output_dir)
+        if process.returncode != 0 or not os.path.exists(output_path):
+            raise ConvertToPdfError(f'LibreOffice convert failed: {stderr.decode(errors="replace")}')
+        return output_path
+
+    def _start(self, timeout: float):
+        self.stop()
+        cmd = self._base_cmd() + [f'--accept=pipe,name={self._pipe_name};urp;StarOffice.ComponentContext']
+        self._process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+        local_ctx = self._uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local_ctx)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f'uno:pipe,name={self._pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                # 首次启动需要初始化用户配置目录，等待监听就绪
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConvertToPdfError('LibreOffice listener failed to start')
+                time.sleep(0.2)
+        self._desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+        logger.info(f'LibreOffice worker {self.index} started, pid: {self._process.pid}')
+
+    def _props(self, **kwargs):
+        props = []
+        for name, value in kwargs.items():
+            prop = self._uno.createUnoStruct('com.sun.star.beans.PropertyValue')
+            prop.Name = name
+            prop.Value = value
+            props.append(prop)
+        return tuple(props)
+
+    def _call_with_watchdog(self, action, input_path, timeout: float):
+        # 超时后杀掉常驻进程，阻塞中的调用会随之失败，下一个任务会重新启动进程
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            self.stop()
+
+        watchdog = threading.Timer(timeout, on_timeout)
+        watchdog.start()
+        try:
+            return action()
+        except ConvertToPdfError:
+            raise
+        except Exception as e:
+            if timed_out.is_set():
+                raise ConvertToPdfError(f'LibreOffice convert timeout after {timeout}s: {input_path}')
+            # 进程崩溃或连接断开，重启后由调用方重试
+            self.stop()
+            raise _WorkerCrashed(str(e)) from e
+        finally:
+            watchdog.cancel()
+
+    def _convert_by_uno(self, input_path, output_dir, timeout: float) -> str:
+        if self._process is None or self._process.poll() is not None:
+            self._start(timeout)
+
+        output_path = _pdf_output_path(input_path, output_dir)
+
+        def action():
+            document = self._desktop.loadComponentFromURL(
+                Path(input_path).resolve().as_uri(), '_blank', 0, self._props(Hidden=True, ReadOnly=True)
+            )
+            if document is None:
+                raise ConvertToPdfError(f'LibreOffice can not open {input_path}')
+            try:
+                document.storeToURL(
+                    Path(output_path).resolve().as_uri(), self._props(FilterName=_pdf_export_filter(document))
+                )
+            finally:
+                try:
+                    document.close(True)
+                except Exception:
+                    pass
+            return output_path
+
+        return self._call_with_watchdog(action, input_path, timeout)
+
+    def _start_unoserver(self, timeout: float):
+        self.stop()
+        port = _free_port()
+        uno_port = _free_port()
+        while uno_port == port:
+            uno_port = _free_port()
+        cmd = [
+            self._unoserver,
+            '--interface', '127.0.0.1',
+            '--port', str(port),
+            '--uno-port', str(uno_port),
+            '--executable', get_soffice_command(),
+            '--user-installation', self.profile_dir,
+        ]
+        self._process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        self._rpc_url = f'http://127.0.0.1:{port}'
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with xmlrpc.client.ServerProxy(self._rpc_url, allow_none=True) as proxy:
+                    proxy.info()
+                break
+            except Exception:
+                # soffice启动并初始化用户配置目录后XML-RPC服务才可用
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConvertToPdfError('unoserver failed to start')
+                time.sleep(0.2)
+        logger.info(f'LibreOffice worker {self.index} started by unoserver, pid: {self._process.pid}')
+
+    def _convert_by_unoserver(self, input_path, output_dir, timeout: float) -> str:
+        if self._process is None or self._process.poll() is not None:
+            self._start_unoserver(timeout)
 
-    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output_path = _pdf_output_path(input_path, output_dir)
 
-    if process.returncode != 0:
-        raise ConvertToPdfError(f"LibreOffice convert failed: {process.stderr.decode()}")
+        def action():
+            with xmlrpc.client.ServerProxy(self._rpc_url, allow_none=True) as proxy:
+                try:
+                    proxy.convert(str(Path(input_path).resolve()), None, str(Path(output_path).resolve()), 'pdf')
+                except xmlrpc.client.Fault as e:
+                    # 服务端报告的转换错误，进程仍然可用
+                    raise ConvertToPdfError(f'LibreOffice convert failed: {e.faultString}')
+            if not os.path.exists(output_path):
+                raise ConvertToPdfError(f'LibreOffice convert failed: {input_path}')
+            return output_path
+
+        return self._call_with_watchdog(action, input_path, timeout)
+
+    def stop(self):
+        self._desktop = None
+        self._rpc_url = None
+        if self._process is not None:
+            _kill_process_tree(self._process)
+            self._process.wait()
+            self._process = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class _WorkerCrashed(Exception):
+    pass
+
+
+def _pdf_export_filter(document) -> str:
+    for service, filter_name in (
+        ('com.sun.star.presentation.PresentationDocument', 'impress_pdf_Export'),
+        ('com.sun.star.sheet.SpreadsheetDocument', 'calc_pdf_Export'),
+        ('com.sun.star.drawing.DrawingDocument', 'draw_pdf_Export'),
+    ):
+        if document.supportsService(service):
+            return filter_name
+    return 'writer_pdf_Export'
+
+
+def _kill_process_tree(process: subprocess.Popen):
+    if process.poll() is not None:
+        return
+    try:
+        if hasattr(os, 'killpg'):
+            # soffice会再启动soffice.bin子进程，按进程组一起结束
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class OfficeConverterPool:
+    """常驻的LibreOffice转换进程池.
+
+    每个worker线程管理一个转换进程(见_OfficeWorker)，从队列中取任务执行；任务超时会结束对应的进程，
+    进程崩溃时重启并重试一次该任务。
+    """
+
+    def __init__(self, workers: int | None = None, timeout: float | None = None):
+        """Initialized method.
+
+        Args:
+            workers (int, optional): the number of converter processes, read from MINERU_OFFICE_WORKERS if None,
+                which defaults to min(4, cpu count). Defaults to None.
+            timeout (float, optional): the default timeout in seconds of each job, read from
+                MINERU_OFFICE_TIMEOUT if None, which defaults to 120. Defaults to None.
+        """
+        if workers is None:
+            workers = int(os.getenv('MINERU_OFFICE_WORKERS', min(4, os.cpu_count() or 1)))
+        if timeout is None:
+            timeout = float(os.getenv('MINERU_OFFICE_TIMEOUT', 120))
+        self.timeout = timeout
+        self._closed = False
+        self._jobs = queue.Queue()
+        self._workers = [_OfficeWorker(index) for index in range(max(1, workers))]
+        self._threads = [
+            threading.Thread(target=self._run, args=(worker,), name=f'mineru-office-{worker.index}', daemon=True)
+            for worker in self._workers
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self, worker: _OfficeWorker):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                worker.close()
+                return
+            future, input_path, output_dir, timeout = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                try:
+                    result = worker.convert(input_path, output_dir, timeout)
+                except _WorkerCrashed as e:
+                    logger.warning(f'LibreOffice worker {worker.index} crashed ({e}), restart and retry {input_path}')
+                    try:
+                        result = worker.convert(input_path, output_dir, timeout)
+                    except _WorkerCrashed as e:
+                        raise ConvertToPdfError(f'LibreOffice convert failed: {e}')
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, input_path, output_dir, timeout: float | None = None) -> Future:
+        """Submit a conversion job.
+
+        Args:
+            input_path (str): the office file
+            output_dir (str): the output directory, the pdf is named after the input file
+            timeout (float, optional): the timeout in seconds, the default timeout of the pool is used if None.
+                Defaults to None.
+
+        Returns:
+            Future: the future of the output pdf path
+        """
+        if self._closed:
+            raise RuntimeError('the office converter pool is closed')
+        if not os.path.isfile(input_path):
+            raise FileNotFoundError(f"The input file {input_path} does not exist.")
+        os.makedirs(output_dir, exist_ok=True)
+        future = Future()
+        self._jobs.put((future, str(input_path), str(output_dir), timeout or self.timeout))
+        return future
+
+    def convert(self, input_path, output_dir, timeout: float | None = None) -> str:
+        """Convert a single document and wait for the output pdf path."""
+        return self.submit(input_path, output_dir, timeout).result()
+
+    def close(self):
+        """Stop all converter processes and remove their profile directories."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+_fonts_checked = False
+
+
+def get_office_converter_pool() -> OfficeConverterPool:
+    """The process-wide converter pool, created on first use and closed at exit."""
+    global _default_pool, _fonts_checked
+    with _default_pool_lock:
+        if not _fonts_checked:
+            check_fonts_installed()
+            _fonts_checked = True
+        if _default_pool is None:
+            _default_pool = OfficeConverterPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def convert_file_to_pdf(input_path, output_dir, timeout: float | None = None) -> str:
+    """Convert a single document (ppt, doc, etc.) to PDF."""
+    return get_office_converter_pool().convert(input_path, output_dir, timeout)
+
+
+def convert_files_to_pdf(input_paths, output_dir, timeout: float | None = None) -> list[str]:
+    """Convert documents concurrently with the converter pool.
+
+    Args:
+        input_paths (list[str]): the office files
+        output_dir (str): the output directory, the i-th pdf is saved in the sub directory named i,
+            so that files with the same name (e.g. a.doc and a.docx) do not overwrite each other
+        timeout (float, optional): the timeout in seconds of each document. Defaults to None.
+
+    Returns:
+        list[str]: the output pdf paths, in the order of input_paths
+    """
+    pool = get_office_converter_pool()
+    futures = [
+        pool.submit(input_path, os.path.join(str(output_dir), str(i)), timeout)
+        for i, input_path in enumerate(input_paths)
+    ]
+    return [future.result() for future in futures]
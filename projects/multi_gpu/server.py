@@ -3,12 +3,12 @@ import uuid
 import shutil
 import tempfile
 import gc
-import fitz
 import torch
 import base64
 import filetype
 import litserve as ls
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
 
 
@@ -22,6 +22,7 @@ class MinerUAPI(ls.LitAPI):
             if torch.cuda.device_count() > 1:
                 raise RuntimeError("Remove any CUDA actions before setting 'CUDA_VISIBLE_DEVICES'.")
 
+        os.environ.setdefault('MINERU_INFERENCE_BROKER', '1')
         from magic_pdf.tools.cli import do_parse, convert_file_to_pdf
         from magic_pdf.model.doc_analyze_by_custom_model import ModelSingleton
 
@@ -41,19 +42,33 @@ class MinerUAPI(ls.LitAPI):
         opts.setdefault('parse_method', 'auto')
         return file, opts
 
-    def predict(self, inputs):
+    def parse(self, inputs):
+        pdf_name = str(uuid.uuid4())
+        output_dir = self.output_dir.joinpath(pdf_name)
         try:
-            pdf_name = str(uuid.uuid4())
-            output_dir = self.output_dir.joinpath(pdf_name)
             self.do_parse(self.output_dir, pdf_name, inputs[0], [], **inputs[1])
             return output_dir
-        except Exception as e:
+        except Exception:
             shutil.rmtree(output_dir, ignore_errors=True)
+            raise
+
+    def predict(self, inputs):
+        try:
+            if isinstance(inputs, list):
+                # max_batch_size > 1时LitServe一次传入多个请求，各自在线程中解析，页面由InferenceBroker合并推理
+                with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+                    futures = [pool.submit(self.parse, item) for item in inputs]
+                return [f.exception() or f.result() for f in futures]
+            return self.parse(inputs)
+        except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
         finally:
             self.clean_memory()
 
     def encode_response(self, response):
+        if isinstance(response, Exception):
+            # 批量请求中解析失败的请求单独返回500，其他请求不受影响
+            raise HTTPException(status_code=500, detail=str(response))
         return {'output_dir': response}
 
     def clean_memory(self):
@@ -73,8 +88,9 @@ class MinerUAPI(ls.LitAPI):
                 if file_ext == 'pdf':
                     return file_bytes
                 elif file_ext in ['jpg', 'png']:
-                    with fitz.open(stream=file_bytes, filetype=file_ext) as f:
-                        return f.convert_to_pdf()
+                    # 图片直接解码为数据集，不转换成pdf
+                    from magic_pdf.data.dataset import ImageDataset
+                    return ImageDataset(file_bytes)
                 else:
                     temp_file.write_bytes(file_bytes)
                     self.convert_file_to_pdf(temp_file, temp_dir)
@@ -93,6 +109,9 @@ if __name__ == '__main__':
         accelerator='cuda',
         devices='auto',
         workers_per_device=1,
+        # 同时到达的请求合并成一次predict
+        max_batch_size=int(os.getenv('MINERU_LITSERVE_BATCH_SIZE', 4)),
+        batch_timeout=0.05,
         timeout=False
     )
     server.run(port=8000)
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 from base64 import b64encode
@@ -8,10 +9,10 @@ from typing import Tuple, Union
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from loguru import logger
 
-from magic_pdf.data.read_api import read_local_images, read_local_office
+from magic_pdf.data.read_api import read_local_office
 import magic_pdf.model as model_config
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.data.data_reader_writer import DataWriter, FileBasedDataWriter
@@ -21,8 +22,11 @@ from magic_pdf.libs.config_reader import get_bucket_name, get_s3_config
 from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
 from magic_pdf.operators.models import InferenceResult
 from magic_pdf.operators.pipes import PipeResult
+from magic_pdf.tools.common import stream_analyze
 
 model_config.__use_inside_model__ = True
+# 并发请求的页面由进程内的InferenceBroker合并成batch推理
+os.environ.setdefault("MINERU_INFERENCE_BROKER", "1")
 
 app = FastAPI()
 
@@ -109,23 +113,16 @@ def init_writers(
     return writer, image_writer, file_bytes, file_extension
 
 
-def process_file(
-    file_bytes: bytes,
-    file_extension: str,
-    parse_method: str,
-    image_writer: Union[S3DataWriter, FileBasedDataWriter],
-) -> Tuple[InferenceResult, PipeResult]:
+def init_dataset(file_bytes: bytes, file_extension: str) -> Union[PymuDocDataset, ImageDataset]:
     """
-    Process PDF file content
+    Build dataset from file content
 
     Args:
         file_bytes: Binary content of file
         file_extension: file extension
-        parse_method: Parse method ('ocr', 'txt', 'auto')
-        image_writer: Image writer
 
     Returns:
-        Tuple[InferenceResult, PipeResult]: Returns inference result and pipeline result
+        Union[PymuDocDataset, ImageDataset]: Returns the dataset of file
     """
 
     ds = Union[PymuDocDataset, ImageDataset]
@@ -138,11 +135,31 @@ def process_file(
             f.write(file_bytes)
         ds = read_local_office(temp_dir)[0]
     elif file_extension in image_extensions:
-        # 需要使用ocr解析
-        temp_dir = tempfile.mkdtemp()
-        with open(os.path.join(temp_dir, f"temp_file.{file_extension}"), "wb") as f:
-            f.write(file_bytes)
-        ds = read_local_images(temp_dir)[0]
+        # 需要使用ocr解析，图片直接解码，不经过临时文件和pdf转换
+        ds = ImageDataset(file_bytes)
+    return ds
+
+
+def process_file(
+    file_bytes: bytes,
+    file_extension: str,
+    parse_method: str,
+    image_writer: Union[S3DataWriter, FileBasedDataWriter],
+) -> Tuple[InferenceResult, PipeResult]:
+    """
+    Process PDF file content
+
+    Args:
+        file_bytes: Binary content of file
+        file_extension: file extension
+        parse_method: Parse method ('ocr', 'txt', 'auto')
+        image_writer: Image writer
+
+    Returns:
+        Tuple[InferenceResult, PipeResult]: Returns inference result and pipeline result
+    """
+
+    ds = init_dataset(file_bytes, file_extension)
     infer_result: InferenceResult = None
     pipe_result: PipeResult = None
 
@@ -230,7 +247,10 @@ async def file_parse(
         )
 
         # Process PDF
-        infer_result, pipe_result = process_file(file_bytes, file_extension, parse_method, image_writer)
+        # 在线程池中解析，不阻塞事件循环，其他请求可以同时进入
+        infer_result, pipe_result = await asyncio.get_running_loop().run_in_executor(
+            None, process_file, file_bytes, file_extension, parse_method, image_writer
+        )
 
         # Use MemoryDataWriter to get results
         content_list_writer = MemoryDataWriter()
@@ -299,5 +319,122 @@ async def file_parse(
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post(
+    "/file_parse/stream",
+    tags=["projects"],
+    summary="Parse files and stream the result of each page (Server-Sent Events)",
+)
+async def file_parse_stream(
+    file: UploadFile = None,
+    file_path: str = None,
+    parse_method: str = "auto",
+    is_json_md_dump: bool = False,
+    output_dir: str = "output",
+):
+    """
+    Parse the file and push a `page` event as soon as each page has been
+    post-processed, so the client gets the first pages without waiting for the
+    whole document.
+
+    Events:
+        page: {"page_idx", "md_content", "content_list"} of one page. Paragraphs
+            are only merged inside the page
+        done: {"md_content", "content_list"} of the whole document after the
+            cross-page paragraph merge, should replace the page fragments
+        error: {"error"} if parsing failed
+
+    Args:
+        file: The file to be parsed. Must not be specified together with
+            `file_path`
+        file_path: The path to the file to be parsed. Must not be specified together
+            with `file`
+        parse_method: Parsing method, can be auto, ocr, or txt. Default is auto
+        is_json_md_dump: Whether to write parsed data to .json and .md files. Default
+            to False
+        output_dir: Output directory for results
+    """
+    if (file is None and file_path is None) or (
+        file is not None and file_path is not None
+    ):
+        return JSONResponse(
+            content={"error": "Must provide either file or file_path"},
+            status_code=400,
+        )
+
+    try:
+        file_name = os.path.basename(file_path if file_path else file.filename).split(
+            "."
+        )[0]
+        output_path = f"{output_dir}/{file_name}"
+        output_image_path = f"{output_path}/images"
+
+        writer, image_writer, file_bytes, file_extension = init_writers(
+            file_path=file_path,
+            file=file,
+            output_path=output_path,
+            output_image_path=output_image_path,
+        )
+        ds = init_dataset(file_bytes, file_extension)
+    except Exception as e:
+        logger.exception(e)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_page(page_id: int, md_content: str, content_list: list):
+        # 在解析线程中回调，转交给事件循环
+        event = sse_event(
+            "page",
+            {"page_idx": page_id, "md_content": md_content, "content_list": content_list},
+        )
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def run() -> PipeResult:
+        infer_result, pipe_result = stream_analyze(
+            ds, parse_method, image_writer, "images", on_page
+        )
+        if is_json_md_dump:
+            pipe_result.dump_content_list(writer, f"{file_name}_content_list.json", "images")
+            pipe_result.dump_md(writer, f"{file_name}.md", "images")
+            pipe_result.dump_middle_json(writer, f"{file_name}_middle.json")
+            infer_result.dump_model(writer, f"{file_name}_model.json")
+        return pipe_result
+
+    task = loop.run_in_executor(None, run)
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    async def event_stream():
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        try:
+            pipe_result = task.result()
+        except Exception as e:
+            logger.exception(e)
+            yield sse_event("error", {"error": str(e)})
+            return
+        yield sse_event(
+            "done",
+            {
+                "md_content": pipe_result.get_markdown("images"),
+                "content_list": pipe_result.get_content_list("images"),
+            },
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8888)
@@ -0,0 +1,38 @@
+import json
+import os
+
+import pytest
+
+from magic_pdf.bench.e2e import STAGES, run_e2e_benchmark
+from magic_pdf.bench.synthetic import DOC_KINDS, make_synthetic_pdf
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.libs import config_reader
+
+
+@pytest.mark.parametrize('kind', DOC_KINDS)
+def test_make_synthetic_pdf(kind):
+    pdf_bytes, ground_truth = make_synthetic_pdf(kind, 2, seed=1)
+
+    assert make_synthetic_pdf(kind, 2, seed=1)[0] == pdf_bytes
+    assert make_synthetic_pdf(kind, 2, seed=2)[0] != pdf_bytes
+    assert len(PymuDocDataset(pdf_bytes)) == len(ground_truth) == 2
+    text = PymuDocDataset(pdf_bytes).get_page(0).get_doc().get_text()
+    # 扫描页没有文本层
+    assert (text.strip() == '') == (kind == 'scan')
+
+
+def test_run_e2e_benchmark(monkeypatch, tmp_path):
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', os.path.abspath('magic-pdf.template.json'))
+
+    report = run_e2e_benchmark(
+        kinds=['text', 'scan'], page_count=2, repeat=2, warmup=0, output_dir=str(tmp_path)
+    )
+
+    json.dumps(report)
+    assert report['total']['pages'] == 8
+    for kind in ['text', 'scan']:
+        result = report['results'][kind]
+        assert result['pages_per_sec'] > 0
+        assert set(result['stages']) == set(STAGES)
+        assert result['stages']['pipe']['count'] == 2
+        assert (tmp_path / kind / 'bench.md').stat().st_size > 0
@@ -0,0 +1,35 @@
+import copy
+import json
+import os
+
+from magic_pdf.bench.micro import load_fixtures, run_microbenchmark
+from magic_pdf.bench.report import compare_reports
+from magic_pdf.libs import config_reader
+
+
+def test_load_fixtures():
+    fixtures = load_fixtures(['tests/unittest/test_model/assets'])
+
+    assert [fixture['name'] for fixture in fixtures] == ['test_01', 'test_02']
+    assert fixtures[0]['model_list'][0]['page_info']['page_no'] == 0
+
+
+def test_run_microbenchmark_and_compare(monkeypatch):
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', os.path.abspath('magic-pdf.template.json'))
+    fixtures = load_fixtures(['tests/unittest/test_model/assets/test_01.model.json'])
+
+    report = run_microbenchmark(fixtures, repeat=2, warmup=0)
+
+    json.dumps(report)
+    stages = report['results']['test_01']['stages']
+    assert list(stages) == [
+        'magic_model', 'parse_page_core', 'para_split', 'union_make_md', 'union_make_content_list', 'aggregate'
+    ]
+    assert stages['parse_page_core']['count'] == 2
+    assert stages['parse_page_core']['alloc_peak_kb'] > 0
+
+    assert not any(row['regression'] for row in compare_reports(report, report))
+    slower = copy.deepcopy(report)
+    slower['results']['test_01']['stages']['para_split']['p50_ms'] *= 2
+    rows = compare_reports(report, slower, threshold=0.5)
+    assert [(row['stage'], row['ratio']) for row in rows if row['regression']] == [('para_split', 2.0)]
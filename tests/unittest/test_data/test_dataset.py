@@ -1,3 +1,6 @@
+import os
+
+import fitz
 
 from magic_pdf.data.dataset import ImageDataset, PymuDocDataset
 
@@ -16,3 +19,93 @@ def test_imagedataset():
     datasets = ImageDataset(bits)
     assert len(datasets) == 1
     assert datasets.get_page(0).get_page_info().w > 100
+
+
+def test_pymudataset_page_range():
+    pdf_path = 'tests/unittest/test_model/assets/test_02.pdf'
+    with open(pdf_path, 'rb') as f:
+        bits = f.read()
+    full = PymuDocDataset(bits)
+
+    dataset = PymuDocDataset(pdf_path, start_page_id=1, end_page_id=2)
+    assert len(dataset) == 2
+    assert dataset._records == [None, None]
+    assert dataset.get_page(0).get_page_info() == full.get_page(1).get_page_info()
+    assert [page.get_doc().get_text() for page in dataset] == [full.get_page(i).get_doc().get_text() for i in (1, 2)]
+    # 需要时才生成只包含这些页面的pdf
+    sub_doc = fitz.open('pdf', dataset.data_bits())
+    assert [page.get_text() for page in sub_doc] == [full.get_page(i).get_doc().get_text() for i in (1, 2)]
+
+    view = full.page_range(2)
+    assert len(view) == len(full) - 2
+    assert view.get_page(0).get_doc().get_text() == full.get_page(2).get_doc().get_text()
+    assert len(view.clone()) == len(view)
+
+    assert PymuDocDataset(pdf_path).data_bits() == bits
+
+
+def test_pymudataset_without_loading_bits():
+    from magic_pdf.filter import classify
+    from magic_pdf.libs.hash_utils import compute_md5
+
+    pdf_path = 'tests/unittest/test_model/assets/test_02.pdf'
+    with open(pdf_path, 'rb') as f:
+        bits = f.read()
+    dataset = PymuDocDataset(pdf_path)
+    # md5和分类直接使用文件和打开的文档，不读入整个文件
+    assert dataset.data_md5() == compute_md5(bits)
+    assert dataset.classify() == classify(bits)
+    assert dataset._data_bits is None
+
+    view = dataset.page_range(1, 2)
+    assert view.data_md5() not in (dataset.data_md5(), dataset.page_range(0, 1).data_md5())
+    assert view.data_md5() == PymuDocDataset(bits, start_page_id=1, end_page_id=2).data_md5()
+    method = view.classify()
+    assert view._data_bits is None
+    assert method == classify(view.data_bits())
+
+
+def test_imagedataset_without_pdf(tmp_path, monkeypatch):
+    from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+    from magic_pdf.data.utils import fitz_doc_to_image
+    from magic_pdf.libs import config_reader
+    from magic_pdf.operators.models import InferenceResult
+
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', os.path.abspath('magic-pdf.template.json'))
+    with open('tests/unittest/test_data/assets/pngs/test_01.png', 'rb') as f:
+        bits = f.read()
+    dataset = ImageDataset(bits)
+    pdf_page = fitz.open('pdf', fitz.open(stream=bits).convert_to_pdf())[0]
+
+    # 页面尺寸和推理图片大小与转换成pdf后渲染的结果一致
+    img_dict = dataset.get_page(0).get_image()
+    assert img_dict['img'].shape == fitz_doc_to_image(pdf_page)['img'].shape
+    assert dataset.get_page(0).get_page_info().w == pdf_page.rect.width
+    clip, zoom = fitz.Rect(10, 10, 200, 100), fitz.Matrix(3, 3)
+    pix, pdf_pix = dataset.get_page(0).get_pixmap(clip=clip, matrix=zoom), pdf_page.get_pixmap(clip=clip, matrix=zoom)
+    assert (pix.width, pix.height) == (pdf_pix.width, pdf_pix.height)
+
+    width, height = img_dict['width'], img_dict['height']
+    model_list = [{
+        'layout_dets': [{'category_id': 3, 'poly': [100, 100, 900, 100, 900, 600, 100, 600], 'score': 0.9}],
+        'page_info': {'page_no': 0, 'width': width, 'height': height},
+    }]
+    image_dir = tmp_path / 'images'
+    pipe_result = InferenceResult(model_list, dataset).pipe_ocr_mode(FileBasedDataWriter(str(image_dir)))
+
+    assert '![](' in pipe_result.get_markdown('images')
+    assert len(os.listdir(image_dir)) == 1
+    assert dataset._pdf_bits is None
+
+
+def test_imagepage_delegates_only_pdf_page_methods():
+    import pytest
+
+    with open('tests/unittest/test_data/assets/pngs/test_01.png', 'rb') as f:
+        bits = f.read()
+    page = ImageDataset(bits).get_page(0)
+    assert page.rect == page.get_doc().rect
+    assert page.get_text() == page.get_doc().get_text()
+    with pytest.raises(AttributeError):
+        page.no_such_method
+    assert not hasattr(page, 'set_rotation')
@@ -1,11 +1,15 @@
 import os
+import shutil
+import threading
+from pathlib import Path
 
 import pytest
 
 from magic_pdf.data.data_reader_writer import MultiBucketS3DataReader
 from magic_pdf.data.read_api import (read_jsonl, read_local_images,
-                                     read_local_pdfs)
+                                     read_local_office, read_local_pdfs)
 from magic_pdf.data.schemas import S3Config
+from magic_pdf.utils.office_to_pdf import OfficeConverterPool
 
 
 def test_read_local_pdfs():
@@ -28,6 +32,136 @@ def test_read_local_images():
     assert datasets[0].get_page(0).get_page_info().h > 0
 
 
+def test_office_converter_pool_missing_file(tmp_path):
+    pool = OfficeConverterPool(workers=2)
+    try:
+        with pytest.raises(FileNotFoundError):
+            pool.submit(str(tmp_path / 'missing.docx'), str(tmp_path))
+    finally:
+        pool.close()
+
+
+class _FakeProcess:
+    pid = -1
+
+    def poll(self):
+        return None
+
+
+class _FakeDocument:
+    def __init__(self, services):
+        self.services = services
+        self.stored = None
+        self.closed = False
+
+    def supportsService(self, service):
+        return service in self.services
+
+    def storeToURL(self, url, props):
+        self.stored = (url, {prop.Name: prop.Value for prop in props})
+
+    def close(self, deliver_ownership):
+        self.closed = True
+
+
+class _FakeDesktop:
+    def __init__(self, document):
+        self.document = document
+        self.loaded = None
+
+    def loadComponentFromURL(self, url, target, flags, props):
+        if isinstance(self.document, Exception):
+            raise self.document
+        self.loaded = (url, {prop.Name: prop.Value for prop in props})
+        return self.document
+
+
+def test_office_worker_convert_by_uno(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from magic_pdf.utils import office_to_pdf
+
+    # 用假的uno模块和Desktop代替常驻的soffice
+    fake_uno = SimpleNamespace(createUnoStruct=lambda name: SimpleNamespace(Name=None, Value=None))
+    worker = office_to_pdf._OfficeWorker(0)
+    worker._uno = fake_uno
+    worker._process = _FakeProcess()
+    try:
+        document = _FakeDocument({'com.sun.star.presentation.PresentationDocument'})
+        worker._desktop = _FakeDesktop(document)
+        input_path = tmp_path / 'slides.pptx'
+        output_path = worker.convert(str(input_path), str(tmp_path / 'out'), timeout=10)
+        assert output_path == str(tmp_path / 'out' / 'slides.pdf')
+        assert worker._desktop.loaded == (input_path.as_uri(), {'Hidden': True, 'ReadOnly': True})
+        assert document.stored == (Path(output_path).as_uri(), {'FilterName': 'impress_pdf_Export'})
+        assert document.closed
+
+        # 连接断开时停止进程，由调用方重启后重试
+        killed = []
+        monkeypatch.setattr(office_to_pdf, '_kill_process_tree', killed.append)
+        process = worker._process = _FakeProcess()
+        worker._process.wait = lambda: 0
+        worker._desktop = _FakeDesktop(RuntimeError('disposed'))
+        with pytest.raises(office_to_pdf._WorkerCrashed):
+            worker.convert(str(input_path), str(tmp_path / 'out'), timeout=10)
+        assert killed == [process]
+        assert worker._process is None and worker._desktop is None
+    finally:
+        worker._process = None
+        worker.close()
+
+
+def test_office_worker_convert_by_unoserver(tmp_path):
+    from xmlrpc.server import SimpleXMLRPCServer
+
+    from magic_pdf.utils import office_to_pdf
+
+    calls = []
+
+    def convert(inpath, indata, outpath, convert_to):
+        calls.append((inpath, outpath, convert_to))
+        if inpath.endswith('.broken'):
+            raise ValueError('can not load')
+        with open(outpath, 'wb') as f:
+            f.write(b'%PDF-1.7')
+
+    # 用进程内的XML-RPC服务代替常驻的unoserver
+    server = SimpleXMLRPCServer(('127.0.0.1', 0), allow_none=True, logRequests=False)
+    server.register_function(convert)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    worker = office_to_pdf._OfficeWorker(0)
+    worker._uno = None
+    worker._unoserver = 'unoserver'
+    worker._process = _FakeProcess()
+    worker._rpc_url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        (tmp_path / 'out').mkdir()
+        for _ in range(2):
+            output_path = worker.convert(str(tmp_path / 'a.docx'), str(tmp_path / 'out'), timeout=10)
+            assert output_path == str(tmp_path / 'out' / 'a.pdf')
+        assert calls == [(str(tmp_path / 'a.docx'), output_path, 'pdf')] * 2
+
+        # 服务端的转换错误不重启进程
+        with pytest.raises(office_to_pdf.ConvertToPdfError):
+            worker.convert(str(tmp_path / 'a.broken'), str(tmp_path / 'out'), timeout=10)
+        assert worker._rpc_url is not None
+    finally:
+        server.shutdown()
+        worker._process = None
+        worker.close()
+
+
+@pytest.mark.skipif(shutil.which('soffice') is None, reason='need libreoffice!')
+def test_read_local_office(tmp_path):
+    docx = 'tests/test_cli/pdf_dev/doc/test_mineru.docx'
+    # 同名的文件并发转换时不会互相覆盖
+    for name in ('a.docx', 'b.docx', 'b.doc'):
+        shutil.copy(docx, tmp_path / name)
+    datasets = read_local_office(str(tmp_path))
+    assert len(datasets) == 3
+    assert all(len(ds) > 0 for ds in datasets)
+
+
 @pytest.mark.skipif(
     os.getenv('S3_ACCESS_KEY_2', None) is None, reason='need s3 config!'
 )
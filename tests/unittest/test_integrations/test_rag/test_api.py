@@ -53,3 +53,70 @@ def test_data_reader():
 
     # teardown
     shutil.rmtree(temp_output_dir)
+
+
+def test_data_reader_cache(tmp_path):
+    # 缓存命中时不需要模型
+    asset_dir = 'tests/unittest/test_integrations/test_rag/assets'
+    shutil.copy(os.path.join(asset_dir, 'one_page_with_table_image.pdf'), tmp_path)
+    with open(os.path.join(asset_dir, 'middle.json')) as f:
+        res = convert_middle_json_to_layout_elements(json.load(f), str(tmp_path))
+    DataReader(str(tmp_path), 'ocr', str(tmp_path / 'output'))._save_cache(0, res)
+
+    data_reader = DataReader(str(tmp_path), 'ocr', str(tmp_path / 'output'))
+    results = list(data_reader.iter_document_results())
+    assert [idx for idx, _ in results] == [0]
+    page = list(iter(results[0][1]))[0]
+    assert len(list(iter(page))) == len(res[0].layout_dets)
+    assert len(page.get_rel_map()) == len(res[0].extra.element_relation)
+    # 结果不常驻内存，每次从缓存加载
+    assert data_reader.get_document_result(0) is not results[0][1]
+    assert len(list(iter(data_reader.get_document_result(0)))) == len(res)
+    assert not data_reader._uncached
+
+
+def test_data_reader_missing_results(tmp_path, monkeypatch):
+    from magic_pdf.integrations.rag import api
+    asset_dir = 'tests/unittest/test_integrations/test_rag/assets'
+    for name in ['a.pdf', 'b.pdf', 'c.pdf']:
+        shutil.copy(os.path.join(asset_dir, 'one_page_with_table_image.pdf'), tmp_path / name)
+
+    # 返回的结果少于输入时，缺少结果的文档按失败处理
+    monkeypatch.setattr(api, 'batch_inference', lambda paths, output_dir, method: [])
+    data_reader = DataReader(str(tmp_path), 'ocr', str(tmp_path / 'output'), batch_size=2)
+    assert sorted(idx for idx, res in data_reader.iter_document_results() if res is None) == [0, 1, 2]
+
+    # 后台线程异常退出时，等待的调用方不会一直阻塞
+    def interrupted(paths, output_dir, method):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(api, 'batch_inference', interrupted)
+    data_reader = DataReader(str(tmp_path), 'ocr', str(tmp_path / 'output'), batch_size=2)
+    assert data_reader.get_document_result(2) is None
+
+
+def test_data_reader_priority_and_retry(tmp_path, monkeypatch):
+    from magic_pdf.integrations.rag import api
+    asset_dir = 'tests/unittest/test_integrations/test_rag/assets'
+    for name in ['a.pdf', 'b.pdf', 'c.pdf']:
+        shutil.copy(os.path.join(asset_dir, 'one_page_with_table_image.pdf'), tmp_path / name)
+    with open(os.path.join(asset_dir, 'middle.json')) as f:
+        res = convert_middle_json_to_layout_elements(json.load(f), str(tmp_path))
+
+    calls = []
+
+    def flaky(paths, output_dir, method):
+        calls.append([os.path.basename(path) for path in paths])
+        # 第一批失败，之后都成功
+        return [None if len(calls) == 1 else res for _ in paths]
+
+    monkeypatch.setattr(api, 'batch_inference', flaky)
+    data_reader = DataReader(str(tmp_path), 'ocr', str(tmp_path / 'output'), batch_size=1)
+    idx = [path.name for path in data_reader.pdfs].index('c.pdf')
+    # 请求的文档最先处理，失败时返回None
+    assert data_reader.get_document_result(idx) is None
+    assert calls[0] == ['c.pdf']
+    # 再次请求时重新处理失败的文档
+    assert data_reader.get_document_result(idx) is not None
+    assert calls.count(['c.pdf']) == 2
+    assert sorted(i for i, _ in data_reader.iter_document_results()) == [0, 1, 2]
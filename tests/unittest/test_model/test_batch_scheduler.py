@@ -0,0 +1,44 @@
+import threading
+
+from magic_pdf.model import batch_scheduler
+from magic_pdf.model.batch_scheduler import WorkStealingScheduler
+
+
+def test_work_stealing_keeps_page_order():
+    pages = list(range(40))
+    batches = [pages[i:i + 2] for i in range(0, len(pages), 2)]
+    lock = threading.Lock()
+    others_done = threading.Event()
+    finished = []
+
+    def fake_analyze(batch, scale):
+        # 第一个batch一直阻塞到其它batch都完成，它所在设备队列里剩下的batch只能被其它虚拟设备偷走
+        if batch[0] == 0:
+            assert others_done.wait(timeout=30)
+        else:
+            with lock:
+                finished.append(batch[0])
+                if len(finished) == len(batches) - 1:
+                    others_done.set()
+        return [page * scale for page in batch]
+
+    scheduler = WorkStealingScheduler(['cpu', 'cpu', 'cpu'], analyze_fn=fake_analyze, use_processes=False)
+
+    results = scheduler.run(batches, 10)
+
+    assert results == [page * 10 for page in pages]
+    # 第一个设备初始分到7个batch，除了阻塞的第一个batch都被偷走
+    assert scheduler.device_batch_count[0] == 1
+    assert scheduler.steal_count >= 6
+    assert sum(scheduler.device_batch_count) == len(batches)
+
+
+def test_device_workers_are_reused():
+    try:
+        executor = batch_scheduler._get_device_executor(0, 'cpu')
+        # 同一个worker在多次run之间复用同一个进程池，不会重新加载模型
+        assert batch_scheduler._get_device_executor(0, 'cpu') is executor
+        assert batch_scheduler._get_device_executor(1, 'cpu') is not executor
+    finally:
+        batch_scheduler.shutdown_device_workers()
+    assert batch_scheduler._device_executors == {}
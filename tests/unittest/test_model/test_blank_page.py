@@ -0,0 +1,25 @@
+import fitz
+import numpy as np
+
+from magic_pdf.data.dataset import PymuDocDataset
+from magic_pdf.model.blank_page import BlankPageDetector
+
+
+def test_blank_page_detector():
+    doc = fitz.open()
+    doc.new_page()
+    doc.new_page().insert_text((300, 800), '12', fontsize=10)
+    doc.new_page().insert_text((72, 100), 'Appendix A', fontsize=11)
+    ds = PymuDocDataset(doc.tobytes())
+    content_ds = PymuDocDataset('tests/unittest/test_model/assets/test_01.pdf')
+
+    detector = BlankPageDetector()
+    pages = [ds.get_page(0), ds.get_page(1), ds.get_page(2), content_ds.get_page(0)]
+    # 空白页和只有页码的页面跳过，有文字的页面即使墨迹很少也要推理
+    assert [detector.is_blank(page.get_image()['img'], page) for page in pages] == [True, True, False, False]
+    assert detector.skipped_pages == 2
+
+    # 扫描件的背面: 灰色背景上的噪点
+    rng = np.random.default_rng(0)
+    scan = np.clip(rng.normal(200, 8, (2200, 1700, 3)), 0, 255).astype(np.uint8)
+    assert detector.ink_ratio_of(scan) <= detector.ink_ratio
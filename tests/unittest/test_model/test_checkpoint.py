@@ -0,0 +1,57 @@
+import pytest
+
+from magic_pdf.data.data_reader_writer import (FileBasedDataReader,
+                                               FileBasedDataWriter)
+from magic_pdf.data.read_api import read_local_pdfs
+from magic_pdf.model import checkpoint as checkpoint_module
+from magic_pdf.model import doc_analyze_by_custom_model
+from magic_pdf.model.checkpoint import InferenceCheckpoint
+
+
+def page_dict(index):
+    return {'layout_dets': [{'category_id': 1, 'score': 0.9}], 'page_info': {'page_no': index, 'width': 10, 'height': 20}}
+
+
+def test_checkpoint_restore(tmp_path):
+    reader, writer = FileBasedDataReader(str(tmp_path)), FileBasedDataWriter(str(tmp_path))
+    checkpoint = InferenceCheckpoint(reader, writer, 'fp')
+    checkpoint.save([0, 1], [page_dict(0), page_dict(1)])
+    checkpoint.save([2], [page_dict(2)])
+
+    assert InferenceCheckpoint(reader, writer, 'fp').load() == {i: page_dict(i) for i in range(3)}
+    # 其它输入的checkpoint互不影响
+    assert InferenceCheckpoint(reader, writer, 'other').load() == {}
+
+    # 最新的索引写坏时退回上一个索引
+    (tmp_path / 'fp' / 'index.1.json').write_text('{"fingerprint": "fp", "se')
+    assert InferenceCheckpoint(reader, writer, 'fp').load() == {0: page_dict(0), 1: page_dict(1)}
+
+
+def test_doc_analyze_resume(monkeypatch, tmp_path):
+    monkeypatch.setenv('MINERU_MIN_BATCH_INFERENCE_SIZE', '4')
+    monkeypatch.setattr(checkpoint_module, 'compute_fingerprint', lambda *args, **kwargs: 'fp')
+    dataset = read_local_pdfs('tests/unittest/test_model/assets/test_02.pdf')[0]
+    analyzed = []
+
+    def crash_after_two_batches(images_with_extra_info, *args):
+        if len(analyzed) >= 8:
+            raise RuntimeError('preempted')
+        analyzed.extend(images_with_extra_info)
+        return [[{'category_id': 1, 'score': 0.9}] for _ in images_with_extra_info]
+
+    monkeypatch.setattr(doc_analyze_by_custom_model, 'may_batch_image_analyze', crash_after_two_batches)
+    with pytest.raises(RuntimeError):
+        doc_analyze_by_custom_model.doc_analyze(dataset, checkpoint_dir=str(tmp_path))
+
+    analyzed.clear()
+    monkeypatch.setattr(
+        doc_analyze_by_custom_model, 'may_batch_image_analyze',
+        lambda images_with_extra_info, *args: analyzed.extend(images_with_extra_info) or [[] for _ in images_with_extra_info],
+    )
+    infer_result = doc_analyze_by_custom_model.doc_analyze(dataset, checkpoint_dir=str(tmp_path))
+
+    model_json = infer_result.get_infer_res()
+    assert len(analyzed) == len(dataset) - 8
+    assert [page['page_info']['page_no'] for page in model_json] == list(range(len(dataset)))
+    assert all(len(page['layout_dets']) == 1 for page in model_json[:8])
+    assert all(page['page_info']['width'] > 0 for page in model_json)
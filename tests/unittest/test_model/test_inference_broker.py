@@ -0,0 +1,37 @@
+import pytest
+
+from magic_pdf.model.inference_broker import InferenceBroker
+
+
+def test_broker_coalesces_concurrent_requests():
+    batches = []
+
+    def fake_analyze(batch, scale):
+        batches.append((len(batch), scale))
+        return [page * scale for page in batch]
+
+    broker = InferenceBroker(fake_analyze, max_batch_pages=5, max_wait=0.5)
+    # 4个调用方各提交3页，前3个的参数相同
+    futures = [broker.submit([i * 100 + page for page in range(3)], 10 if i < 3 else 1) for i in range(4)]
+    results = {i: future.result() for i, future in enumerate(futures)}
+    broker.close()
+
+    # 每个调用方拿回自己的页面，参数不同的页面不会合并
+    assert results == {i: [(i * 100 + page) * (10 if i < 3 else 1) for page in range(3)] for i in range(4)}
+    assert sorted(batches) == [(3, 1), (4, 10), (5, 10)]
+    assert broker.page_count == 12
+
+
+def test_broker_splits_and_propagates_errors():
+    def fake_analyze(batch):
+        if -1 in batch:
+            raise ValueError('bad page')
+        return batch
+
+    broker = InferenceBroker(fake_analyze, max_batch_pages=5, max_wait=0.01)
+    assert broker.analyze(list(range(12))) == list(range(12))
+    assert broker.batch_count == 3
+    with pytest.raises(ValueError):
+        broker.analyze([0, -1])
+    assert broker.analyze([]) == []
+    broker.close()
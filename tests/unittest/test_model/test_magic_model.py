@@ -29,3 +29,28 @@ def test_magic_model_table_v2():
 
     tables = magic_model.get_tables_v2(8)
     print(tables)
+
+
+def test_magic_model_page_index():
+    datasets = read_local_pdfs('tests/unittest/test_model/assets/test_01.pdf')
+    page_info = datasets[0].get_page(0).get_page_info()
+    layout_dets = [
+        {'category_id': 1, 'bbox': [10, 10, 200, 100], 'score': 0.9},
+        # 和上一个iou>0.9，置信度低的被删除
+        {'category_id': 1, 'bbox': [11, 10, 200, 100], 'score': 0.6},
+        {'category_id': 0, 'bbox': [10, 120, 200, 140], 'score': 0.02},
+        {'category_id': 15, 'bbox': [10, 10, 50, 20], 'score': 1.0, 'text': 'a'},
+        {'category_id': 15, 'bbox': [10, 10, 50, 20], 'score': 1.0, 'text': 'a'},
+        {'category_id': 15, 'bbox': [60, 10, 90, 20], 'score': 1.0, 'text': 'b'},
+    ]
+    model_list = [{
+        'layout_dets': layout_dets,
+        'page_info': {'page_no': 0, 'width': page_info.w, 'height': page_info.h},
+    }]
+
+    magic_model = MagicModel(model_list, datasets[0])
+
+    assert magic_model.get_text_blocks(0) == [{'bbox': [10, 10, 200, 100], 'score': 0.9}]
+    assert magic_model.get_title_blocks(0) == []
+    assert [span['content'] for span in magic_model.get_all_spans(0)] == ['a', 'b']
+    assert len(model_list[0]['layout_dets']) == 4
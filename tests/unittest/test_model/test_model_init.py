@@ -0,0 +1,100 @@
+import gc
+import weakref
+
+from magic_pdf.model.model_registry import ModelRegistry
+from magic_pdf.model.sub_modules import model_init
+from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
+
+
+def test_ocr_configs_share_one_network(monkeypatch):
+    init_calls = []
+
+    def fake_ocr_model_init(show_log=False, lang=None, **kwargs):
+        init_calls.append(lang)
+        return object()
+
+    monkeypatch.setattr(AtomModelSingleton, '_models', ModelRegistry('atom_model'))
+    monkeypatch.setattr(model_init, 'ocr_model_init', fake_ocr_model_init)
+
+    atom_model_manager = AtomModelSingleton()
+    det_ocr = atom_model_manager.get_atom_model(
+        atom_model_name='ocr',
+        ocr_show_log=False,
+        det_db_box_thresh=0.3,
+        lang='ch'
+    )
+    table_ocr = atom_model_manager.get_atom_model(
+        atom_model_name='ocr',
+        ocr_show_log=False,
+        det_db_box_thresh=0.5,
+        det_db_unclip_ratio=1.6,
+        lang='ch'
+    )
+
+    assert init_calls == ['ch']
+    assert det_ocr.ocr_model is table_ocr.ocr_model
+    assert (det_ocr.det_db_box_thresh, det_ocr.det_db_unclip_ratio) == (0.3, 1.8)
+    assert (table_ocr.det_db_box_thresh, table_ocr.det_db_unclip_ratio) == (0.5, 1.6)
+
+
+def test_evicted_ocr_model_is_released(monkeypatch):
+    from magic_pdf.model.pdf_extract_kit import CustomPEKModel
+
+    class FakeModel:
+        def __init__(self, **kwargs):
+            self.ocr_engine = kwargs.get('ocr_engine')
+
+    monkeypatch.setattr(AtomModelSingleton, '_models', ModelRegistry('atom_model', max_models=2))
+    monkeypatch.setattr(model_init, 'atom_model_init', lambda model_name, **kwargs: FakeModel(**kwargs))
+
+    # CustomPEKModel只保存参数，每次使用时从AtomModelSingleton获取ocr和表格模型
+    custom_model = CustomPEKModel.__new__(CustomPEKModel)
+    custom_model._ocr_model_kwargs = dict(atom_model_name='ocr', ocr_show_log=False, det_db_box_thresh=0.3, lang='ch')
+    custom_model._table_model_kwargs = dict(atom_model_name='table', table_model_name='rapid_table')
+    ocr_ref = weakref.ref(custom_model.ocr_model.ocr_model)
+    table_model = custom_model.table_model
+    assert table_model.ocr_engine.ocr_model is ocr_ref()
+    del table_model
+
+    AtomModelSingleton().get_atom_model(atom_model_name='ocr', lang='en')
+    gc.collect()
+    # ch的ocr模型被淘汰，持有它的表格模型一并淘汰，模型对象被释放
+    assert ocr_ref() is None
+    assert ('table', 'rapid_table', None) not in AtomModelSingleton._models
+    assert custom_model.ocr_model.ocr_model is not None
+
+
+def test_table_depends_on_the_ocr_engine_it_holds(monkeypatch):
+    class FakeOCRModel:
+        pass
+
+    class FakeRapidTableModel:
+        def __init__(self, ocr_engine, table_sub_model_name=None):
+            self.ocr_engine = ocr_engine
+
+    monkeypatch.setattr(AtomModelSingleton, '_models', ModelRegistry('atom_model', max_models=3))
+    monkeypatch.setattr(model_init, 'ocr_model_init', lambda show_log=False, lang=None, **kwargs: FakeOCRModel())
+    monkeypatch.setattr(model_init, 'RapidTableModel', FakeRapidTableModel)
+
+    atom_model_manager = AtomModelSingleton()
+    ocr_engine = atom_model_manager.get_atom_model(atom_model_name='ocr', lang='ch')
+    table_model = atom_model_manager.get_atom_model(
+        atom_model_name='table', table_model_name='rapid_table', ocr_engine=ocr_engine
+    )
+    # rapid_table按表格的lang获取自己的ocr引擎，依赖记录在这个引擎上，而不是传入的ocr_engine
+    assert table_model.ocr_engine.ocr_model is not ocr_engine.ocr_model
+    table_key = ('table', 'rapid_table', None)
+    table_ocr_ref = weakref.ref(table_model.ocr_engine.ocr_model)
+    del table_model, ocr_engine
+
+    # 淘汰ch的ocr模型，表格模型不受影响
+    atom_model_manager.get_atom_model(atom_model_name='ocr', lang='en')
+    assert ('ocr', 'ch') not in AtomModelSingleton._models
+    assert table_key in AtomModelSingleton._models
+
+    # 淘汰表格实际持有的ocr模型，表格模型一并淘汰，模型对象被释放
+    atom_model_manager.get_atom_model(atom_model_name='ocr', lang='fr')
+    gc.collect()
+    assert ('ocr', None) not in AtomModelSingleton._models
+    assert table_key not in AtomModelSingleton._models
+    assert table_ocr_ref() is None
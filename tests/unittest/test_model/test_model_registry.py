@@ -0,0 +1,52 @@
+import gc
+import weakref
+
+from magic_pdf.model.model_registry import ModelRegistry
+
+
+def test_lru_eviction_and_counters():
+    registry = ModelRegistry('test', max_models=2)
+    registry.get_or_create('ch', lambda: 'ch_model')
+    registry.get_or_create('en', lambda: 'en_model')
+    # 访问ch，使en成为最久未使用的模型
+    assert registry.get_or_create('ch', lambda: 'unused') == 'ch_model'
+    registry.get_or_create('japan', lambda: 'japan_model')
+
+    assert 'en' not in registry
+    assert 'ch' in registry and 'japan' in registry
+    assert registry.stats() == {'hits': 1, 'misses': 3, 'evictions': 1, 'models': 2, 'memory': 0}
+
+
+def test_pinned_models_are_never_evicted():
+    registry = ModelRegistry('test', max_models=1)
+    registry.get_or_create('layout', lambda: 'layout_model', pinned=True)
+    registry.get_or_create('ch', lambda: 'ch_model')
+    registry.get_or_create('en', lambda: 'en_model')
+
+    assert 'layout' in registry
+    assert 'ch' not in registry
+    assert 'en' in registry
+    assert registry.stats()['evictions'] == 1
+
+
+class _Model:
+    pass
+
+
+def test_dependents_are_evicted_with_their_dependency():
+    registry = ModelRegistry('test', max_models=2)
+    ocr = registry.get_or_create('ocr_ch', _Model)
+    # 新模型依赖的模型不会为了给它腾位置而被淘汰
+    table = registry.get_or_create('table', _Model, depends_on=['ocr_ch'])
+    table.ocr_engine = ocr
+    assert 'ocr_ch' in registry and 'table' in registry and registry.find(ocr) == 'ocr_ch'
+
+    ocr_ref = weakref.ref(ocr)
+    del ocr, table
+    registry.get_or_create('ocr_en', _Model)
+    gc.collect()
+
+    # 表格模型持有ocr模型的引用，只淘汰ocr模型不能释放它
+    assert 'ocr_ch' not in registry and 'table' not in registry
+    assert ocr_ref() is None
+    assert registry.stats()['evictions'] == 2
@@ -0,0 +1,41 @@
+from magic_pdf import pdf_parse_union_core_v2
+from magic_pdf.config.enums import SupportedPdfParseMethod
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+from magic_pdf.data.read_api import read_local_pdfs
+from magic_pdf.pdf_parse_union_core_v2 import (pdf_parse_union,
+                                               pdf_parse_union_by_windows)
+
+
+def empty_model_list(dataset):
+    return [
+        {'layout_dets': [], 'page_info': {'page_no': index, 'width': 0, 'height': 0}}
+        for index in range(len(dataset))
+    ]
+
+
+def test_parse_by_windows_matches_whole_document(monkeypatch, tmp_path):
+    monkeypatch.setenv('MINERU_DEVICE_MODE', 'cpu')
+    monkeypatch.setattr(pdf_parse_union_core_v2, 'get_llm_aided_config', lambda: None)
+    dataset = read_local_pdfs('tests/unittest/test_model/assets/test_02.pdf')[0]
+    image_writer = FileBasedDataWriter(str(tmp_path))
+
+    expected = pdf_parse_union(
+        empty_model_list(dataset), dataset, image_writer, SupportedPdfParseMethod.TXT, start_page_id=1
+    )
+
+    parsed_pages = []
+    windows = [
+        (1, 4, empty_model_list(dataset)),
+        (5, len(dataset) - 1, empty_model_list(dataset)),
+    ]
+    res = pdf_parse_union_by_windows(
+        iter(windows),
+        dataset,
+        image_writer,
+        SupportedPdfParseMethod.TXT,
+        page_callback=lambda page_id, page_info: parsed_pages.append(page_id),
+    )
+
+    assert parsed_pages == list(range(1, len(dataset)))
+    assert res == expected
+    assert res['pdf_info'][0]['drop_reason'] == 'skip page'
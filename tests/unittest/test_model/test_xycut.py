@@ -0,0 +1,44 @@
+import numpy as np
+
+from magic_pdf.model.sub_modules.reading_oreder.layoutreader.xycut import (
+    projection_by_bboxes, xy_cut)
+from magic_pdf.pdf_parse_union_core_v2 import cal_block_index
+
+
+def test_projection_by_bboxes():
+    boxes = np.array([[0, 0, 3, 1], [2, 0, 5, 1], [4, 0, 4, 1]])
+    assert projection_by_bboxes(boxes, axis=0).tolist() == [1, 1, 2, 1, 1]
+
+
+def test_xy_cut_two_columns():
+    # 标题横跨两栏，下面左右两栏的行在y方向上交错，先按栏切分
+    boxes = np.array([
+        [300, 150, 500, 180],
+        [10, 10, 500, 30],
+        [10, 140, 200, 170],
+        [300, 110, 500, 140],
+        [10, 100, 200, 130],
+    ])
+    assert xy_cut(boxes) == [1, 4, 2, 3, 0]
+
+
+def test_xy_cut_keeps_all_boxes_and_is_deterministic():
+    rng = np.random.default_rng(0)
+    xy = rng.integers(0, 500, size=(200, 2))
+    boxes = np.concatenate([xy, xy + rng.integers(0, 30, size=(200, 2))], axis=1)
+    boxes[:20, 3] = boxes[:20, 1]  # 高度为0的box也要出现在结果中
+    res = xy_cut(boxes)
+    assert sorted(res) == list(range(200))
+    assert xy_cut(boxes) == res
+
+
+def test_cal_block_index_xycut():
+    fix_blocks = [
+        {'type': 'text', 'bbox': [300, 100, 500, 120], 'lines': [{'bbox': [300, 100, 500, 120]}]},
+        {'type': 'text', 'bbox': [10, 100, 200, 120], 'lines': []},
+        {'type': 'text', 'bbox': [10, 100, 200, 120], 'lines': [{'bbox': [10, 100, 200, 120]}]},
+    ]
+    cal_block_index(fix_blocks, None)
+    assert [block['index'] for block in fix_blocks] == [2, 0, 1]
+    assert fix_blocks[0]['lines'][0]['index'] == 2
+    assert fix_blocks[2]['lines'][0]['index'] == 1
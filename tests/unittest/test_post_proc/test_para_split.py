@@ -0,0 +1,54 @@
+import copy
+
+from magic_pdf.config.constants import CROSS_PAGE, LINES_DELETED
+from magic_pdf.post_proc.para_split_v3 import para_split
+
+
+def make_text_block(texts, y0=100):
+    lines = []
+    for i, text in enumerate(texts):
+        bbox = [50, y0 + i * 14, 550, y0 + i * 14 + 12]
+        lines.append({'bbox': bbox, 'spans': [{'bbox': bbox, 'type': 'text', 'content': text}]})
+    return {'type': 'text', 'bbox': [50, y0, 550, y0 + len(texts) * 14], 'lines': lines}
+
+
+def make_pdf_info(*pages):
+    return {
+        f'page_{i}': {'preproc_blocks': blocks, 'page_size': [612, 792]}
+        for i, blocks in enumerate(pages)
+    }
+
+
+def test_para_split_merge_cross_page():
+    title = {'type': 'title', 'bbox': [50, 50, 550, 70], 'lines': []}
+    pdf_info = make_pdf_info(
+        [title, make_text_block(['a paragraph', 'which is', 'long enough', 'to continue on'])],
+        [make_text_block(['the next page', 'and the next']), make_text_block(['one more', 'block'], y0=300)],
+    )
+    preproc_blocks = copy.deepcopy({k: v['preproc_blocks'] for k, v in pdf_info.items()})
+
+    para_split(pdf_info)
+
+    # preproc_blocks不被修改
+    assert {k: v['preproc_blocks'] for k, v in pdf_info.items()} == preproc_blocks
+    head = pdf_info['page_0']['para_blocks'][1]
+    assert [line['spans'][0]['content'] for line in head['lines']] == [
+        'a paragraph', 'which is', 'long enough', 'to continue on', 'the next page', 'and the next', 'one more', 'block',
+    ]
+    assert all(span.get(CROSS_PAGE) for line in head['lines'][4:] for span in line['spans'])
+    assert not any(span.get(CROSS_PAGE) for line in head['lines'][:4] for span in line['spans'])
+    for block in pdf_info['page_1']['para_blocks']:
+        assert block['lines'] == [] and block[LINES_DELETED]
+
+
+def test_para_split_list_group_not_merged():
+    # 组内所有block都不超过3行时是list group，文本block不合并
+    pdf_info = make_pdf_info(
+        [make_text_block(['short', 'block'])],
+        [make_text_block(['another short', 'block'])],
+    )
+
+    para_split(pdf_info)
+
+    assert len(pdf_info['page_0']['para_blocks'][0]['lines']) == 2
+    assert len(pdf_info['page_1']['para_blocks'][0]['lines']) == 2
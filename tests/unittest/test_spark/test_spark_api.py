@@ -0,0 +1,78 @@
+import functools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from magic_pdf.config.drop_reason import DropReason
+from magic_pdf.spark.spark_api import _iter_batches, process_partition
+
+pdf_01 = 'tests/unittest/test_model/assets/test_01.pdf'  # 1页
+pdf_02 = 'tests/unittest/test_model/assets/test_02.pdf'  # 13页
+
+
+def test_iter_batches():
+    with open(pdf_01, 'rb') as f:
+        pdf_01_bytes = f.read()
+    records = [('a', pdf_01_bytes), ('b', b'not a pdf'), ('c', pdf_02), ('d', pdf_01), ('e', pdf_01)]
+    batches = list(_iter_batches(records, batch_pages=2))
+    # 加入13页的文档后超过批次大小，打不开的文档留在原来的位置
+    assert [[record_id for record_id, _ in batch] for batch in batches] == [['a', 'b', 'c'], ['d', 'e']]
+    assert isinstance(batches[0][1][1], Exception)
+    assert len(batches[0][2][1]) == 13
+
+
+def _collect(fn, records):
+    return list(fn(records))
+
+
+def test_process_partition_isolates_failures(tmp_path):
+    partitions = [
+        [('a', b'not a pdf'), ('b', str(tmp_path / 'missing.pdf'))],
+        [('a', b'%PDF-broken')],
+    ]
+    # 进程池代替spark的executor，分区函数需要能够pickle
+    fn = functools.partial(process_partition, parse_method='txt', batch_pages=10)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(functools.partial(_collect, fn), partitions))
+    assert [[record['id'] for record in records] for records in results] == [['a', 'b'], ['a']]
+    for records in results:
+        for record in records:
+            assert record['_need_drop'] is True
+            assert record['_drop_reason'] == DropReason.Exception
+
+
+def test_process_partition_loads_models_once(monkeypatch):
+    from magic_pdf.model import batch_analyze, doc_analyze_by_custom_model
+    from magic_pdf.model.model_registry import ModelRegistry
+
+    init_calls = []
+
+    class StubBatchAnalyze:
+        def __init__(self, model_manager, batch_ratio, show_log, layout_model, formula_enable, table_enable):
+            self.model_manager = model_manager
+
+        def __call__(self, images_with_extra_info):
+            self.model_manager.get_model(ocr=True, show_log=False, lang=None, layout_model=None,
+                                         formula_enable=None, table_enable=None)
+            return [[] for _ in images_with_extra_info]
+
+    from magic_pdf.libs import config_reader
+    monkeypatch.setattr(config_reader, 'CONFIG_FILE_NAME', os.path.abspath('magic-pdf.template.json'))
+    monkeypatch.setenv('MINERU_DEVICE_MODE', 'cpu')
+    monkeypatch.setenv('MINERU_SKIP_BLANK_PAGES', '0')
+    monkeypatch.setattr(batch_analyze, 'BatchAnalyze', StubBatchAnalyze)
+    monkeypatch.setattr(doc_analyze_by_custom_model, 'custom_model_init',
+                        lambda **kwargs: init_calls.append(kwargs) or object())
+    monkeypatch.setattr(doc_analyze_by_custom_model.ModelSingleton, '_models', ModelRegistry('custom_model', 4))
+
+    with open(pdf_01, 'rb') as f:
+        pdf_01_bytes = f.read()
+    records = [('a', pdf_01_bytes), ('b', pdf_02), ('a', b'not a pdf'), ('c', pdf_01)]
+    # 每个批次只放一个文档，多个批次共用同一份模型
+    results = list(process_partition(records, parse_method='txt', batch_pages=1))
+
+    assert [record['id'] for record in results] == ['a', 'b', 'a', 'c']
+    assert [record.get('parse_type') for record in results] == ['txt', 'txt', None, 'txt']
+    assert results[2]['_need_drop'] is True
+    assert len(json.loads(results[1]['middle_json'])['pdf_info']) == 13
+    assert len(init_calls) == 1
@@ -1,10 +1,11 @@
 import unittest
 import os
+from unittest import mock
 from PIL import Image
 from lxml import etree
 
 from magic_pdf.model.sub_modules.model_init import AtomModelSingleton
-from magic_pdf.model.sub_modules.table.rapidtable.rapid_table import RapidTableModel
+from magic_pdf.model.sub_modules.table.rapidtable.rapid_table import RapidTableModel, get_table_session_config
 
 
 class TestppTableModel(unittest.TestCase):
@@ -56,6 +57,17 @@ class TestppTableModel(unittest.TestCase):
         # assert second_last_row[3].text and second_last_row[3].text.strip() == "82.97", "Fourth cell should be '82.97'"
         # assert second_last_row[3].text and second_last_row[4].text.strip() == "12.68", "Fifth cell should be '12.68'"
 
+    def test_session_config(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('MINERU_TABLE_SESSIONS', None)
+            os.environ.pop('MINERU_TABLE_THREADS', None)
+            # session数乘以每个session的线程数不超过cpu核数
+            self.assertEqual(get_table_session_config(64), (8, 8))
+            self.assertEqual(get_table_session_config(16), (4, 4))
+            self.assertEqual(get_table_session_config(2), (1, 2))
+            os.environ['MINERU_TABLE_SESSIONS'] = '3'
+            self.assertEqual(get_table_session_config(12), (3, 4))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+import json
+import os
+
+import fitz
+
+from magic_pdf.libs.draw_bbox import (draw_overlays, submit_draw_overlays,
+                                      wait_draw_overlays)
+
+ASSETS = 'tests/unittest/test_integrations/test_rag/assets'
+
+
+def _load_assets():
+    with open(os.path.join(ASSETS, 'middle.json')) as f:
+        pdf_info = json.load(f)['pdf_info']
+    with open(os.path.join(ASSETS, 'one_page_with_table_image.pdf'), 'rb') as f:
+        pdf_bytes = f.read()
+    return pdf_info, pdf_bytes
+
+
+def _drawing_count(file_path):
+    with fitz.open(file_path) as doc:
+        return sum(len(page.get_drawings()) for page in doc)
+
+
+def test_draw_overlays(tmp_path):
+    pdf_info, pdf_bytes = _load_assets()
+    layout_path = str(tmp_path / 'layout.pdf')
+    span_path = str(tmp_path / 'spans.pdf')
+
+    draw_overlays(pdf_info, pdf_bytes, {'layout': layout_path, 'span': span_path})
+
+    with fitz.open('pdf', pdf_bytes) as doc:
+        origin_count = sum(len(page.get_drawings()) for page in doc)
+    layout_count = _drawing_count(layout_path)
+    span_count = _drawing_count(span_path)
+    assert layout_count > origin_count
+    assert span_count > origin_count
+    # 每种bbox画在独立的副本上，互不叠加
+    assert layout_count != span_count
+
+
+def test_submit_draw_overlays(tmp_path):
+    pdf_info, pdf_bytes = _load_assets()
+    layout_path = str(tmp_path / 'layout.pdf')
+
+    future = submit_draw_overlays(pdf_info, pdf_bytes, {'layout': layout_path})
+    # 提交之后修改pdf_info不影响后台绘制
+    pdf_info.clear()
+    future.result()
+    wait_draw_overlays()
+
+    assert os.path.exists(layout_path)
+    assert _drawing_count(layout_path) > 0
@@ -0,0 +1,58 @@
+import copy
+import json
+
+from magic_pdf.config.make_content_config import MakeMode
+from magic_pdf.data.data_reader_writer import FileBasedDataWriter
+from magic_pdf.operators.pipes import PipeResult
+
+
+def test_dump_all_matches_separate_dumps(tmp_path):
+    with open('tests/unittest/test_integrations/test_rag/assets/middle.json') as f:
+        middle_json = json.load(f)
+
+    separate_dir, all_dir = tmp_path / 'separate', tmp_path / 'all'
+    separate_writer, all_writer = FileBasedDataWriter(str(separate_dir)), FileBasedDataWriter(str(all_dir))
+
+    pipe_result = PipeResult(copy.deepcopy(middle_json), None)
+    pipe_result.dump_md(separate_writer, 'demo.md', 'images')
+    pipe_result.dump_content_list(separate_writer, 'demo_content_list.json', 'images')
+    pipe_result.dump_middle_json(separate_writer, 'demo_middle.json')
+
+    PipeResult(copy.deepcopy(middle_json), None).dump_all(
+        all_writer,
+        'images',
+        md_file_path='demo.md',
+        content_list_file_path='demo_content_list.json',
+        middle_json_file_path='demo_middle.json',
+    )
+
+    for file_name in ['demo.md', 'demo_content_list.json', 'demo_middle.json']:
+        assert (separate_dir / file_name).read_text() == (all_dir / file_name).read_text()
+
+
+def test_dump_all_nlp_md_with_nlp_make_mode(tmp_path):
+    with open('tests/unittest/test_integrations/test_rag/assets/middle.json') as f:
+        middle_json = json.load(f)
+    writer = FileBasedDataWriter(str(tmp_path))
+    pipe_result = PipeResult(middle_json, None)
+    pipe_result.dump_all(
+        writer, 'images', md_file_path='demo.md', nlp_md_file_path='demo_nlp.md', md_make_mode=MakeMode.NLP_MD
+    )
+
+    nlp_md = pipe_result.get_markdown('images', md_make_mode=MakeMode.NLP_MD)
+    assert (tmp_path / 'demo.md').read_text() == nlp_md
+    assert (tmp_path / 'demo_nlp.md').read_text() == nlp_md
+
+
+def test_dump_middle_json_compact(tmp_path):
+    with open('tests/unittest/test_integrations/test_rag/assets/middle.json') as f:
+        middle_json = json.load(f)
+    writer = FileBasedDataWriter(str(tmp_path))
+    pipe_result = PipeResult(middle_json, None)
+    pipe_result.dump_middle_json(writer, 'compact.json')
+    pipe_result.dump_middle_json(writer, 'indent.json', compact=False)
+
+    compact = (tmp_path / 'compact.json').read_text()
+    assert '\n' not in compact
+    assert len(compact) < len((tmp_path / 'indent.json').read_text())
+    assert json.loads(compact) == middle_json
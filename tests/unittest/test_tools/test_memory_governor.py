@@ -0,0 +1,46 @@
+from magic_pdf.libs.memory_governor import MemoryGovernor
+
+
+def test_memory_governor_rss_high_water():
+    # 远低于水位线时不做gc
+    governor = MemoryGovernor(rss_high_water=1.0)
+    for _ in range(3):
+        governor.maybe_clean('cpu')
+    stats = governor.stats()
+    assert stats['checks'] == 3
+    assert stats['gc_collections'] == 0
+    assert stats['device_cleanups'] == 0
+
+    # 水位线为0时总会超过，但gc后要等RSS再增长10%才会再次gc
+    governor = MemoryGovernor(rss_high_water=0.0)
+    for _ in range(3):
+        governor.maybe_clean('cpu')
+    assert governor.stats()['gc_collections'] == 1
+
+    governor = MemoryGovernor(always=True)
+    for _ in range(3):
+        governor.maybe_clean('cpu')
+    assert governor.stats()['gc_collections'] == 3
+    assert governor.scale_batch_ratio(16) == 16
+
+
+def test_memory_governor_batch_divisor_is_capped(monkeypatch):
+    from magic_pdf.libs import memory_governor
+    # 清理后已分配的显存仍然超过水位线
+    monkeypatch.setattr(memory_governor, '_device_usage', lambda device: (900.0, 950.0, 1000.0))
+    monkeypatch.setattr(memory_governor, '_empty_device_cache', lambda device: None)
+    governor = MemoryGovernor()
+    assert governor.scale_batch_ratio(4) == 4
+    for _ in range(10):
+        governor.maybe_clean('cuda')
+    assert governor.scale_batch_ratio(4) == 1
+    stats = governor.stats()
+    assert stats['batch_divisor'] == 4
+    assert stats['batch_reductions'] == 2
+
+    # 显存降到水位线的一半以下后逐步恢复
+    monkeypatch.setattr(memory_governor, '_device_usage', lambda device: (100.0, 950.0, 1000.0))
+    governor.maybe_clean('cuda')
+    assert governor.scale_batch_ratio(4) == 2
+    governor.maybe_clean('cuda')
+    assert governor.scale_batch_ratio(4) == 4
@@ -0,0 +1,36 @@
+import json
+import tracemalloc
+
+from magic_pdf.libs.memory_tracker import MemoryTracker
+from magic_pdf.libs.pipeline_stage import (add_stage_observer, pipeline_stage,
+                                           remove_stage_observer)
+
+
+def test_memory_tracker(tmp_path):
+    report_path = tmp_path / 'memory.jsonl'
+    was_tracing = tracemalloc.is_tracing()
+    tracker = MemoryTracker(str(report_path), interval=0.001, trace_python=True)
+    add_stage_observer(tracker)
+    try:
+        for _ in range(2):
+            with pipeline_stage('doc'):
+                for page_id in range(2):
+                    with pipeline_stage('page', [page_id]):
+                        # 阶段内分配后释放的内存只体现在峰值上
+                        buf = bytearray(8 * 1024 * 1024)
+                        del buf
+                kept = [bytearray(4 * 1024 * 1024)]  # noqa: F841
+    finally:
+        remove_stage_observer(tracker)
+
+    reports = [json.loads(line) for line in report_path.read_text().splitlines()]
+    assert [report['document'] for report in reports] == [1, 2]
+    report = reports[0]
+    assert report['stage'] == 'doc' and report['pages'] == 2
+    page = report['stages']['page']
+    assert page['calls'] == 2
+    assert page['python_peak_mb'] >= 8
+    assert page['python_delta_mb'] < 1
+    assert report['stages']['doc']['python_peak_mb'] >= 8
+    assert report['stages']['doc']['python_delta_mb'] >= 4
+    assert tracemalloc.is_tracing() == was_tracing
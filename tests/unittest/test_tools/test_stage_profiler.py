@@ -0,0 +1,49 @@
+import json
+import os
+import time
+
+import pytest
+
+from magic_pdf.libs.pipeline_stage import (add_stage_observer, pipeline_stage,
+                                           remove_stage_observer)
+from magic_pdf.libs.stage_profiler import SamplingProfiler, parse_page_range
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(100))
+
+
+def test_parse_page_range():
+    assert parse_page_range(None) is None
+    assert parse_page_range('3') == (3, 3)
+    assert parse_page_range('3-5') == (3, 5)
+    with pytest.raises(ValueError):
+        parse_page_range('5-3')
+
+
+def test_sampling_profiler(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), interval=0.001, page_range=(1, 1))
+    add_stage_observer(profiler)
+    try:
+        with pipeline_stage('doc'):
+            for page_id in range(3):
+                with pipeline_stage('page', [page_id]):
+                    _busy(0.05)
+                    with pipeline_stage('page.inner'):
+                        _busy(0.05)
+    finally:
+        remove_stage_observer(profiler)
+
+    output_dir = tmp_path / str(os.getpid())
+    with open(output_dir / 'summary.json') as f:
+        summary = json.load(f)
+    # 只有第1页被分析，doc阶段不属于任何页面
+    assert set(summary) == {'page', 'page.inner'}
+    assert summary['page']['calls'] == 1
+    assert summary['page.inner']['samples'] > 0
+
+    folded = (output_dir / 'page.inner.folded').read_text().splitlines()
+    assert all('_busy' in line.rsplit(' ', 1)[0] for line in folded)
+    assert '_busy' in (output_dir / 'page.inner.top.txt').read_text()